@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.repositories.ride import ride_code_cache
+from app.repositories.user import user_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # In-process caches outlive the per-test database, reset them between tests
+    ride_code_cache.clear()
+    user_cache.clear()
+    yield
+    ride_code_cache.clear()
+    user_cache.clear()
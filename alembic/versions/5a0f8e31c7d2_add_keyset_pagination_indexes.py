@@ -0,0 +1,45 @@
+"""Add keyset pagination indexes
+
+Revision ID: 5a0f8e31c7d2
+Revises: d91a4c6e2f35
+Create Date: 2026-10-16 13:02:44.180273
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a0f8e31c7d2'
+down_revision: Union[str, Sequence[str], None] = 'd91a4c6e2f35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # (start_time, id) covers everything the single-column index was used for
+    op.drop_index(op.f('ix_rides_start_time'), table_name='rides')
+    op.create_index('ix_rides_start_time_id', 'rides', ['start_time', 'id'], unique=False)
+    op.create_index(
+        'ix_rides_created_by_user_id_start_time_id',
+        'rides',
+        ['created_by_user_id', 'start_time', 'id'],
+        unique=False,
+    )
+    op.create_index('ix_rides_is_active_start_time_id', 'rides', ['is_active', 'start_time', 'id'], unique=False)
+    op.create_index('ix_routes_created_by_user_id_id', 'routes', ['created_by_user_id', 'id'], unique=False)
+    op.create_index('ix_participations_ride_id_id', 'participations', ['ride_id', 'id'], unique=False)
+    op.create_index('ix_participations_user_id_id', 'participations', ['user_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_participations_user_id_id', table_name='participations')
+    op.drop_index('ix_participations_ride_id_id', table_name='participations')
+    op.drop_index('ix_routes_created_by_user_id_id', table_name='routes')
+    op.drop_index('ix_rides_is_active_start_time_id', table_name='rides')
+    op.drop_index('ix_rides_created_by_user_id_start_time_id', table_name='rides')
+    op.drop_index('ix_rides_start_time_id', table_name='rides')
+    op.create_index(op.f('ix_rides_start_time'), 'rides', ['start_time'], unique=False)
@@ -0,0 +1,39 @@
+"""Add ride broadcast mode
+
+Revision ID: 8c1d2e7a4b90
+Revises: f4bfe6084517
+Create Date: 2026-10-16 10:12:41.204117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c1d2e7a4b90'
+down_revision: Union[str, Sequence[str], None] = 'f4bfe6084517'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Create the Enum type manually for PostgreSQL
+    broadcast_mode = sa.Enum('PER_FIX', 'BATCHED', name='broadcastmode')
+    broadcast_mode.create(op.get_bind(), checkfirst=True)
+
+    op.add_column(
+        'rides',
+        sa.Column('broadcast_mode', broadcast_mode, server_default='PER_FIX', nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('rides', 'broadcast_mode')
+
+    # Drop the Enum type manually for PostgreSQL
+    broadcast_mode = sa.Enum('PER_FIX', 'BATCHED', name='broadcastmode')
+    broadcast_mode.drop(op.get_bind(), checkfirst=True)
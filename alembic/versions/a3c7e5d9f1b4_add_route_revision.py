@@ -0,0 +1,28 @@
+"""Add route revision
+
+Revision ID: a3c7e5d9f1b4
+Revises: e8a4f1b2c6d3
+Create Date: 2026-10-17 15:24:08.513270
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c7e5d9f1b4'
+down_revision: Union[str, Sequence[str], None] = 'e8a4f1b2c6d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('routes', sa.Column('revision', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('routes', 'revision')
@@ -0,0 +1,45 @@
+"""Add location history
+
+Revision ID: b37e5f0c9a12
+Revises: 8c1d2e7a4b90
+Create Date: 2026-10-16 11:03:27.518842
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b37e5f0c9a12'
+down_revision: Union[str, Sequence[str], None] = '8c1d2e7a4b90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('location_history',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+    sa.Column('participation_id', sa.Integer(), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=False),
+    sa.Column('longitude', sa.Float(), nullable=False),
+    sa.Column('speed', sa.Float(), nullable=True),
+    sa.Column('altitude', sa.Float(), nullable=True),
+    sa.Column('timestamp', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['participation_id'], ['participations.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_location_history_participation_timestamp',
+        'location_history',
+        ['participation_id', 'timestamp'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_location_history_participation_timestamp', table_name='location_history')
+    op.drop_table('location_history')
@@ -0,0 +1,54 @@
+"""Never reuse archived ids
+
+Revision ID: b6d2f8e4a1c9
+Revises: a3c7e5d9f1b4
+Create Date: 2026-10-17 16:02:41.208377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d2f8e4a1c9'
+down_revision: Union[str, Sequence[str], None] = 'a3c7e5d9f1b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Hot tables whose rows are moved to an archive table under the same id.
+# PostgreSQL sequences never go back; SQLite hands out MAX(id) + 1 unless
+# the table is declared AUTOINCREMENT.
+ARCHIVED_TABLES = {
+    'rides': 'rides_archive',
+    'participations': 'participations_archive',
+    'location_history': 'location_history_archive',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    for table, archive in ARCHIVED_TABLES.items():
+        with op.batch_alter_table(table, recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+            pass
+        # Continue after ids that were already archived
+        op.execute(sa.text("DELETE FROM sqlite_sequence WHERE name = :table").bindparams(table=table))
+        op.execute(sa.text(
+            f"INSERT INTO sqlite_sequence (name, seq) "
+            f"SELECT :table, COALESCE(MAX(id), 0) FROM "
+            f"(SELECT id FROM {table} UNION ALL SELECT id FROM {archive})"
+        ).bindparams(table=table))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    for table in ARCHIVED_TABLES:
+        with op.batch_alter_table(table, recreate='always', table_kwargs={'sqlite_autoincrement': False}):
+            pass
@@ -0,0 +1,44 @@
+"""Add route geometries
+
+Revision ID: c5e2a9d17f48
+Revises: 5a0f8e31c7d2
+Create Date: 2026-10-17 09:14:27.512904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e2a9d17f48'
+down_revision: Union[str, Sequence[str], None] = '5a0f8e31c7d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing routes get their row from `python -m app.backfill`
+    op.create_table('route_geometries',
+    sa.Column('route_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('point_count', sa.Integer(), nullable=False),
+    sa.Column('distance_meters', sa.Float(), nullable=False),
+    sa.Column('elevation_gain_meters', sa.Float(), nullable=False),
+    sa.Column('min_latitude', sa.Float(), nullable=True),
+    sa.Column('min_longitude', sa.Float(), nullable=True),
+    sa.Column('max_latitude', sa.Float(), nullable=True),
+    sa.Column('max_longitude', sa.Float(), nullable=True),
+    sa.Column('points', sa.LargeBinary(), nullable=False),
+    sa.Column('polyline', sa.Text(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['route_id'], ['routes.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('route_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('route_geometries')
@@ -0,0 +1,83 @@
+"""Add archive tables
+
+Revision ID: d91a4c6e2f35
+Revises: b37e5f0c9a12
+Create Date: 2026-10-16 12:21:09.664310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd91a4c6e2f35'
+down_revision: Union[str, Sequence[str], None] = 'b37e5f0c9a12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('rides_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('code', sa.String(length=6), nullable=False),
+    sa.Column('title', sa.String(length=100), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('start_time', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('route_id', sa.Integer(), nullable=True),
+    sa.Column('created_by_user_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('visibility', sa.String(length=20), nullable=True),
+    sa.Column('broadcast_mode', sa.String(length=20), nullable=False),
+    sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_rides_archive_code'), 'rides_archive', ['code'], unique=False)
+    op.create_index(op.f('ix_rides_archive_created_by_user_id'), 'rides_archive', ['created_by_user_id'], unique=False)
+
+    op.create_table('participations_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('ride_id', sa.Integer(), nullable=False),
+    sa.Column('latitude', sa.Numeric(precision=10, scale=8), nullable=True),
+    sa.Column('longitude', sa.Numeric(precision=10, scale=8), nullable=True),
+    sa.Column('joined_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('location_timestamp', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_participations_archive_ride_id'), 'participations_archive', ['ride_id'], unique=False)
+    op.create_index(op.f('ix_participations_archive_user_id'), 'participations_archive', ['user_id'], unique=False)
+
+    op.create_table('location_history_archive',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), autoincrement=False, nullable=False),
+    sa.Column('participation_id', sa.Integer(), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=False),
+    sa.Column('longitude', sa.Float(), nullable=False),
+    sa.Column('speed', sa.Float(), nullable=True),
+    sa.Column('altitude', sa.Float(), nullable=True),
+    sa.Column('timestamp', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_location_history_archive_participation_timestamp',
+        'location_history_archive',
+        ['participation_id', 'timestamp'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_location_history_archive_participation_timestamp', table_name='location_history_archive')
+    op.drop_table('location_history_archive')
+    op.drop_index(op.f('ix_participations_archive_user_id'), table_name='participations_archive')
+    op.drop_index(op.f('ix_participations_archive_ride_id'), table_name='participations_archive')
+    op.drop_table('participations_archive')
+    op.drop_index(op.f('ix_rides_archive_created_by_user_id'), table_name='rides_archive')
+    op.drop_index(op.f('ix_rides_archive_code'), table_name='rides_archive')
+    op.drop_table('rides_archive')
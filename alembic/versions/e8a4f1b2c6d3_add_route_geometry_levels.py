@@ -0,0 +1,37 @@
+"""Add route geometry levels
+
+Revision ID: e8a4f1b2c6d3
+Revises: c5e2a9d17f48
+Create Date: 2026-10-17 11:02:51.307146
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8a4f1b2c6d3'
+down_revision: Union[str, Sequence[str], None] = 'c5e2a9d17f48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Filled in the background per route, missing levels are computed on first request
+    op.create_table('route_geometry_levels',
+    sa.Column('route_id', sa.Integer(), nullable=False),
+    sa.Column('zoom', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('tolerance_m', sa.Float(), nullable=False),
+    sa.Column('point_count', sa.Integer(), nullable=False),
+    sa.Column('polyline', sa.Text(), nullable=False),
+    sa.ForeignKeyConstraint(['route_id'], ['route_geometries.route_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('route_id', 'zoom')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('route_geometry_levels')
@@ -0,0 +1,72 @@
+"""
+Backfill of data derived from existing rows.
+
+    python -m app.backfill [--batch-size N] [--all]
+
+Writes the route_geometries row of every route that has none or an
+outdated one (every route with --all). Safe to run while the app serves
+traffic and to interrupt: each batch is its own transaction and a rerun
+continues with the routes still missing.
+"""
+import argparse
+import asyncio
+import os
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.database import AsyncSessionLocal
+from app.executors import cpu_executor
+from app.repositories import RouteRepository
+from app.utils.geometry import build_route_geometry
+
+# Routes parsed (in parallel, in the CPU pool) and written per transaction
+ROUTE_GEOMETRY_BACKFILL_BATCH = int(os.getenv("ROUTE_GEOMETRY_BACKFILL_BATCH", 50))
+
+
+async def backfill_route_geometries(
+    *,
+    batch_size: int = ROUTE_GEOMETRY_BACKFILL_BATCH,
+    include_current: bool = False,
+    session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+) -> int:
+    """Returns the number of routes whose geometry was written."""
+    written = 0
+    after = None
+    while True:
+        async with session_factory() as session:
+            async with session.begin():
+                route_repository = RouteRepository(session=session)
+                route_ids = await route_repository.get_ids_without_geometry(
+                    limit=batch_size,
+                    after=after,
+                    include_current=include_current,
+                )
+                if not route_ids:
+                    return written
+
+                documents = [await route_repository.get_gpx_data(route_id=route_id) for route_id in route_ids]
+                geometries = await asyncio.gather(*(
+                    cpu_executor.run(build_route_geometry, gpx_data) for gpx_data in documents
+                ))
+                for route_id, geometry in zip(route_ids, geometries):
+                    await route_repository.save_geometry(route_id=route_id, geometry=geometry)
+
+        written += len(route_ids)
+        after = route_ids[-1]
+        print(f"Backfill: route geometries written for {written} routes (up to id {after})")
+
+
+async def main(args: argparse.Namespace) -> None:
+    cpu_executor.start()
+    try:
+        written = await backfill_route_geometries(batch_size=args.batch_size, include_current=args.all)
+    finally:
+        await cpu_executor.stop()
+    print(f"Backfill: done, {written} route geometries written")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write route geometries for existing routes")
+    parser.add_argument("--batch-size", type=int, default=ROUTE_GEOMETRY_BACKFILL_BATCH)
+    parser.add_argument("--all", action="store_true", help="rewrite current geometries too")
+    asyncio.run(main(parser.parse_args()))
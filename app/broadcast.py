@@ -0,0 +1,213 @@
+import asyncio
+import os
+import time
+from typing import Callable
+
+import socketio
+
+from app.utils.frames import RoomFrameEncoder
+
+LOCATION_BROADCAST_TICK_MS = int(os.getenv("LOCATION_BROADCAST_TICK_MS", 250))
+# Stop a room's tick loop after this many ticks without a fix
+LOCATION_BROADCAST_IDLE_TICKS = int(os.getenv("LOCATION_BROADCAST_IDLE_TICKS", 20))
+# Compact frames: send absolute positions at least every N frames
+COMPACT_KEYFRAME_INTERVAL = int(os.getenv("COMPACT_KEYFRAME_INTERVAL", 20))
+# Drop a room's frame state after this long without a fix, rebuilt with the next one
+COMPACT_ENCODER_IDLE_SECONDS = float(os.getenv("COMPACT_ENCODER_IDLE_SECONDS", 600))
+
+
+def compact_room(ride_code: str) -> str:
+    """Room of the sockets that receive binary `location_frame` events."""
+    return f"{ride_code}:compact"
+
+
+class LocationBroadcaster:
+    """
+    Fan-out of rider locations to a ride's rooms.
+
+    Per-fix rides get one `location_update` per fix. For rides in batched
+    mode fixes are collected per ride room, keeping the latest one per
+    rider, and every tick the room receives a single `location_batch`
+    event with all riders that moved since the previous tick.
+
+    Sockets that joined with the compact format get the same updates as
+    binary `location_frame` events (see app/utils/frames.py) instead.
+    Frames are encoded per worker and never cross the client manager:
+    with a cross-process manager each worker encodes the JSON events of
+    the other workers for its own compact sockets (`relay_remote`).
+    """
+
+    def __init__(
+        self,
+        server: socketio.AsyncServer,
+        *,
+        tick_interval_ms: int = LOCATION_BROADCAST_TICK_MS,
+        idle_ticks: int = LOCATION_BROADCAST_IDLE_TICKS,
+        keyframe_interval: int = COMPACT_KEYFRAME_INTERVAL,
+        encoder_idle_seconds: float = COMPACT_ENCODER_IDLE_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.server = server
+        self.tick_interval = tick_interval_ms / 1000
+        self.idle_ticks = idle_ticks
+        self.keyframe_interval = keyframe_interval
+        self.encoder_idle_seconds = encoder_idle_seconds
+        self._clock = clock
+
+        self._pending: dict[str, dict[int, dict]] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        # Encoders exist while their room has compact sockets on this worker and
+        # fixes to send; an idle room's encoder is rebuilt with its next fix
+        self._encoders: dict[str, RoomFrameEncoder] = {}
+        self._encoded_at: dict[str, float] = {}
+        self._compact_sids: dict[str, set[str]] = {}
+        self._pruned_at = clock()
+
+        self.batches_sent = 0
+        self.locations_sent = 0
+        self.frames_sent = 0
+        self.frame_bytes_sent = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "active_rooms": len(self._tasks),
+            "pending_locations": sum(len(room) for room in self._pending.values()),
+            "batches_sent": self.batches_sent,
+            "locations_sent": self.locations_sent,
+            "compact_rooms": len(self._encoders),
+            "compact_subscribers": sum(len(sids) for sids in self._compact_sids.values()),
+            "frames_sent": self.frames_sent,
+            "frame_bytes_sent": self.frame_bytes_sent,
+            "tick_interval_ms": int(self.tick_interval * 1000),
+        }
+
+    def _encoder(self, ride_code: str) -> RoomFrameEncoder:
+        encoder = self._encoders.get(ride_code)
+        if encoder is None:
+            encoder = self._encoders[ride_code] = RoomFrameEncoder(
+                keyframe_interval=self.keyframe_interval,
+            )
+        self._encoded_at[ride_code] = self._clock()
+        return encoder
+
+    def _drop_encoder(self, ride_code: str) -> None:
+        self._encoders.pop(ride_code, None)
+        self._encoded_at.pop(ride_code, None)
+
+    def _maybe_prune(self, now: float) -> None:
+        if now - self._pruned_at < self.encoder_idle_seconds:
+            return
+        self._pruned_at = now
+        for ride_code, encoded_at in list(self._encoded_at.items()):
+            if now - encoded_at >= self.encoder_idle_seconds:
+                self._drop_encoder(ride_code)
+
+    async def subscribe_compact(self, sid, ride_code: str) -> None:
+        """Put a socket on the compact format and send it the index table."""
+        self._maybe_prune(self._clock())
+        encoder = self._encoder(ride_code)
+        # The newcomer has no previous frame to apply deltas to
+        encoder.request_keyframe()
+        self._compact_sids.setdefault(ride_code, set()).add(sid)
+
+        await self.server.enter_room(sid, compact_room(ride_code))
+        await self.server.emit('location_index', {
+            'ride_code': ride_code,
+            'indexes': [[index, user_id] for user_id, index in encoder.indexes.items()],
+        }, room=sid, ignore_queue=True)
+
+    def unsubscribe_compact(self, sid) -> None:
+        """The socket disconnected: drop the encoders of rooms it was the last compact socket of."""
+        for ride_code, sids in list(self._compact_sids.items()):
+            sids.discard(sid)
+            if not sids:
+                del self._compact_sids[ride_code]
+                self._drop_encoder(ride_code)
+
+    def forget_room(self, ride_code: str) -> None:
+        """The ride was archived: drop its pending fixes, tick loop and frame encoder."""
+        self._pending.pop(ride_code, None)
+        self._drop_encoder(ride_code)
+        self._compact_sids.pop(ride_code, None)
+        task = self._tasks.pop(ride_code, None)
+        if task is not None:
+            task.cancel()
+
+    async def emit_compact(self, ride_code: str, locations: list[dict]) -> None:
+        self._maybe_prune(self._clock())
+        if ride_code not in self._compact_sids or not locations:
+            return
+
+        # A rebuilt encoder starts with a keyframe and announces its indexes again
+        frame, new_indexes = self._encoder(ride_code).encode(locations)
+        room = compact_room(ride_code)
+        if new_indexes:
+            await self.server.emit('location_index', {
+                'ride_code': ride_code,
+                'indexes': [[index, user_id] for index, user_id in new_indexes.items()],
+            }, room=room, ignore_queue=True)
+        await self.server.emit('location_frame', frame, room=room, ignore_queue=True)
+
+        self.frames_sent += 1
+        self.frame_bytes_sent += len(frame)
+
+    async def relay_remote(self, event: str, data, room: str | None) -> None:
+        """Encode location events emitted by another worker for this worker's compact sockets."""
+        if room not in self._compact_sids:
+            return
+        if event == 'location_update':
+            await self.emit_compact(room, [data])
+        elif event == 'location_batch':
+            await self.emit_compact(room, data['locations'])
+
+    async def publish(self, ride_code: str, location: dict, *, batched: bool) -> None:
+        if batched:
+            self.add(ride_code, location)
+            return
+
+        await self.server.emit('location_update', location, room=ride_code)
+        await self.emit_compact(ride_code, [location])
+
+    def add(self, ride_code: str, location: dict) -> None:
+        self._pending.setdefault(ride_code, {})[location["user_id"]] = location
+        if ride_code not in self._tasks:
+            self._tasks[ride_code] = asyncio.create_task(self._run(ride_code))
+
+    async def flush_room(self, ride_code: str) -> int:
+        locations = self._pending.pop(ride_code, None)
+        if not locations:
+            return 0
+
+        await self.server.emit('location_batch', {
+            'ride_code': ride_code,
+            'locations': list(locations.values()),
+        }, room=ride_code)
+        await self.emit_compact(ride_code, list(locations.values()))
+
+        self.batches_sent += 1
+        self.locations_sent += len(locations)
+        return len(locations)
+
+    async def _run(self, ride_code: str) -> None:
+        idle = 0
+        try:
+            while idle < self.idle_ticks:
+                await asyncio.sleep(self.tick_interval)
+                try:
+                    sent = await self.flush_room(ride_code)
+                except Exception as e:
+                    print(f"Error broadcasting batch for ride {ride_code}: {e}")
+                    sent = 0
+                idle = 0 if sent else idle + 1
+        finally:
+            self._tasks.pop(ride_code, None)
+
+    async def stop(self) -> None:
+        """Cancel all tick loops and send what is still pending."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        for ride_code in list(self._pending):
+            await self.flush_room(ride_code)
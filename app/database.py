@@ -1,21 +1,269 @@
+import math
 import os
+import time
+from typing import Callable
 from dotenv import load_dotenv
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy import event, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.models import DbModel
+from app.utils.metrics import LatencyHistogram
 
 load_dotenv()
 
-database_url = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///ride.db")
+def normalize_database_url(url: str) -> str:
+    """Select the async drivers for plain sqlite:// and postgresql:// URLs."""
+    if url.startswith("sqlite")  and "aiosqlite" not in url:
+        url = url.replace("sqlite", "sqlite+aiosqlite")
+    elif url.startswith("postgresql") and "asyncpg" not in url:
+        url = url.replace("postgresql", "postgresql+asyncpg")
+    return url
 
-if database_url.startswith("sqlite")  and "aiosqlite" not in database_url:
-    database_url = database_url.replace("sqlite", "sqlite+aiosqlite")
-elif database_url.startswith("postgresql") and "asyncpg" not in database_url:
-    database_url = database_url.replace("postgresql", "postgresql+asyncpg")
+database_url = normalize_database_url(os.getenv("DATABASE_URL", "sqlite+aiosqlite:///ride.db"))
+# Optional read replica for heavy GET endpoints, unset = everything on the primary
+database_replica_url = os.getenv("DATABASE_REPLICA_URL") or None
+if database_replica_url:
+    database_replica_url = normalize_database_url(database_replica_url)
+
+# Logs every statement synchronously, development only
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+# Seconds a request waits for a free connection before failing
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+# Reconnect connections older than this (seconds), below server/proxy idle limits
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# asyncpg prepared statements per connection; set 0 behind pgbouncer in transaction mode
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
+# PostgreSQL statement_timeout in ms, 0 keeps the server default
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 30000))
+# Milliseconds SQLite waits on a locked database before raising
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+# Reads go to the primary while the replica lags more than this (PostgreSQL streaming replication)
+DATABASE_REPLICA_MAX_LAG_SECONDS = float(os.getenv("DATABASE_REPLICA_MAX_LAG_SECONDS", 5))
+# How long a replica health/lag check result is reused
+DATABASE_REPLICA_CHECK_SECONDS = float(os.getenv("DATABASE_REPLICA_CHECK_SECONDS", 5))
+
+
+class PoolMetrics:
+    """Checkout counters and wait times of one engine's connection pool."""
+
+    def __init__(self):
+        self.pool = None
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.checkout_wait = LatencyHistogram()
+
+    def stats(self) -> dict[str, object]:
+        stats: dict[str, object] = {
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "invalidations": self.invalidations,
+            "timeouts": self.timeouts,
+            "checkout_wait": self.checkout_wait.stats(),
+        }
+        if isinstance(self.pool, AsyncAdaptedQueuePool):
+            stats |= {
+                "size": self.pool.size(),
+                "checked_out": self.pool.checkedout(),
+                "overflow": max(0, self.pool.overflow()),
+                "idle": self.pool.checkedin(),
+            }
+        return stats
+
+
+def _instrumented_pool_class(metrics: PoolMetrics) -> type[AsyncAdaptedQueuePool]:
+    # A class per engine: dispose() recreates the pool from its class, the metrics stay attached
+    class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+        def connect(self):
+            metrics.pool = self
+            started_at = time.perf_counter()
+            try:
+                return super().connect()
+            except exc.TimeoutError:
+                metrics.timeouts += 1
+                raise
+            finally:
+                metrics.checkout_wait.observe(time.perf_counter() - started_at)
+
+    return InstrumentedQueuePool
+
+
+def configure_sqlite(engine: AsyncEngine) -> None:
+    """WAL lets readers run next to the single writer; NORMAL fsyncs only at checkpoints."""
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+
+
+def create_engine_from_url(url: str, *, metrics: PoolMetrics) -> AsyncEngine:
+    backend = make_url(url).get_backend_name()
+    options: dict = {"echo": DB_ECHO}
+
+    if backend == "postgresql":
+        server_settings = {}
+        if DB_STATEMENT_TIMEOUT_MS:
+            server_settings["statement_timeout"] = str(DB_STATEMENT_TIMEOUT_MS)
+        options |= {
+            "poolclass": _instrumented_pool_class(metrics),
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": DB_POOL_PRE_PING,
+            "connect_args": {
+                # SQLAlchemy's cache of prepared statements and asyncpg's own
+                "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+                "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+                "server_settings": server_settings,
+            },
+        }
+    elif backend == "sqlite" and make_url(url).database not in (None, "", ":memory:"):
+        # File databases only, in-memory ones use a single static connection
+        options |= {
+            "poolclass": _instrumented_pool_class(metrics),
+            "pool_timeout": DB_POOL_TIMEOUT,
+        }
+
+    engine = create_async_engine(url, **options)
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def count_connect(dbapi_connection, connection_record):
+        metrics.connects += 1
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def count_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.checkouts += 1
+
+    @event.listens_for(engine.sync_engine, "invalidate")
+    def count_invalidate(dbapi_connection, connection_record, exception):
+        metrics.invalidations += 1
+
+    if backend == "sqlite":
+        configure_sqlite(engine)
+    return engine
 
-engine = create_async_engine(
-    database_url,
-    echo=True,
-)
+
+# Inputs of replica_lag_seconds. pg_stat_wal_receiver only shows the status to superusers
+# and pg_read_all_stats members; other roles always fall back to the replay timestamp.
+REPLICA_STATUS_QUERY = text("""
+    SELECT
+        pg_is_in_recovery() AS in_recovery,
+        EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') AS streaming,
+        pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() AS replayed_all,
+        EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) AS replay_age
+""")
+
+
+def replica_lag_seconds(
+    *,
+    in_recovery: bool,
+    streaming: bool,
+    replayed_all: bool | None,
+    replay_age: float | None,
+) -> float | None:
+    """
+    Seconds the replica is behind, None if that cannot be told.
+
+    The last replay timestamp alone keeps growing while the primary is idle,
+    so a replica that is streaming and has replayed everything it received
+    counts as caught up. Without a streaming WAL receiver "everything it
+    received" may be long ago and only the replay timestamp is trusted.
+    A server that is not in recovery (e.g. a primary used as replica) is
+    never behind.
+    """
+    if not in_recovery:
+        return 0.0
+    if streaming and replayed_all:
+        return 0.0
+    if replay_age is None:
+        # Nothing replayed since startup
+        return 0.0 if streaming else None
+    return float(replay_age)
+
+
+class ReplicaRouter:
+    """
+    Hands out replica sessions while the replica is reachable and close
+    enough to the primary; otherwise returns None and the caller reads
+    from the primary. The health check runs at most once per
+    `check_seconds`, concurrent callers reuse the last verdict.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] | None,
+        *,
+        max_lag_seconds: float = DATABASE_REPLICA_MAX_LAG_SECONDS,
+        check_seconds: float = DATABASE_REPLICA_CHECK_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.session_factory = session_factory
+        self.max_lag_seconds = max_lag_seconds
+        self.check_seconds = check_seconds
+        self._clock = clock
+        self._checked_at = -math.inf
+        self._healthy = False
+
+        self.replica_sessions = 0
+        self.fallbacks = 0
+        self.lag_seconds: float | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.session_factory is not None
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "healthy": self._healthy,
+            "lag_seconds": self.lag_seconds,
+            "replica_sessions": self.replica_sessions,
+            "fallbacks": self.fallbacks,
+        }
+
+    async def _check(self) -> bool:
+        now = self._clock()
+        if now - self._checked_at < self.check_seconds:
+            return self._healthy
+        self._checked_at = now
+
+        try:
+            async with self.session_factory() as session:
+                if session.get_bind().dialect.name == "postgresql":
+                    status = (await session.execute(REPLICA_STATUS_QUERY)).one()
+                    lag = replica_lag_seconds(**status._mapping)
+                else:
+                    await session.execute(text("SELECT 1"))
+                    lag = 0.0
+            self.lag_seconds = lag
+            self._healthy = lag is not None and lag <= self.max_lag_seconds
+        except Exception as e:
+            print(f"Database replica unavailable, reading from primary: {e}")
+            self.lag_seconds = None
+            self._healthy = False
+        return self._healthy
+
+    async def open_session(self) -> AsyncSession | None:
+        if not self.enabled:
+            return None
+        if not await self._check():
+            self.fallbacks += 1
+            return None
+        self.replica_sessions += 1
+        return self.session_factory()
+
+
+pool_metrics = PoolMetrics()
+engine = create_engine_from_url(database_url, metrics=pool_metrics)
 
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
@@ -23,6 +271,23 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False,
 )
 
+replica_pool_metrics = PoolMetrics()
+replica_engine = (
+    create_engine_from_url(database_replica_url, metrics=replica_pool_metrics)
+    if database_replica_url else None
+)
+replica_router = ReplicaRouter(
+    async_sessionmaker(bind=replica_engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+    if replica_engine is not None else None
+)
+
+def run_after_commit(session: AsyncSession, callback: Callable[[], None]) -> None:
+    """
+    Call `callback` once the session's current transaction has committed, e.g.
+    to hand a new row to a background worker. Never called on rollback.
+    """
+    event.listen(session.sync_session, "after_commit", lambda _: callback(), once=True)
+
 async def init_db():
     async with engine.begin() as conn:
-        await conn.run_sync(DbModel.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(DbModel.metadata.create_all)
@@ -0,0 +1,89 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, TypeVar
+
+# Worker processes for CPU-bound work (GPX parsing, geometry); 0 = one per CPU, at most 4
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", 0))
+
+T = TypeVar("T")
+
+
+class CpuExecutor:
+    """
+    Process pool for CPU-bound work, so parsing a large upload never
+    stalls the event loop (and every socket on this worker with it).
+
+    The pool is created by the app lifespan. Until then, or when disabled,
+    work runs in the default thread pool instead: slower under load, but
+    still off the event loop. Functions and arguments must be picklable.
+    """
+
+    def __init__(self, *, max_workers: int = CPU_POOL_WORKERS):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self._pool: ProcessPoolExecutor | None = None
+
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.thread_runs = 0
+
+    def stats(self) -> dict[str, int | bool]:
+        return {
+            "running": self._pool is not None,
+            "workers": self.max_workers,
+            # Submitted but not finished; above `workers` means jobs are queueing
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "thread_runs": self.thread_runs,
+        }
+
+    def start(self) -> None:
+        if self._pool is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        call = functools.partial(func, *args, **kwargs)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self._pool is None:
+                self.thread_runs += 1
+                result = await asyncio.to_thread(call)
+            else:
+                try:
+                    result = await asyncio.get_running_loop().run_in_executor(self._pool, call)
+                except BrokenProcessPool:
+                    # A worker died (OOM kill, crash): replace the pool, finish this job in a thread
+                    print("Error: CPU process pool broken, restarting it")
+                    self._pool.shutdown(wait=False, cancel_futures=True)
+                    self._pool = None
+                    self.start()
+                    self.thread_runs += 1
+                    result = await asyncio.to_thread(call)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+        self.completed += 1
+        return result
+
+    async def stop(self) -> None:
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await asyncio.to_thread(pool.shutdown, wait=True, cancel_futures=True)
+
+
+cpu_executor = CpuExecutor()
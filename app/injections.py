@@ -3,9 +3,15 @@ from typing import Annotated, AsyncGenerator
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import AsyncSessionLocal
+from app.database import AsyncSessionLocal, replica_router
 
-from app.repositories import UserRepository, RideRepository, ParticipationRepository, RouteRepository
+from app.repositories import (
+    UserRepository,
+    RideRepository,
+    ParticipationRepository,
+    RouteRepository,
+    LocationHistoryRepository,
+)
 
 # def get_session(request: Request) -> Generator[Session]:
 #     with (session := Session(bind=request.app.state.database_engine)).begin():
@@ -16,6 +22,22 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
         async with session.begin():
             yield session
 
+async def get_read_session(
+        session: Annotated[AsyncSession, Depends(get_session)]
+) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Session for read-only handlers: the replica while it is healthy,
+    otherwise the request's primary session. Replica reads may lag
+    behind writes by up to DATABASE_REPLICA_MAX_LAG_SECONDS.
+    """
+    replica_session = await replica_router.open_session()
+    if replica_session is None:
+        yield session
+        return
+
+    async with replica_session:
+        yield replica_session
+
 def get_user_repository(
         session: Annotated[AsyncSession, Depends(get_session)]
 ) -> UserRepository:
@@ -36,3 +58,22 @@ def get_route_repository(
 ) -> RouteRepository:
     return RouteRepository(session=session)
 
+def get_location_history_repository(
+        session: Annotated[AsyncSession, Depends(get_session)]
+) -> LocationHistoryRepository:
+    return LocationHistoryRepository(session=session)
+
+def get_ride_read_repository(
+        session: Annotated[AsyncSession, Depends(get_read_session)]
+) -> RideRepository:
+    return RideRepository(session=session)
+
+def get_route_read_repository(
+        session: Annotated[AsyncSession, Depends(get_read_session)]
+) -> RouteRepository:
+    return RouteRepository(session=session)
+
+def get_location_history_read_repository(
+        session: Annotated[AsyncSession, Depends(get_read_session)]
+) -> LocationHistoryRepository:
+    return LocationHistoryRepository(session=session)
@@ -9,6 +9,13 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app import routers
 from app.database import engine, init_db
+from app.executors import cpu_executor
+from app.pubsub import FanoutPubSubManager
+from app.security import password_executor
+from app.retention import RIDE_ARCHIVE_ENABLED, ride_archiver
+from app.simplification import ROUTE_LOD_ENABLED, route_simplifier
+from app.services import location_buffer
+from app.utils.pagination import NEXT_CURSOR_HEADER
 
 load_dotenv()
 
@@ -18,8 +25,43 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None]:
 
     await init_db()
     print("Startup: (SUCCESS) Database initialized")
+
+    location_buffer.start()
+    print("Startup: (SUCCESS) Location write buffer started")
+
+    cpu_executor.start()
+    print(f"Startup: (SUCCESS) CPU process pool started ({cpu_executor.max_workers} workers)")
+
+    if RIDE_ARCHIVE_ENABLED:
+        ride_archiver.start()
+        print("Startup: (SUCCESS) Ride archiver started")
+
+    if ROUTE_LOD_ENABLED:
+        route_simplifier.start()
+        print("Startup: (SUCCESS) Route simplifier started")
     yield
 
+    print("Shutdown: Stopping ride archiver and route simplifier...")
+    await ride_archiver.stop()
+    await route_simplifier.stop()
+
+    print("Shutdown: Flushing pending location batches...")
+    from app.sockets import broadcaster, proximity, sio
+    await broadcaster.stop()
+    await proximity.stop()
+    if isinstance(sio.manager, FanoutPubSubManager):
+        await sio.manager.close()
+
+    print("Shutdown: Draining location write buffer...")
+    try:
+        await location_buffer.stop()
+    except Exception as e:
+        print(f"Shutdown: (ERROR) Failed to drain location buffer: {e}")
+
+    print("Shutdown: Stopping CPU and password hashing pools...")
+    await cpu_executor.stop()
+    password_executor.shutdown()
+
     print("Shutdown: Disposing database engine...")
     await engine.dispose()
     
@@ -39,6 +81,7 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER],
     )
 
     app.include_router(
@@ -2,9 +2,9 @@ import enum
 from sqlalchemy import Enum as SqlEnum
 
 from datetime import datetime
-from sqlalchemy import String, ForeignKey, func, DateTime, UniqueConstraint
+from sqlalchemy import String, ForeignKey, func, DateTime, UniqueConstraint, Index
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import Numeric, Text
+from sqlalchemy import BigInteger, Float, Integer, LargeBinary, Numeric, Text
 
 
 class DbModel(DeclarativeBase): 
@@ -36,8 +36,17 @@ class RouteVisibility(str, enum.Enum):
     SECRET = "secret"
 
 
+class BroadcastMode(str, enum.Enum):
+    PER_FIX = "per_fix"
+    BATCHED = "batched"
+
+
 class RouteModel(DbModel):
     __tablename__ = "routes"
+    __table_args__ = (
+        # Keyset pages of one creator's routes
+        Index("ix_routes_created_by_user_id_id", "created_by_user_id", "id"),
+    )
 
     id: Mapped[int]  = mapped_column(primary_key=True)
     title: Mapped[str] = mapped_column(String(length=100), nullable=False)
@@ -51,23 +60,88 @@ class RouteModel(DbModel):
     )
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    # Bumped by every write; identifies the content for ETags, updated_at can repeat within a second
+    revision: Mapped[int] = mapped_column(Integer, nullable=False, server_default="1")
 
     rides: Mapped[list["RideModel"]] = relationship(back_populates="route")
+    geometry: Mapped["RouteGeometryModel | None"] = relationship(
+        back_populates="route",
+        cascade="all, delete-orphan",
+    )
 
     def __repr__(self) -> str:
         return f"RouteModel(id={self.id!r}, title={self.title!r})"
 
 
+class RouteGeometryModel(DbModel):
+    """Geometry derived from a route's GPX when it is written, see app/utils/geometry.py."""
+    __tablename__ = "route_geometries"
+
+    route_id: Mapped[int] = mapped_column(
+        ForeignKey("routes.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    # GEOMETRY_VERSION of the packed points; the backfill rewrites older ones
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+    point_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    distance_meters: Mapped[float] = mapped_column(Float, nullable=False)
+    elevation_gain_meters: Mapped[float] = mapped_column(Float, nullable=False)
+    min_latitude: Mapped[float | None] = mapped_column(Float, nullable=True)
+    min_longitude: Mapped[float | None] = mapped_column(Float, nullable=True)
+    max_latitude: Mapped[float | None] = mapped_column(Float, nullable=True)
+    max_longitude: Mapped[float | None] = mapped_column(Float, nullable=True)
+    # Packed lat/lon/cumulative distance/elevation arrays
+    points: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    polyline: Mapped[str] = mapped_column(Text, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+    route: Mapped["RouteModel"] = relationship(back_populates="geometry")
+    levels: Mapped[list["RouteGeometryLevelModel"]] = relationship(
+        back_populates="geometry",
+        cascade="all, delete-orphan",
+    )
+
+    def __repr__(self) -> str:
+        return f"RouteGeometryModel(route_id={self.route_id!r}, point_count={self.point_count!r})"
+
+
+class RouteGeometryLevelModel(DbModel):
+    """Simplified polyline of a route for one map zoom, written by app/simplification.py."""
+    __tablename__ = "route_geometry_levels"
+
+    route_id: Mapped[int] = mapped_column(
+        ForeignKey("route_geometries.route_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    zoom: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    tolerance_m: Mapped[float] = mapped_column(Float, nullable=False)
+    point_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    polyline: Mapped[str] = mapped_column(Text, nullable=False)
+
+    geometry: Mapped["RouteGeometryModel"] = relationship(back_populates="levels")
+
+    def __repr__(self) -> str:
+        return f"RouteGeometryLevelModel(route_id={self.route_id!r}, zoom={self.zoom!r})"
+
+
 #------------------------ RIDE
 
 class RideModel(DbModel):
     __tablename__ = "rides"
+    __table_args__ = (
+        # Keyset pagination runs on (start_time, id), optionally after an equality filter
+        Index("ix_rides_start_time_id", "start_time", "id"),
+        Index("ix_rides_created_by_user_id_start_time_id", "created_by_user_id", "start_time", "id"),
+        Index("ix_rides_is_active_start_time_id", "is_active", "start_time", "id"),
+        # Archived rows keep their id: SQLite must never hand it out again
+        {"sqlite_autoincrement": True},
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     code: Mapped[str] = mapped_column(String(length=6), nullable=False, unique=True)
     title: Mapped[str] = mapped_column(String(length=100), nullable=False)
     description: Mapped[str | None] = mapped_column(Text, nullable=True)    
-    start_time: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
+    start_time: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
     route_id: Mapped[int] = mapped_column(
         ForeignKey("routes.id", ondelete="RESTRICT"),
         nullable=True,
@@ -89,6 +163,12 @@ class RideModel(DbModel):
     )
 
     visibility: Mapped[RouteVisibility] = mapped_column(SqlEnum(RouteVisibility), default=RouteVisibility.ALWAYS)
+    broadcast_mode: Mapped[BroadcastMode] = mapped_column(
+        SqlEnum(BroadcastMode),
+        nullable=False,
+        default=BroadcastMode.PER_FIX,
+        server_default=BroadcastMode.PER_FIX.name,
+    )
 
     def __repr__(self) -> str:
         return f"RideModel(id={self.id!r}, code={self.code!r}, title={self.title!r})"
@@ -100,6 +180,9 @@ class ParticipationModel(DbModel):
     __tablename__ = "participations"
     __table_args__ = (
         UniqueConstraint('user_id', 'ride_id', name='uix_user_ride'),
+        Index("ix_participations_ride_id_id", "ride_id", "id"),
+        Index("ix_participations_user_id_id", "user_id", "id"),
+        {"sqlite_autoincrement": True},
     )
 
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -121,8 +204,101 @@ class ParticipationModel(DbModel):
 
     participant: Mapped["UserModel"] = relationship(back_populates="participated_in_rides")
     ride: Mapped["RideModel"] = relationship(back_populates="has_participants")
+    location_history: Mapped[list["LocationHistoryModel"]] = relationship(
+        back_populates="participation",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
 
     def __repr__(self) -> str:
         return f"ParticipationModel(id={self.id!r}, user_id={self.user_id!r}, ride_id={self.ride_id!r})"
 
 
+#------------------------ LOCATION HISTORY
+
+class LocationHistoryModel(DbModel):
+    __tablename__ = "location_history"
+    __table_args__ = (
+        # Replay reads one participation's fixes in time order
+        Index("ix_location_history_participation_timestamp", "participation_id", "timestamp"),
+        {"sqlite_autoincrement": True},
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    participation_id: Mapped[int] = mapped_column(
+        ForeignKey("participations.id", ondelete="CASCADE"),
+        nullable=False,
+        )
+    latitude: Mapped[float] = mapped_column(Float, nullable=False)
+    longitude: Mapped[float] = mapped_column(Float, nullable=False)
+    speed: Mapped[float | None] = mapped_column(Float, nullable=True)
+    altitude: Mapped[float | None] = mapped_column(Float, nullable=True)
+    timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    participation: Mapped["ParticipationModel"] = relationship(back_populates="location_history")
+
+    def __repr__(self) -> str:
+        return f"LocationHistoryModel(id={self.id!r}, participation_id={self.participation_id!r}, timestamp={self.timestamp!r})"
+
+
+#------------------------ ARCHIVE
+
+# Cold copies of finished rides, moved out of the hot tables by app/retention.py.
+# No foreign keys: users and routes may be deleted long after a ride was archived.
+# Enum columns are kept as plain strings so archived rows survive enum changes.
+# Rows keep the id they had in the hot table, which is never reused.
+
+class RideArchiveModel(DbModel):
+    __tablename__ = "rides_archive"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    # Codes are only unique among live rides and may be handed out again
+    code: Mapped[str] = mapped_column(String(length=6), nullable=False, index=True)
+    title: Mapped[str] = mapped_column(String(length=100), nullable=False)
+    description: Mapped[str | None] = mapped_column(Text, nullable=True)
+    start_time: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    route_id: Mapped[int | None] = mapped_column(nullable=True)
+    created_by_user_id: Mapped[int] = mapped_column(nullable=False, index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    is_active: Mapped[bool] = mapped_column(nullable=False)
+    visibility: Mapped[str | None] = mapped_column(String(length=20), nullable=True)
+    broadcast_mode: Mapped[str] = mapped_column(String(length=20), nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    def __repr__(self) -> str:
+        return f"RideArchiveModel(id={self.id!r}, code={self.code!r}, title={self.title!r})"
+
+
+class ParticipationArchiveModel(DbModel):
+    __tablename__ = "participations_archive"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    user_id: Mapped[int] = mapped_column(nullable=False, index=True)
+    ride_id: Mapped[int] = mapped_column(nullable=False, index=True)
+    latitude: Mapped[float] = mapped_column(Numeric(10, 8), nullable=True)
+    longitude: Mapped[float] = mapped_column(Numeric(10, 8), nullable=True)
+    joined_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    location_timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"ParticipationArchiveModel(id={self.id!r}, user_id={self.user_id!r}, ride_id={self.ride_id!r})"
+
+
+class LocationHistoryArchiveModel(DbModel):
+    __tablename__ = "location_history_archive"
+    __table_args__ = (
+        Index("ix_location_history_archive_participation_timestamp", "participation_id", "timestamp"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=False)
+    participation_id: Mapped[int] = mapped_column(nullable=False)
+    latitude: Mapped[float] = mapped_column(Float, nullable=False)
+    longitude: Mapped[float] = mapped_column(Float, nullable=False)
+    speed: Mapped[float | None] = mapped_column(Float, nullable=True)
+    altitude: Mapped[float | None] = mapped_column(Float, nullable=True)
+    timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"LocationHistoryArchiveModel(id={self.id!r}, participation_id={self.participation_id!r}, timestamp={self.timestamp!r})"
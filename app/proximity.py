@@ -0,0 +1,295 @@
+import asyncio
+import os
+import time
+
+import socketio
+
+from app.broadcast import compact_room
+from app.utils.geo import HAS_NUMPY, dot_to_meters, np, unit_vectors
+from app.utils.metrics import LatencyHistogram
+
+# Needs NumPy, without it the engine stays off
+PROXIMITY_ENABLED = os.getenv("PROXIMITY_ENABLED", "true").lower() == "true"
+# Group safety radius: riders farther than this from the leader (or the group) get an alert
+PROXIMITY_RADIUS_M = float(os.getenv("PROXIMITY_RADIUS_M", 1500))
+# A rider counts as back once closer than radius * (1 - hysteresis), avoids flapping at the edge
+PROXIMITY_HYSTERESIS = float(os.getenv("PROXIMITY_HYSTERESIS", 0.1))
+PROXIMITY_TICK_MS = int(os.getenv("PROXIMITY_TICK_MS", 1000))
+# Forget a ride's positions after this many ticks without a fix
+PROXIMITY_IDLE_TICKS = int(os.getenv("PROXIMITY_IDLE_TICKS", 120))
+
+# Moved riders above this share of the ride: recompute the whole matrix in one product
+_FULL_RECOMPUTE_SHARE = 0.1
+
+
+class RideProximity:
+    """
+    Latest positions of one ride's riders as unit vectors, their pairwise
+    dot products and each rider's nearest neighbour.
+
+    Every tick only the rows of riders that moved are recomputed (k x n),
+    unless so many moved that one n x n product is cheaper.
+    """
+
+    def __init__(self, leader_id: int | None = None):
+        self.leader_id = leader_id
+        self.user_ids: list[int] = []
+        self._index: dict[int, int] = {}
+        # Latest (latitude, longitude) per user index, with spare rows for joiners
+        self.coordinates = np.empty((16, 2))
+        # User indexes with a fix since the last tick
+        self._pending: set[int] = set()
+
+        self.vectors = np.empty((0, 3))
+        self.dots = np.empty((0, 0))
+        self.nearest_dot = np.empty(0)
+        self.nearest_index = np.empty(0, dtype=np.intp)
+        self.outside = np.zeros(0, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    @property
+    def pending(self) -> int:
+        """Riders with a fix since the last tick."""
+        return len(self._pending)
+
+    def update(self, user_id: int, latitude: float, longitude: float) -> None:
+        index = self._index.get(user_id)
+        if index is None:
+            index = self._index[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+            if index == len(self.coordinates):
+                self.coordinates = np.concatenate((self.coordinates, np.empty_like(self.coordinates)))
+        self.coordinates[index] = (latitude, longitude)
+        self._pending.add(index)
+
+    def remove(self, user_id: int) -> bool:
+        """Drop a rider who left; everyone is re-checked on the next tick."""
+        index = self._index.pop(user_id, None)
+        if index is None:
+            return False
+        del self.user_ids[index]
+        self._index = {user_id: i for i, user_id in enumerate(self.user_ids)}
+        self.coordinates = np.delete(self.coordinates, index, axis=0)
+        self._pending = {i - (i > index) for i in self._pending if i != index}
+
+        # Already ticked: compact the computed rows too
+        if index < len(self.vectors):
+            self.vectors = np.delete(self.vectors, index, axis=0)
+            self.outside = np.delete(self.outside, index)
+            self.dots = np.delete(np.delete(self.dots, index, axis=0), index, axis=1)
+            self.nearest_dot = np.delete(self.nearest_dot, index)
+            self.nearest_index = np.delete(self.nearest_index, index)
+            self.nearest_index -= self.nearest_index > index
+            # Nearest neighbours and the group's center may have changed
+            self._pending.update(range(len(self.vectors)))
+        return True
+
+    def _grow(self, count: int) -> None:
+        # Riders join rarely, exact-size arrays keep every product contiguous
+        added = count - len(self.vectors)
+        self.vectors = np.concatenate((self.vectors, np.zeros((added, 3))))
+        self.outside = np.concatenate((self.outside, np.zeros(added, dtype=bool)))
+        self.nearest_dot = np.concatenate((self.nearest_dot, np.full(added, -np.inf)))
+        self.nearest_index = np.concatenate((self.nearest_index, np.zeros(added, dtype=np.intp)))
+        self.dots = np.empty((count, count))
+
+    def _recompute_all(self) -> None:
+        np.matmul(self.vectors, self.vectors.T, out=self.dots)
+        np.fill_diagonal(self.dots, -np.inf)
+        self.nearest_index = self.dots.argmax(axis=1)
+        self.nearest_dot = self.dots[np.arange(len(self.dots)), self.nearest_index]
+
+    def _recompute_moved(self, moved) -> None:
+        rows = self.vectors[moved] @ self.vectors.T
+        rows[np.arange(len(moved)), moved] = -np.inf
+        self.dots[moved] = rows
+        self.dots[:, moved] = rows.T
+
+        # Moved riders: their new rows decide
+        self.nearest_index[moved] = rows.argmax(axis=1)
+        self.nearest_dot[moved] = rows[np.arange(len(moved)), self.nearest_index[moved]]
+
+        # Others whose nearest neighbour moved away: rescan their rows
+        is_moved = np.zeros(len(self), dtype=bool)
+        is_moved[moved] = True
+        stale = np.flatnonzero(is_moved[self.nearest_index] & ~is_moved)
+        if len(stale):
+            self.nearest_index[stale] = self.dots[stale].argmax(axis=1)
+            self.nearest_dot[stale] = self.dots[stale, self.nearest_index[stale]]
+
+        # Everyone else: a moved rider may have come closer
+        closer_index = moved[rows.argmax(axis=0)]
+        closer_dot = rows.max(axis=0)
+        better = ~is_moved & (closer_dot > self.nearest_dot)
+        self.nearest_index[better] = closer_index[better]
+        self.nearest_dot[better] = closer_dot[better]
+
+    def tick(self, radius_m: float, hysteresis: float) -> list[dict]:
+        """Apply pending fixes and return the riders that crossed the radius since the last tick."""
+        if not self._pending:
+            return []
+
+        count = len(self)
+        full = len(self.vectors) != count
+        if full:
+            self._grow(count)
+
+        moved = np.fromiter(self._pending, dtype=np.intp, count=len(self._pending))
+        self._pending.clear()
+        coordinates = self.coordinates[moved]
+        self.vectors[moved] = unit_vectors(coordinates[:, 0], coordinates[:, 1])
+
+        if full or len(moved) > count * _FULL_RECOMPUTE_SHARE:
+            self._recompute_all()
+        else:
+            self._recompute_moved(moved)
+
+        # Distance to the leader if they are riding, else to the group's center
+        leader = self._index.get(self.leader_id)
+        if leader is not None and count > 1:
+            reference = "leader"
+            reference_dots = self.dots[leader].copy()
+            reference_dots[leader] = 1.0
+        else:
+            reference = "group"
+            center = self.vectors.sum(axis=0)
+            reference_dots = self.vectors @ (center / np.linalg.norm(center))
+        distances = dot_to_meters(reference_dots)
+
+        outside = np.where(self.outside, distances > radius_m * (1 - hysteresis), distances > radius_m)
+        changed = np.flatnonzero(outside != self.outside)
+        self.outside = outside
+        if not len(changed):
+            return []
+
+        nearest = dot_to_meters(self.nearest_dot[changed]) if count > 1 else None
+        return [
+            {
+                "user_id": self.user_ids[index],
+                "status": "outside" if outside[index] else "inside",
+                "distance_m": round(float(distances[index]), 1),
+                "radius_m": radius_m,
+                "reference": reference,
+                "nearest_user_id": self.user_ids[self.nearest_index[index]] if count > 1 else None,
+                "nearest_m": round(float(nearest[i]), 1) if count > 1 else None,
+            }
+            for i, index in enumerate(changed)
+        ]
+
+
+class ProximityEngine:
+    """
+    Server-side group-radius tracking fed by the live location stream.
+
+    Every PROXIMITY_TICK_MS the engine applies the fixes each ride got
+    since the last tick and sends a `proximity_alert` to the ride's rooms
+    for every rider who left (status 'outside') or came back within
+    ('inside') the safety radius. Alerts go to this worker's sockets only:
+    with a cross-process client manager every worker tracks all positions
+    from the relayed location events and alerts its own sockets.
+    """
+
+    def __init__(
+        self,
+        server: socketio.AsyncServer,
+        *,
+        enabled: bool = PROXIMITY_ENABLED,
+        radius_m: float = PROXIMITY_RADIUS_M,
+        hysteresis: float = PROXIMITY_HYSTERESIS,
+        tick_interval_ms: int = PROXIMITY_TICK_MS,
+        idle_ticks: int = PROXIMITY_IDLE_TICKS,
+    ):
+        if enabled and not HAS_NUMPY:
+            print("Proximity engine disabled: NumPy is not installed")
+        self.server = server
+        self.enabled = enabled and HAS_NUMPY
+        self.radius_m = radius_m
+        self.hysteresis = hysteresis
+        self.tick_interval = tick_interval_ms / 1000
+        self.idle_ticks = idle_ticks
+
+        self._rides: dict[str, RideProximity] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+
+        self.ticks = 0
+        self.alerts_sent = 0
+        self.tick_latency = LatencyHistogram((0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25))
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "rides": len(self._rides),
+            "riders": sum(len(ride) for ride in self._rides.values()),
+            "ticks": self.ticks,
+            "alerts_sent": self.alerts_sent,
+            "tick_latency": self.tick_latency.stats(),
+            "radius_m": self.radius_m,
+        }
+
+    def update(self, ride_code: str, user_id: int, latitude: float, longitude: float, *, leader_id: int | None = None) -> None:
+        if not self.enabled:
+            return
+        ride = self._rides.get(ride_code)
+        if ride is None:
+            ride = self._rides[ride_code] = RideProximity(leader_id)
+        ride.update(user_id, latitude, longitude)
+        if ride_code not in self._tasks:
+            self._tasks[ride_code] = asyncio.create_task(self._run(ride_code))
+
+    def forget(self, ride_code: str, user_id: int) -> None:
+        """The rider left the ride or disconnected, stop counting their last position."""
+        ride = self._rides.get(ride_code)
+        if ride is not None:
+            ride.remove(user_id)
+
+    def forget_ride(self, ride_code: str) -> None:
+        """The ride was archived, drop its positions and stop its tick loop."""
+        self._rides.pop(ride_code, None)
+        task = self._tasks.pop(ride_code, None)
+        if task is not None:
+            task.cancel()
+
+    async def tick(self, ride_code: str) -> int:
+        """Recompute one ride and send its alerts, returns the number of fixes applied."""
+        ride = self._rides.get(ride_code)
+        if ride is None or not ride.pending:
+            return 0
+
+        started_at = time.perf_counter()
+        applied = ride.pending
+        alerts = ride.tick(self.radius_m, self.hysteresis)
+        self.tick_latency.observe(time.perf_counter() - started_at)
+        self.ticks += 1
+
+        for alert in alerts:
+            await self.server.emit(
+                'proximity_alert',
+                {'ride_code': ride_code, **alert},
+                room=[ride_code, compact_room(ride_code)],
+                ignore_queue=True,
+            )
+        self.alerts_sent += len(alerts)
+        return applied
+
+    async def _run(self, ride_code: str) -> None:
+        idle = 0
+        try:
+            while idle < self.idle_ticks:
+                await asyncio.sleep(self.tick_interval)
+                try:
+                    applied = await self.tick(ride_code)
+                except Exception as e:
+                    print(f"Error computing proximity for ride {ride_code}: {e}")
+                    applied = 0
+                idle = 0 if applied else idle + 1
+        finally:
+            self._tasks.pop(ride_code, None)
+            self._rides.pop(ride_code, None)
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,404 @@
+"""
+Cross-process Socket.IO client managers.
+
+Every uvicorn worker only holds its own sockets and rooms. With one of
+these managers emits and room changes also go to a shared channel, and
+each worker delivers them to the sockets it holds, so riders connected
+to different workers (or nodes) see each other:
+
+    SOCKETIO_MANAGER_URL=postgresql://...   PostgreSQL LISTEN/NOTIFY
+    SOCKETIO_MANAGER_URL=tcp://host:port    the bundled broker, `python -m app.pubsub`
+
+Unset keeps python-socketio's single-process in-memory manager.
+Delivery is at-most-once: messages published while a worker reconnects
+are lost, which live location streams tolerate.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+from collections import OrderedDict
+from typing import Awaitable, Callable
+from urllib.parse import urlsplit
+
+from socketio import AsyncManager
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+SOCKETIO_MANAGER_URL = os.getenv("SOCKETIO_MANAGER_URL") or None
+SOCKETIO_CHANNEL = os.getenv("SOCKETIO_CHANNEL", "saferide_socketio")
+# Seconds between reconnect attempts to the broker/database
+SOCKETIO_RECONNECT_SECONDS = float(os.getenv("SOCKETIO_RECONNECT_SECONDS", 1))
+# Broker: messages buffered for a slow subscriber before it is disconnected
+SOCKETIO_BROKER_QUEUE_SIZE = int(os.getenv("SOCKETIO_BROKER_QUEUE_SIZE", 10000))
+
+SOCKETIO_BROKER_PORT = 8765
+# Longest line the broker protocol accepts (one serialized emit)
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_MAX_BYTES = 7900
+
+RemoteEmitListener = Callable[[str, object, str | None], Awaitable[None]]
+
+
+class FanoutPubSubManager(AsyncPubSubManager):
+    """Counters, remote emit listeners and shutdown shared by the backends."""
+
+    def __init__(self, channel: str = SOCKETIO_CHANNEL, write_only: bool = False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self._remote_listeners: list[RemoteEmitListener] = []
+        # Set while the listening side is subscribed to the channel
+        self.subscribed = asyncio.Event()
+
+        self.published = 0
+        self.received = 0
+        self.publish_errors = 0
+        self.reconnects = 0
+
+    def add_remote_listener(self, listener: RemoteEmitListener) -> None:
+        """Call `listener(event, data, room)` for every JSON emit another process made."""
+        self._remote_listeners.append(listener)
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "backend": self.name,
+            "channel": self.channel,
+            "subscribed": self.subscribed.is_set(),
+            "published": self.published,
+            "received": self.received,
+            "publish_errors": self.publish_errors,
+            "reconnects": self.reconnects,
+        }
+
+    async def _handle_emit(self, message):
+        await super()._handle_emit(message)
+        if message.get('host_id') == self.host_id or message.get('binary'):
+            return
+        for listener in self._remote_listeners:
+            try:
+                await listener(message['event'], message['data'], message.get('room'))
+            except Exception as e:
+                print(f"Error in remote emit listener for {message['event']}: {e}")
+
+    async def close(self) -> None:
+        """Stop listening and close the backend connections."""
+        task = getattr(self, 'thread', None)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self.subscribed.clear()
+        await self._close_connections()
+
+    async def _close_connections(self) -> None:
+        """Close the backend's connections; backends without any keep this no-op."""
+
+
+class BrokerPubSubManager(FanoutPubSubManager):
+    """Client of `MessageBroker`, one connection to publish and one to listen."""
+
+    name = 'broker'
+
+    def __init__(self, url: str, channel: str = SOCKETIO_CHANNEL, write_only: bool = False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or SOCKETIO_BROKER_PORT
+
+        self._writer: asyncio.StreamWriter | None = None
+        self._listen_writer: asyncio.StreamWriter | None = None
+        self._lock = asyncio.Lock()
+
+    async def _publish(self, data):
+        line = f"PUB {self.channel} {self.host_id} {json.dumps(data)}\n".encode()
+        try:
+            async with self._lock:
+                if self._writer is None or self._writer.is_closing():
+                    _, self._writer = await asyncio.open_connection(self.host, self.port)
+                self._writer.write(line)
+                await self._writer.drain()
+            self.published += 1
+        except OSError as e:
+            # Local sockets already got the message, only other workers miss it
+            self._writer = None
+            self.publish_errors += 1
+            print(f"Socket.IO broker publish failed: {e}")
+
+    async def _listen(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(
+                    self.host, self.port, limit=MAX_MESSAGE_BYTES,
+                )
+                writer.write(f"SUB {self.channel} {self.host_id}\n".encode())
+                await writer.drain()
+            except OSError as e:
+                print(f"Socket.IO broker unavailable at {self.host}:{self.port}: {e}")
+            else:
+                self._listen_writer = writer
+                self.subscribed.set()
+                try:
+                    while line := await reader.readline():
+                        self.received += 1
+                        yield line.decode()
+                except (OSError, ValueError) as e:
+                    print(f"Socket.IO broker connection error: {e}")
+                finally:
+                    self.subscribed.clear()
+                    writer.close()
+                print("Socket.IO broker connection lost, reconnecting")
+
+            self.reconnects += 1
+            await asyncio.sleep(SOCKETIO_RECONNECT_SECONDS)
+
+    async def _close_connections(self) -> None:
+        for writer in (self._writer, self._listen_writer):
+            if writer is not None and not writer.is_closing():
+                writer.close()
+        self._writer = self._listen_writer = None
+
+
+def split_notify_payload(payload: str, message_id: str, *, max_bytes: int = NOTIFY_MAX_BYTES) -> list[str]:
+    """
+    Split an (ASCII) payload into NOTIFY-sized parts
+    `~<message_id>:<seq>:<total>:<part>`; short payloads are sent as is.
+    """
+    if len(payload) <= max_bytes:
+        return [payload]
+    size = max_bytes - len(message_id) - 32
+    parts = [payload[i:i + size] for i in range(0, len(payload), size)]
+    return [f"~{message_id}:{seq}:{len(parts)}:{part}" for seq, part in enumerate(parts)]
+
+
+class ChunkAssembler:
+    """Joins the parts of `split_notify_payload`, dropping the oldest incomplete messages."""
+
+    def __init__(self, *, max_pending: int = 64):
+        self.max_pending = max_pending
+        self._pending: OrderedDict[str, list[str | None]] = OrderedDict()
+
+    def feed(self, payload: str) -> str | None:
+        if not payload.startswith("~"):
+            return payload
+
+        message_id, seq, total, part = payload[1:].split(":", 3)
+        parts = self._pending.get(message_id)
+        if parts is None:
+            parts = self._pending[message_id] = [None] * int(total)
+            if len(self._pending) > self.max_pending:
+                self._pending.popitem(last=False)
+        parts[int(seq)] = part
+
+        if None in parts:
+            return None
+        del self._pending[message_id]
+        return "".join(parts)
+
+
+class PostgresPubSubManager(FanoutPubSubManager):
+    """
+    LISTEN/NOTIFY on the application's PostgreSQL, no extra service needed.
+    Messages above the NOTIFY payload limit are sent in parts.
+    """
+
+    name = 'postgres'
+
+    def __init__(self, url: str, channel: str = SOCKETIO_CHANNEL, write_only: bool = False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        # asyncpg takes a plain libpq DSN
+        self.dsn = url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+        self._publisher = None
+        self._listener = None
+        self._lock = asyncio.Lock()
+        self._message_ids = itertools.count()
+
+    async def _publish(self, data):
+        import asyncpg
+
+        # json.dumps escapes non-ASCII, so characters == bytes for the size limit
+        parts = split_notify_payload(json.dumps(data), f"{self.host_id}.{next(self._message_ids)}")
+        try:
+            async with self._lock:
+                if self._publisher is None or self._publisher.is_closed():
+                    self._publisher = await asyncpg.connect(self.dsn)
+                for part in parts:
+                    await self._publisher.execute("SELECT pg_notify($1, $2)", self.channel, part)
+            self.published += 1
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+            self._publisher = None
+            self.publish_errors += 1
+            print(f"Socket.IO NOTIFY failed: {e}")
+
+    async def _listen(self):
+        import asyncpg
+
+        queue: asyncio.Queue[str] = asyncio.Queue()
+        assembler = ChunkAssembler()
+
+        def on_notification(connection, pid, channel, payload):
+            # Our own parts would only be reassembled to be ignored
+            if not payload.startswith(f"~{self.host_id}."):
+                queue.put_nowait(payload)
+
+        while True:
+            try:
+                self._listener = await asyncpg.connect(self.dsn)
+                await self._listener.add_listener(self.channel, on_notification)
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                print(f"Socket.IO LISTEN failed: {e}")
+            else:
+                self.subscribed.set()
+                while not self._listener.is_closed():
+                    try:
+                        payload = await asyncio.wait_for(queue.get(), SOCKETIO_RECONNECT_SECONDS)
+                    except asyncio.TimeoutError:
+                        continue
+                    message = assembler.feed(payload)
+                    if message is not None:
+                        self.received += 1
+                        yield message
+                self.subscribed.clear()
+                print("Socket.IO LISTEN connection lost, reconnecting")
+
+            self.reconnects += 1
+            await asyncio.sleep(SOCKETIO_RECONNECT_SECONDS)
+
+    async def _close_connections(self) -> None:
+        for connection in (self._publisher, self._listener):
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        self._publisher = self._listener = None
+
+
+def create_client_manager(url: str | None = SOCKETIO_MANAGER_URL) -> AsyncManager | None:
+    """Manager for SOCKETIO_MANAGER_URL, None keeps the in-memory default."""
+    if not url:
+        return None
+    scheme = urlsplit(url).scheme
+    if scheme.startswith("postgresql"):
+        return PostgresPubSubManager(url)
+    if scheme == "tcp":
+        return BrokerPubSubManager(url)
+    raise ValueError(f"Unsupported SOCKETIO_MANAGER_URL scheme: {scheme}")
+
+
+class _Subscriber:
+    def __init__(self, host_id: bytes, writer: asyncio.StreamWriter, queue_size: int):
+        self.host_id = host_id
+        self.writer = writer
+        self.queue: asyncio.Queue[bytes] = asyncio.Queue(queue_size)
+        self.task = asyncio.create_task(self._send())
+
+    async def _send(self) -> None:
+        try:
+            while True:
+                self.writer.write(await self.queue.get())
+                # Coalesce bursts into one flush
+                if self.queue.empty():
+                    await self.writer.drain()
+        except OSError:
+            self.writer.close()
+
+
+class MessageBroker:
+    """
+    Line-based fan-out broker for `BrokerPubSubManager`, so the workers of
+    a host (or a few nodes) share rooms without Redis. One command per line:
+
+        SUB <channel> <host_id>            this connection receives the channel
+        PUB <channel> <host_id> <payload>  send payload to the other hosts' subscribers
+
+    A subscriber more than `queue_size` messages behind is disconnected and
+    reconnects on its own.
+    """
+
+    def __init__(self, *, queue_size: int = SOCKETIO_BROKER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: dict[bytes, set[_Subscriber]] = {}
+        self._server: asyncio.Server | None = None
+
+        self.published = 0
+        self.delivered = 0
+        self.dropped_subscribers = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped_subscribers": self.dropped_subscribers,
+        }
+
+    async def start(self, host: str = "127.0.0.1", port: int = SOCKETIO_BROKER_PORT) -> int:
+        """Start listening, returns the bound port (useful with port 0)."""
+        self._server = await asyncio.start_server(self._handle, host, port, limit=MAX_MESSAGE_BYTES)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+        for subscribers in self._subscribers.values():
+            for subscriber in subscribers:
+                subscriber.task.cancel()
+                subscriber.writer.close()
+        self._subscribers.clear()
+        if self._server is not None:
+            await self._server.wait_closed()
+            self._server = None
+
+    def _fan_out(self, channel: bytes, host_id: bytes, payload: bytes) -> None:
+        self.published += 1
+        for subscriber in list(self._subscribers.get(channel, ())):
+            if subscriber.host_id == host_id:
+                continue
+            try:
+                subscriber.queue.put_nowait(payload)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                self.dropped_subscribers += 1
+                self._subscribers[channel].discard(subscriber)
+                subscriber.task.cancel()
+                subscriber.writer.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        subscription: tuple[bytes, _Subscriber] | None = None
+        try:
+            while line := await reader.readline():
+                command, _, rest = line.partition(b" ")
+                if command == b"PUB":
+                    channel, host_id, payload = rest.split(b" ", 2)
+                    self._fan_out(channel, host_id, payload)
+                elif command == b"SUB" and subscription is None:
+                    channel, host_id = rest.split()
+                    subscriber = _Subscriber(host_id, writer, self.queue_size)
+                    self._subscribers.setdefault(channel, set()).add(subscriber)
+                    subscription = (channel, subscriber)
+        except (OSError, ValueError) as e:
+            print(f"Broker connection dropped: {e}")
+        finally:
+            if subscription is not None:
+                channel, subscriber = subscription
+                self._subscribers.get(channel, set()).discard(subscriber)
+                subscriber.task.cancel()
+            writer.close()
+
+
+async def run_broker(host: str, port: int) -> None:
+    broker = MessageBroker()
+    port = await broker.start(host, port)
+    print(f"Socket.IO broker listening on {host}:{port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await broker.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fan-out broker for SOCKETIO_MANAGER_URL=tcp://host:port")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=SOCKETIO_BROKER_PORT)
+    args = parser.parse_args()
+    try:
+        asyncio.run(run_broker(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
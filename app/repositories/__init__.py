@@ -2,10 +2,14 @@ from app.repositories.user import UserRepository
 from app.repositories.ride import RideRepository
 from app.repositories.participation import ParticipationRepository
 from app.repositories.route import RouteRepository
+from app.repositories.location_history import LocationHistoryRepository
+from app.repositories.archive import ArchiveRepository
 
 __all__ = [
     "UserRepository",
     "RideRepository",
     "ParticipationRepository",
     "RouteRepository",
+    "LocationHistoryRepository",
+    "ArchiveRepository",
 ]
\ No newline at end of file
@@ -0,0 +1,111 @@
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Row, and_, delete, insert, or_, select
+
+from typing import Sequence
+
+from app.models import (
+    LocationHistoryArchiveModel,
+    LocationHistoryModel,
+    ParticipationArchiveModel,
+    ParticipationModel,
+    RideArchiveModel,
+    RideModel,
+)
+
+RIDE_COLUMNS = (
+    "id", "code", "title", "description", "start_time", "route_id", "created_by_user_id",
+    "created_at", "updated_at", "is_active", "visibility", "broadcast_mode",
+)
+PARTICIPATION_COLUMNS = (
+    "id", "user_id", "ride_id", "latitude", "longitude", "joined_at", "updated_at", "location_timestamp",
+)
+HISTORY_COLUMNS = ("id", "participation_id", "latitude", "longitude", "speed", "altitude", "timestamp")
+
+
+class ArchiveRepository:
+    session: AsyncSession
+
+    def __init__(self, *, session: AsyncSession):
+        self.session = session
+
+    async def get_archivable_rides(self, *, cutoff: datetime, limit: int) -> Sequence[Row[tuple[int, str]]]:
+        """
+        (id, code) of rides that started before `cutoff`, or were deactivated
+        before it, and have had no location fix since.
+        """
+        statement = (
+            select(RideModel.id, RideModel.code)
+            .where(
+                or_(
+                    RideModel.start_time < cutoff,
+                    and_(RideModel.is_active.is_(False), RideModel.updated_at < cutoff),
+                ),
+                # A ride that is still being ridden stays hot however old it is
+                ~RideModel.has_participants.any(ParticipationModel.location_timestamp >= cutoff),
+            )
+            .order_by(RideModel.start_time.asc(), RideModel.id.asc())
+            .limit(limit)
+        )
+        result = await self.session.execute(statement)
+        return result.all()
+
+    async def archive_rides(self, *, ride_ids: Sequence[int]) -> dict[str, int]:
+        """
+        Copy rides, their participations and location history into the
+        archive tables and delete them from the hot ones, all with
+        set-based INSERT ... SELECT / DELETE statements.
+        """
+        if not ride_ids:
+            return {"rides": 0, "participations": 0, "location_history": 0}
+
+        participation_ids = (
+            select(ParticipationModel.id)
+            .where(ParticipationModel.ride_id.in_(ride_ids))
+            .scalar_subquery()
+        )
+
+        await self.session.execute(
+            insert(LocationHistoryArchiveModel).from_select(
+                HISTORY_COLUMNS,
+                select(*(getattr(LocationHistoryModel, column) for column in HISTORY_COLUMNS))
+                .where(LocationHistoryModel.participation_id.in_(participation_ids)),
+            )
+        )
+        await self.session.execute(
+            insert(ParticipationArchiveModel).from_select(
+                PARTICIPATION_COLUMNS,
+                select(*(getattr(ParticipationModel, column) for column in PARTICIPATION_COLUMNS))
+                .where(ParticipationModel.ride_id.in_(ride_ids)),
+            )
+        )
+        await self.session.execute(
+            insert(RideArchiveModel).from_select(
+                RIDE_COLUMNS,
+                select(*(getattr(RideModel, column) for column in RIDE_COLUMNS))
+                .where(RideModel.id.in_(ride_ids)),
+            )
+        )
+
+        # Children first, SQLite does not enforce ON DELETE CASCADE by default
+        history = await self.session.execute(
+            delete(LocationHistoryModel)
+            .where(LocationHistoryModel.participation_id.in_(participation_ids))
+            .execution_options(synchronize_session=False)
+        )
+        participations = await self.session.execute(
+            delete(ParticipationModel)
+            .where(ParticipationModel.ride_id.in_(ride_ids))
+            .execution_options(synchronize_session=False)
+        )
+        rides = await self.session.execute(
+            delete(RideModel)
+            .where(RideModel.id.in_(ride_ids))
+            .execution_options(synchronize_session=False)
+        )
+        return {
+            "rides": rides.rowcount,
+            "participations": participations.rowcount,
+            "location_history": history.rowcount,
+        }
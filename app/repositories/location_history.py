@@ -0,0 +1,81 @@
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import insert, select
+
+from typing import AsyncIterator, Sequence
+
+from app.models import LocationHistoryModel, ParticipationModel
+
+HISTORY_COLUMNS = ("participation_id", "latitude", "longitude", "speed", "altitude", "timestamp")
+# Rows per multi-row INSERT, keeps the bound parameters well below driver limits
+INSERT_CHUNK_SIZE = 1000
+# Rows fetched per round trip when streaming history
+STREAM_CHUNK_SIZE = 1000
+
+
+class LocationHistoryRepository:
+    session: AsyncSession
+
+    def __init__(self, *, session: AsyncSession):
+        self.session = session
+
+    async def append_many(self, *, rows: Sequence[dict]) -> int:
+        """
+        Append fixes in bulk: COPY on PostgreSQL, multi-row INSERTs elsewhere.
+        rows: [{'participation_id', 'latitude', 'longitude', 'speed', 'altitude', 'timestamp'}]
+        """
+        if not rows:
+            return 0
+
+        if self.session.get_bind().dialect.name == "postgresql":
+            connection = await self.session.connection()
+            raw_connection = await connection.get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(
+                LocationHistoryModel.__tablename__,
+                records=[tuple(row.get(column) for column in HISTORY_COLUMNS) for row in rows],
+                columns=HISTORY_COLUMNS,
+            )
+            return len(rows)
+
+        for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+            chunk = [
+                {column: row.get(column) for column in HISTORY_COLUMNS}
+                for row in rows[start:start + INSERT_CHUNK_SIZE]
+            ]
+            await self.session.execute(insert(LocationHistoryModel).values(chunk))
+        return len(rows)
+
+    async def stream_for_ride(
+        self,
+        *,
+        ride_id: int,
+        start: datetime | None = None,
+        end: datetime | None = None,
+    ) -> AsyncIterator[dict]:
+        """
+        Yield a ride's fixes in time order through a server-side cursor,
+        so memory stays bounded however long the ride was.
+        """
+        statement = (
+            select(
+                ParticipationModel.user_id,
+                LocationHistoryModel.latitude,
+                LocationHistoryModel.longitude,
+                LocationHistoryModel.speed,
+                LocationHistoryModel.altitude,
+                LocationHistoryModel.timestamp,
+            )
+            .join(ParticipationModel, ParticipationModel.id == LocationHistoryModel.participation_id)
+            .where(ParticipationModel.ride_id == ride_id)
+            .order_by(LocationHistoryModel.timestamp, LocationHistoryModel.id)
+            .execution_options(yield_per=STREAM_CHUNK_SIZE)
+        )
+        if start is not None:
+            statement = statement.where(LocationHistoryModel.timestamp >= start)
+        if end is not None:
+            statement = statement.where(LocationHistoryModel.timestamp < end)
+
+        result = await self.session.stream(statement)
+        async for row in result.mappings():
+            yield dict(row)
@@ -2,7 +2,7 @@ from datetime import datetime
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
-from sqlalchemy import select
+from sqlalchemy import bindparam, select, update
 from sqlalchemy.exc import IntegrityError
 
 from typing import Sequence
@@ -43,8 +43,21 @@ class ParticipationRepository:
         result = await self.session.get(ParticipationModel, participation_id)
         return result
     
-    async def get_all_participations(self) -> Sequence[ParticipationModel]:
-        statement = select(ParticipationModel)
+    async def get_participations_page(
+            self,
+            *,
+            limit: int,
+            after: int | None = None,
+            ride_id: int | None = None,
+            user_id: int | None = None,
+    ) -> Sequence[ParticipationModel]:
+        statement = select(ParticipationModel).order_by(ParticipationModel.id.asc()).limit(limit)
+        if after is not None:
+            statement = statement.where(ParticipationModel.id > after)
+        if ride_id is not None:
+            statement = statement.where(ParticipationModel.ride_id == ride_id)
+        if user_id is not None:
+            statement = statement.where(ParticipationModel.user_id == user_id)
         result = await self.session.execute(statement)
         return result.scalars().all()
 
@@ -94,6 +107,50 @@ class ParticipationRepository:
 
         return participation
 
+    async def bulk_update_locations(self, *, updates: Sequence[dict]) -> int:
+        """
+        Write many live positions with a single executemany UPDATE by primary key.
+        updates: [{'participation_id', 'latitude', 'longitude', 'location_timestamp'}]
+        """
+        if not updates:
+            return 0
+
+        participations = ParticipationModel.__table__
+        statement = (
+            update(participations)
+            .where(participations.c.id == bindparam("b_id"))
+            .values(
+                latitude=bindparam("b_latitude"),
+                longitude=bindparam("b_longitude"),
+                location_timestamp=bindparam("b_location_timestamp"),
+            )
+        )
+        params = [
+            {
+                "b_id": item["participation_id"],
+                "b_latitude": item["latitude"],
+                "b_longitude": item["longitude"],
+                "b_location_timestamp": item["location_timestamp"],
+            }
+            for item in updates
+        ]
+        result = await self.session.execute(statement, params)
+        return result.rowcount
+
+    async def get_existing_ids(self, *, participation_ids: Sequence[int], lock: bool = False) -> set[int]:
+        """
+        The ids that still exist. With `lock` they stay locked against deletion
+        (FOR KEY SHARE on PostgreSQL) until the transaction ends, so rows
+        referencing them can be inserted.
+        """
+        if not participation_ids:
+            return set()
+        statement = select(ParticipationModel.id).where(ParticipationModel.id.in_(set(participation_ids)))
+        if lock:
+            statement = statement.with_for_update(key_share=True)
+        result = await self.session.execute(statement)
+        return set(result.scalars().all())
+
     async def delete_participation(
         self,
         *, 
@@ -1,13 +1,52 @@
+from dataclasses import dataclass
 from datetime import datetime
+import os
 
 from sqlalchemy.ext.asyncio import AsyncSession 
 from sqlalchemy.orm import  joinedload
-from sqlalchemy import select
+from sqlalchemy import Row, select, tuple_
 
 from typing import Sequence
 import secrets, string
 
-from app.models import ParticipationModel, RideModel, RouteVisibility
+from app.models import BroadcastMode, ParticipationModel, RideModel, RouteVisibility
+from app.utils.cache import TTLCache
+
+RIDE_CACHE_MAX_SIZE = int(os.getenv("RIDE_CACHE_MAX_SIZE", 1024))
+RIDE_CACHE_TTL_SECONDS = float(os.getenv("RIDE_CACHE_TTL_SECONDS", 300))
+
+
+@dataclass(frozen=True, slots=True)
+class RideRecord:
+    """Immutable snapshot of the ride fields needed on the socket hot path."""
+    id: int
+    code: str
+    is_active: bool
+    visibility: RouteVisibility
+    route_id: int | None
+    broadcast_mode: BroadcastMode
+    created_by_user_id: int
+
+    @classmethod
+    def from_model(cls, ride: RideModel) -> "RideRecord":
+        return cls(
+            id=ride.id,
+            code=ride.code,
+            is_active=ride.is_active,
+            visibility=ride.visibility,
+            route_id=ride.route_id,
+            broadcast_mode=ride.broadcast_mode,
+            created_by_user_id=ride.created_by_user_id,
+        )
+
+
+# Ride code -> RideRecord. Invalidated by update_ride/delete_ride in this process (and
+# again by the routers once the change commits), other workers see the change after
+# RIDE_CACHE_TTL_SECONDS at the latest.
+ride_code_cache: TTLCache[str, RideRecord] = TTLCache(
+    max_size=RIDE_CACHE_MAX_SIZE,
+    ttl_seconds=RIDE_CACHE_TTL_SECONDS,
+)
 
 
 class RideRepository:
@@ -38,7 +77,8 @@ class RideRepository:
             start_time: datetime,
             created_by_user_id: int,
             route_id: int | None = None,
-            visibility: RouteVisibility = RouteVisibility.ALWAYS
+            visibility: RouteVisibility = RouteVisibility.ALWAYS,
+            broadcast_mode: BroadcastMode = BroadcastMode.PER_FIX,
         ) -> RideModel:
         unique_code = await self._generate_unique_code()
         new_ride = RideModel(
@@ -48,7 +88,8 @@ class RideRepository:
             start_time=start_time,
             created_by_user_id=created_by_user_id,
             route_id=route_id,
-            visibility=visibility
+            visibility=visibility,
+            broadcast_mode=broadcast_mode,
         ) 
 
         self.session.add(new_ride)
@@ -66,8 +107,28 @@ class RideRepository:
 
         return new_ride
 
-    async def get_all_rides(self) -> Sequence[RideModel]:
-        statement = select(RideModel)
+    async def get_rides_page(
+            self,
+            *,
+            limit: int,
+            after: tuple[datetime, int] | None = None,
+            start_from: datetime | None = None,
+            start_to: datetime | None = None,
+            is_active: bool | None = None,
+            created_by_user_id: int | None = None,
+        ) -> Sequence[RideModel]:
+        """Rides ordered by (start_time, id), continuing after the keyset `after`."""
+        statement = select(RideModel).order_by(RideModel.start_time.asc(), RideModel.id.asc()).limit(limit)
+        if after is not None:
+            statement = statement.where(tuple_(RideModel.start_time, RideModel.id) > tuple_(*after))
+        if start_from is not None:
+            statement = statement.where(RideModel.start_time >= start_from)
+        if start_to is not None:
+            statement = statement.where(RideModel.start_time < start_to)
+        if is_active is not None:
+            statement = statement.where(RideModel.is_active.is_(is_active))
+        if created_by_user_id is not None:
+            statement = statement.where(RideModel.created_by_user_id == created_by_user_id)
         result = await self.session.execute(statement)
         return result.scalars().all()
     
@@ -80,12 +141,39 @@ class RideRepository:
         result = await self.session.execute(statement)
         return result.unique().scalars().all()
  
+    async def get_last_positions(self, *, ride_id: int) -> Sequence[Row]:
+        """(user_id, latitude, longitude) of participants with a known position."""
+        statement = (
+            select(ParticipationModel.user_id, ParticipationModel.latitude, ParticipationModel.longitude)
+            .where(
+                ParticipationModel.ride_id == ride_id,
+                ParticipationModel.latitude.is_not(None),
+                ParticipationModel.longitude.is_not(None),
+            )
+        )
+        result = await self.session.execute(statement)
+        return result.all()
+
 
     async def get_by_code(self, *, ride_code: str) -> RideModel | None:
         statement = select(RideModel).where(RideModel.code == ride_code)
         result = await self.session.execute(statement)
         return result.scalar_one_or_none()
     
+    async def get_record_by_code(self, *, ride_code: str) -> RideRecord | None:
+        """Resolve a ride code through the in-process cache."""
+        record = ride_code_cache.get(ride_code)
+        if record is not None:
+            return record
+
+        ride = await self.get_by_code(ride_code=ride_code)
+        if ride is None:
+            return None
+
+        record = RideRecord.from_model(ride)
+        ride_code_cache.set(ride_code, record)
+        return record
+    
     async def get_by_id(self, *, ride_id: int) -> RideModel | None:
         statement = select(RideModel).where(RideModel.id == ride_id)
         result = await self.session.execute(statement)
@@ -131,6 +219,7 @@ class RideRepository:
             is_active: bool | None = None,
             route_id: int | None = None,
             visibility: RouteVisibility | None = None,
+            broadcast_mode: BroadcastMode | None = None,
         ) -> RideModel | None:
         ride_to_update ={
             "title": title,
@@ -139,6 +228,7 @@ class RideRepository:
             "is_active": is_active,
             "route_id": route_id,
             "visibility": visibility,
+            "broadcast_mode": broadcast_mode,
         }
 
         for key, value in ride_to_update.items():
@@ -148,8 +238,10 @@ class RideRepository:
         self.session.add(ride)
         await self.session.flush()
         await self.session.refresh(ride)
+        ride_code_cache.invalidate(ride.code)
         return ride
 
     async def delete_ride(self, *, ride: RideModel) -> None:
+        ride_code_cache.invalidate(ride.code)
         await self.session.delete(ride)
         await self.session.flush()
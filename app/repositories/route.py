@@ -1,15 +1,43 @@
 from typing import Optional, Sequence
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
-from app.models import RouteModel
-from app.utils.geo import calculate_gpx_distance
+from sqlalchemy import Row, select, update, delete
+from sqlalchemy.orm import defer
+from app.executors import cpu_executor
+from app.models import RouteGeometryLevelModel, RouteGeometryModel, RouteModel
+from app.utils.geometry import (
+    GEOMETRY_VERSION,
+    RouteGeometry,
+    RouteLod,
+    build_route_geometry,
+    encode_polyline,
+    pack_geometry,
+)
+
+# List queries never touch the GPX document; accessing it on such a row raises
+SUMMARY_OPTIONS = (defer(RouteModel.gpx_data, raiseload=True),)
+
 
 class RouteRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def get_all_routes(self) -> Sequence[RouteModel]:
-        statement = select(RouteModel)
+    async def get_routes_page(
+        self,
+        *,
+        limit: int,
+        after: int | None = None,
+        created_by_user_id: int | None = None,
+    ) -> Sequence[RouteModel]:
+        statement = (
+            select(RouteModel)
+            .options(*SUMMARY_OPTIONS)
+            .order_by(RouteModel.id.asc())
+            .limit(limit)
+        )
+        if after is not None:
+            statement = statement.where(RouteModel.id > after)
+        if created_by_user_id is not None:
+            statement = statement.where(RouteModel.created_by_user_id == created_by_user_id)
         result = await self.session.execute(statement)
         return result.scalars().all()
 
@@ -18,9 +46,83 @@ class RouteRepository:
         result = await self.session.execute(statement)
         return result.scalar_one_or_none()
 
+    async def get_gpx_version(self, *, route_id: int) -> Row[tuple[int, int]] | None:
+        """(id, revision) of a route, enough to answer a conditional GET."""
+        statement = select(RouteModel.id, RouteModel.revision).where(RouteModel.id == route_id)
+        result = await self.session.execute(statement)
+        return result.one_or_none()
+
+    async def get_gpx_data(self, *, route_id: int) -> str | None:
+        statement = select(RouteModel.gpx_data).where(RouteModel.id == route_id)
+        result = await self.session.execute(statement)
+        return result.scalar_one_or_none()
+
+    async def get_geometry(self, *, route_id: int) -> RouteGeometryModel | None:
+        statement = select(RouteGeometryModel).where(RouteGeometryModel.route_id == route_id)
+        result = await self.session.execute(statement)
+        return result.scalar_one_or_none()
+
+    async def get_packed_geometry(self, *, route_id: int) -> bytes | None:
+        statement = select(RouteGeometryModel.points).where(RouteGeometryModel.route_id == route_id)
+        result = await self.session.execute(statement)
+        return result.scalar_one_or_none()
+
+    async def get_geometry_source(self, *, route_id: int, for_update: bool = False) -> bytes | str | None:
+        """
+        The route's packed geometry, or its GPX if the backfill has not reached
+        it yet. `for_update` locks the geometry row until the transaction ends.
+        """
+        statement = select(RouteGeometryModel.points).where(RouteGeometryModel.route_id == route_id)
+        if for_update:
+            statement = statement.with_for_update()
+        packed = (await self.session.execute(statement)).scalar_one_or_none()
+        if packed is None:
+            return await self.get_gpx_data(route_id=route_id)
+        return packed
+
+    async def get_lod(self, *, route_id: int, zoom: int | None) -> RouteLod | None:
+        """A stored level of detail; zoom None is the full-resolution polyline."""
+        if zoom is None:
+            statement = select(RouteGeometryModel.point_count, RouteGeometryModel.polyline).where(
+                RouteGeometryModel.route_id == route_id,
+            )
+            row = (await self.session.execute(statement)).one_or_none()
+            return None if row is None else RouteLod(None, 0.0, row.point_count, row.polyline)
+
+        statement = select(RouteGeometryLevelModel).where(
+            RouteGeometryLevelModel.route_id == route_id,
+            RouteGeometryLevelModel.zoom == zoom,
+        )
+        level = (await self.session.execute(statement)).scalar_one_or_none()
+        return None if level is None else RouteLod(level.zoom, level.tolerance_m, level.point_count, level.polyline)
+
+    async def get_ids_without_geometry(
+        self,
+        *,
+        limit: int,
+        after: int | None = None,
+        include_current: bool = False,
+    ) -> Sequence[int]:
+        """Routes without a geometry row or with an outdated one (every route with `include_current`)."""
+        statement = (
+            select(RouteModel.id)
+            .outerjoin(RouteGeometryModel, RouteGeometryModel.route_id == RouteModel.id)
+            .order_by(RouteModel.id.asc())
+            .limit(limit)
+        )
+        if not include_current:
+            statement = statement.where(
+                (RouteGeometryModel.route_id.is_(None)) | (RouteGeometryModel.version < GEOMETRY_VERSION)
+            )
+        if after is not None:
+            statement = statement.where(RouteModel.id > after)
+        result = await self.session.execute(statement)
+        return result.scalars().all()
+
     async def get_owned_routes(self, user_id: int) -> Sequence[RouteModel]:
         statement = (
             select(RouteModel)
+            .options(*SUMMARY_OPTIONS)
             .where(RouteModel.created_by_user_id == user_id)
             .order_by(RouteModel.created_at.desc())
         )
@@ -36,10 +138,14 @@ class RouteRepository:
         description: str | None,
         gpx_data: str, 
         created_by_user_id: int,
-        distance_meters: float = 0.0
+        distance_meters: float = 0.0,
+        geometry: RouteGeometry | None = None,
     ) -> RouteModel:
+        if geometry is None:
+            # Parsing a large upload is CPU bound, keep it off the event loop
+            geometry = await cpu_executor.run(build_route_geometry, gpx_data)
         if distance_meters == 0.0:
-            distance_meters = calculate_gpx_distance(gpx_data)
+            distance_meters = geometry.distance_meters
 
         route = RouteModel(
             title=title,
@@ -50,6 +156,7 @@ class RouteRepository:
         )
         self.session.add(route)
         await self.session.flush()
+        await self.save_geometry(route_id=route.id, geometry=geometry)
         await self.session.refresh(route)
         return route
 
@@ -62,8 +169,16 @@ class RouteRepository:
         title: str | None = None,
         description: str | None = None,
         gpx_data: str | None = None,
-        distance_meters: float | None = None
+        distance_meters: float | None = None,
+        geometry: RouteGeometry | None = None,
     ) -> RouteModel | None:
+        if gpx_data is not None:
+            if geometry is None:
+                geometry = await cpu_executor.run(build_route_geometry, gpx_data)
+            if distance_meters is None:
+                distance_meters = geometry.distance_meters
+            await self.save_geometry(route_id=route.id, geometry=geometry)
+
         route_to_update ={
             "title": title,
             "description": description,
@@ -74,12 +189,55 @@ class RouteRepository:
         for key, value in route_to_update.items():
             if value is not None:
                 setattr(route, key, value)
+        route.revision = RouteModel.revision + 1
 
         self.session.add(route)
         await self.session.flush()
         await self.session.refresh(route)
         return route
 
+    async def save_geometry(self, *, route_id: int, geometry: RouteGeometry) -> RouteGeometryModel:
+        """Write the route's geometry; its simplified levels are dropped until recomputed."""
+        bounds = geometry.bounds or (None, None, None, None)
+        # Waits for a running simplification (it holds this lock), so the DELETE sees its levels
+        await self.session.execute(
+            select(RouteGeometryModel.route_id).where(RouteGeometryModel.route_id == route_id).with_for_update()
+        )
+        await self.session.execute(
+            delete(RouteGeometryLevelModel).where(RouteGeometryLevelModel.route_id == route_id)
+        )
+        row = await self.session.merge(RouteGeometryModel(
+            route_id=route_id,
+            version=GEOMETRY_VERSION,
+            point_count=geometry.point_count,
+            distance_meters=geometry.distance_meters,
+            elevation_gain_meters=geometry.elevation_gain_meters,
+            min_latitude=bounds[0],
+            min_longitude=bounds[1],
+            max_latitude=bounds[2],
+            max_longitude=bounds[3],
+            points=pack_geometry(geometry),
+            polyline=encode_polyline(geometry.lats, geometry.lons),
+        ))
+        await self.session.flush()
+        return row
+
+    async def save_lods(self, *, route_id: int, lods: Sequence[RouteLod]) -> None:
+        await self.session.execute(
+            delete(RouteGeometryLevelModel).where(RouteGeometryLevelModel.route_id == route_id)
+        )
+        self.session.add_all(
+            RouteGeometryLevelModel(
+                route_id=route_id,
+                zoom=lod.zoom,
+                tolerance_m=lod.tolerance_m,
+                point_count=lod.point_count,
+                polyline=lod.polyline,
+            )
+            for lod in lods
+        )
+        await self.session.flush()
+
 # ------------- DELETE ------------- #
 
     async def delete_route(self, *,route: RouteModel) -> None:
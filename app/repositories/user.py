@@ -1,12 +1,72 @@
+from dataclasses import dataclass
 from datetime import datetime
+import os
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
 
 from typing import Sequence
 
 from app.models import UserModel
-from app.security import get_password_hash
+from app.security import get_password_hash_async
+from app.utils.cache import TTLCache
+
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", 4096))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", 60))
+
+
+@dataclass(frozen=True, slots=True)
+class UserRecord:
+    """Immutable snapshot of the public user fields, what authentication resolves to."""
+    id: int
+    username: str
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def from_model(cls, user: UserModel) -> "UserRecord":
+        return cls(
+            id=user.id,
+            username=user.username,
+            created_at=user.created_at,
+            updated_at=user.updated_at,
+        )
+
+
+# User id -> UserRecord for authenticated requests and socket connects.
+# ORM updates/deletes invalidate in this process when flushed and again once
+# committed, other workers catch up after USER_CACHE_TTL_SECONDS at the latest.
+user_cache: TTLCache[int, UserRecord] = TTLCache(
+    max_size=USER_CACHE_MAX_SIZE,
+    ttl_seconds=USER_CACHE_TTL_SECONDS,
+)
+
+_CHANGED_USERS = "changed_user_ids"
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_flushed_users(session: Session, flush_context) -> None:
+    changed = {
+        user.id for user in (*session.dirty, *session.deleted)
+        if isinstance(user, UserModel) and user.id is not None
+    }
+    for user_id in changed:
+        user_cache.invalidate(user_id)
+    if changed:
+        session.info.setdefault(_CHANGED_USERS, set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session: Session) -> None:
+    # A lookup between flush and commit may have cached the old row again
+    for user_id in session.info.pop(_CHANGED_USERS, ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session: Session) -> None:
+    session.info.pop(_CHANGED_USERS, None)
 
 
 class UserRepository:
@@ -16,7 +76,7 @@ class UserRepository:
         self.session = session
     
     async def create_user(self, *,  username: str, password: str) -> UserModel:
-        hashed_password = get_password_hash(password)
+        hashed_password = await get_password_hash_async(password)
         new_user = UserModel(username=username, password=hashed_password)
         self.session.add(new_user)
         await self.session.flush()
@@ -32,8 +92,24 @@ class UserRepository:
         result =  await self.session.execute(statement)
         return result.scalar_one_or_none()
     
-    async def get_all_users(self) -> Sequence[UserModel]:
-        statement = select(UserModel)
+    async def get_record_by_id(self, *, user_id: int) -> UserRecord | None:
+        """Resolve a user id through the in-process cache."""
+        record = user_cache.get(user_id)
+        if record is not None:
+            return record
+
+        user = await self.get_by_id(user_id=user_id)
+        if user is None:
+            return None
+
+        record = UserRecord.from_model(user)
+        user_cache.set(user_id, record)
+        return record
+
+    async def get_users_page(self, *, limit: int, after: int | None = None) -> Sequence[UserModel]:
+        statement = select(UserModel).order_by(UserModel.id.asc()).limit(limit)
+        if after is not None:
+            statement = statement.where(UserModel.id > after)
         result = await self.session.execute(statement)
         return result.scalars().all()
     
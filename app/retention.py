@@ -0,0 +1,118 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.database import AsyncSessionLocal
+from app.repositories import ArchiveRepository
+from app.repositories.ride import ride_code_cache
+
+RIDE_ARCHIVE_ENABLED = os.getenv("RIDE_ARCHIVE_ENABLED", "true").lower() == "true"
+# Rides that started (or were deactivated) longer ago than this are archived
+RIDE_ARCHIVE_AFTER_HOURS = float(os.getenv("RIDE_ARCHIVE_AFTER_HOURS", 24))
+RIDE_ARCHIVE_INTERVAL_SECONDS = float(os.getenv("RIDE_ARCHIVE_INTERVAL_SECONDS", 600))
+# Rides moved per transaction, bounds lock time on the hot tables
+RIDE_ARCHIVE_BATCH_SIZE = int(os.getenv("RIDE_ARCHIVE_BATCH_SIZE", 100))
+
+
+class RideArchiver:
+    """
+    Background retention worker.
+
+    Periodically moves finished rides, their participations and location
+    history into the `*_archive` tables, one batch per transaction, so
+    ride lists and location queries only ever touch recent data.
+    """
+
+    def __init__(
+        self,
+        *,
+        archive_after_hours: float = RIDE_ARCHIVE_AFTER_HOURS,
+        interval_seconds: float = RIDE_ARCHIVE_INTERVAL_SECONDS,
+        batch_size: int = RIDE_ARCHIVE_BATCH_SIZE,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+        now: Callable[[], datetime] = lambda: datetime.now(timezone.utc),
+    ):
+        self.archive_after = timedelta(hours=archive_after_hours)
+        self.interval = interval_seconds
+        self.batch_size = batch_size
+        self.session_factory = session_factory
+        self._now = now
+        self._task: asyncio.Task | None = None
+
+        self.runs = 0
+        self.archived_rides = 0
+        self.archived_participations = 0
+        self.archived_locations = 0
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "runs": self.runs,
+            "archived_rides": self.archived_rides,
+            "archived_participations": self.archived_participations,
+            "archived_locations": self.archived_locations,
+            "archive_after_hours": self.archive_after.total_seconds() / 3600,
+            "batch_size": self.batch_size,
+        }
+
+    async def archive_batch(self, *, cutoff: datetime) -> int:
+        async with self.session_factory() as session:
+            async with session.begin():
+                archive_repository = ArchiveRepository(session=session)
+                rides = await archive_repository.get_archivable_rides(
+                    cutoff=cutoff,
+                    limit=self.batch_size,
+                )
+                moved = await archive_repository.archive_rides(ride_ids=[ride_id for ride_id, _ in rides])
+
+        from app.sockets import forget_ride
+
+        for _, code in rides:
+            ride_code_cache.invalidate(code)
+            forget_ride(code)
+
+        self.archived_rides += moved["rides"]
+        self.archived_participations += moved["participations"]
+        self.archived_locations += moved["location_history"]
+        return len(rides)
+
+    async def run_once(self) -> int:
+        """Archive everything past the cutoff. Returns the number of archived rides."""
+        cutoff = self._now() - self.archive_after
+        archived = 0
+        while True:
+            moved = await self.archive_batch(cutoff=cutoff)
+            archived += moved
+            if moved < self.batch_size:
+                break
+
+        self.runs += 1
+        return archived
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                archived = await self.run_once()
+                if archived:
+                    print(f"Retention: archived {archived} rides")
+            except Exception as e:
+                print(f"Error archiving rides: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+ride_archiver = RideArchiver()
@@ -14,7 +14,7 @@ from app.schemas import (
     UserResponse,
     TokenResponse,
 )
-from app.security import create_access_token, verify_password
+from app.security import PasswordHashBusy, create_access_token, verify_password_async
 from app.routers.dependencies import get_current_user
 
 
@@ -25,14 +25,23 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 @router.post(
     "/login",
     response_model=TokenResponse,
-    responses={status.HTTP_401_UNAUTHORIZED: {}},    
+    responses={status.HTTP_401_UNAUTHORIZED: {}, status.HTTP_503_SERVICE_UNAVAILABLE: {}},
 )
 async def login(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     user_repository: Annotated[UserRepository, Depends(get_user_repository)],
 ) -> TokenResponse:
     user = await user_repository.get_by_username(username=form_data.username)
-    if not user or not verify_password(form_data.password, user.password):
+    try:
+        valid = user is not None and await verify_password_async(form_data.password, user.password)
+    except PasswordHashBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many logins in progress, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password",
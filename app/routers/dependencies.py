@@ -14,6 +14,7 @@ from app.schemas import (
     UserResponse,
 )
 from app.security import create_access_token, decode_access_token
+from app.utils.pagination import decode_cursor
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
@@ -38,10 +39,24 @@ async def get_current_user(
             detail="Invalid token",
         )
         
-    user = await user_repository.get_by_id(user_id=user_id)
+    # Cached: most authenticated requests need no user query at all
+    user = await user_repository.get_record_by_id(user_id=user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
         )
     return UserResponse.model_validate(user)
+
+
+def parse_cursor(after: str | None, *types: type) -> tuple | None:
+    """Decode an `after` query parameter, 400 if the client tampered with it."""
+    if after is None:
+        return None
+    try:
+        return decode_cursor(after, *types)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
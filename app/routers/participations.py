@@ -1,8 +1,9 @@
 from typing import Annotated, List
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 
+from app.database import run_after_commit
 from app.injections import (
     get_ride_repository,
     get_participation_repository,
@@ -18,7 +19,8 @@ from app.schemas import (
     ParticipationUpdate,
     ParticipantResponse
 )
-from app.routers.dependencies import get_current_user
+from app.routers.dependencies import get_current_user, parse_cursor
+from app.utils.pagination import NEXT_CURSOR_HEADER, PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX, split_page
 
 router = APIRouter()
 
@@ -31,13 +33,26 @@ router = APIRouter()
         status_code=status.HTTP_200_OK,
 )
 async def get_list_participations(
+    response: Response,
     participation_repository: Annotated[
         ParticipationRepository,
         Depends(get_participation_repository),
-        ]
+        ],
+    limit: Annotated[int, Query(ge=1, le=PAGE_SIZE_MAX)] = PAGE_SIZE_DEFAULT,
+    after: str | None = None,
+    ride_id: int | None = None,
+    user_id: int | None = None,
 ) -> List[ParticipationResponse]:
-    
-    participations = await participation_repository.get_all_participations()
+    after_key = parse_cursor(after, int)
+    participations = await participation_repository.get_participations_page(
+        limit=limit + 1,
+        after=after_key[0] if after_key else None,
+        ride_id=ride_id,
+        user_id=user_id,
+    )
+    participations, next_cursor = split_page(participations, limit=limit, key=lambda p: (p.id,))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return [ParticipationResponse.model_validate(r) for r in participations]
 
 
@@ -155,11 +170,17 @@ async def delete_patticipation_by_id(
         ParticipationRepository,
         Depends(get_participation_repository),
     ],
+    ride_repository: Annotated[
+        RideRepository,
+        Depends(get_ride_repository),
+    ],
     current_user: Annotated[
         UserResponse,
         Depends(get_current_user),
     ],
 ) -> None:
+    from app.sockets import leave_ride
+
     selected_participation = await participation_repository.get_by_id(participation_id=id)
     if not selected_participation:
         raise HTTPException(status_code = status.HTTP_404_NOT_FOUND)
@@ -170,5 +191,12 @@ async def delete_patticipation_by_id(
             detail="Not allowed to delete this participation. It belongs to another user",
         )
 
+    ride = await ride_repository.get_by_id(ride_id=selected_participation.ride_id)
     await participation_repository.delete_participation(participation = selected_participation)
+    # Live state of the rider on this worker; other workers notice on their next flush
+    run_after_commit(participation_repository.session, lambda: leave_ride(
+        ride_code=ride.code,
+        user_id=current_user.id,
+        participation_id=id,
+    ))
     return
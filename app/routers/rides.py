@@ -1,24 +1,40 @@
+import json
+from datetime import datetime
 from typing import Annotated, List
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 
 
+from app.database import run_after_commit
 from app.injections import (
     get_ride_repository,
+    get_ride_read_repository,
+    get_participation_repository,
+    get_location_history_read_repository,
+    get_route_read_repository,
 )
 from app.repositories import (
     RideRepository,
+    ParticipationRepository,
+    RouteRepository,
+    LocationHistoryRepository,
 )
+from app.repositories.ride import ride_code_cache
+from app.services import NearbyService, ProgressService, ReplayService
 
 from app.schemas import (
+    NearbyRiderResponse,
     ParticipantResponse,
+    RideBoundsResponse,
     UserResponse,
     RideResponse,
     RideCreate,
     RideUpdate,
 )
 
-from app.routers.dependencies import get_current_user
+from app.routers.dependencies import get_current_user, parse_cursor
+from app.utils.pagination import NEXT_CURSOR_HEADER, PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX, split_page
 
 router = APIRouter()
 
@@ -45,6 +61,7 @@ async def create_ride(
         created_by_user_id = current_user.id,
         route_id = ride_to_create.route_id,
         visibility = ride_to_create.visibility,
+        broadcast_mode = ride_to_create.broadcast_mode,
     ) 
     return RideResponse.model_validate(ride_model)
 
@@ -57,14 +74,33 @@ create_ride.__doc__ = "Create a new ride."
     status_code=status.HTTP_200_OK
 )
 async def get_list_rides(
-    ride_repository: Annotated[RideRepository, Depends(get_ride_repository)],
+    response: Response,
+    ride_repository: Annotated[RideRepository, Depends(get_ride_read_repository)],
+    limit: Annotated[int, Query(ge=1, le=PAGE_SIZE_MAX)] = PAGE_SIZE_DEFAULT,
+    after: str | None = None,
+    start_from: datetime | None = None,
+    start_to: datetime | None = None,
+    is_active: bool | None = None,
+    created_by: int | None = None,
 ) -> List[RideResponse]:
-    """Get all rides in the database."""
-    rides = await ride_repository.get_all_rides()
+    """Get a page of rides ordered by start time."""
+    rides = await ride_repository.get_rides_page(
+        limit=limit + 1,
+        after=parse_cursor(after, datetime, int),
+        start_from=start_from,
+        start_to=start_to,
+        is_active=is_active,
+        created_by_user_id=created_by,
+    )
+    rides, next_cursor = split_page(rides, limit=limit, key=lambda ride: (ride.start_time, ride.id))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return [RideResponse.model_validate(ride) for ride in rides]
 
 get_list_rides.__doc__ = """
-    Get all rides in the database.
+    Get a page of rides ordered by start time.
+    Filters: start_from/start_to (start time range), is_active, created_by.
+    If there are more rides, the X-Next-Cursor header holds the `after` value for the next page.
     """
 
 @router.get(
@@ -165,12 +201,26 @@ get_ride_by_id.__doc__ = "Get a ride by its id."
 )
 async def get_ride_participants(
     ride_id: int,
-    ride_repository: Annotated[RideRepository, Depends(get_ride_repository)],
+    ride_repository: Annotated[RideRepository, Depends(get_ride_read_repository)],
+    route_repository: Annotated[RouteRepository, Depends(get_route_read_repository)],
 ) -> List[ParticipantResponse]:
     participants = await ride_repository.get_participants(ride_id=ride_id)
 
-    return [
-        ParticipantResponse(
+    ride = await ride_repository.get_by_id(ride_id=ride_id) if participants else None
+    snapper = None
+    if ride is not None and ride.route_id is not None:
+        snapper = await ProgressService.ride_snapper(route_repository, route_id=ride.route_id)
+
+    responses = []
+    for p in participants:
+        snapped = ProgressService.snap_position(
+            snapper,
+            ride_code=ride.code if ride else "",
+            user_id=p.user_id,
+            latitude=p.latitude,
+            longitude=p.longitude,
+        )
+        responses.append(ParticipantResponse(
             id=p.id,
             user_id=p.user_id,
             username=p.participant.username,
@@ -178,11 +228,130 @@ async def get_ride_participants(
             latitude=p.latitude,
             longitude=p.longitude,
             location_timestamp=p.location_timestamp,
-        )
-        for p in participants 
-    ]
+            progress_m=round(snapped.progress_m, 1) if snapped else None,
+            cross_track_m=round(snapped.cross_track_m, 1) if snapped else None,
+        ))
+    return responses
 
 get_ride_participants.__doc__ = "Get all participants of a ride."
+
+
+@router.get(
+    "/{ride_id}/nearby",
+    response_model=List[NearbyRiderResponse],
+    status_code=status.HTTP_200_OK,
+    responses={status.HTTP_400_BAD_REQUEST: {}, status.HTTP_404_NOT_FOUND: {}},
+)
+async def get_nearby_riders(
+    ride_id: int,
+    ride_repository: Annotated[RideRepository, Depends(get_ride_read_repository)],
+    user_id: int | None = None,
+    latitude: Annotated[float | None, Query(ge=-90, le=90)] = None,
+    longitude: Annotated[float | None, Query(ge=-180, le=180)] = None,
+    k: Annotated[int, Query(ge=1, le=PAGE_SIZE_MAX)] = 10,
+    radius_m: Annotated[float | None, Query(gt=0)] = None,
+) -> List[NearbyRiderResponse]:
+    ride = await ride_repository.get_by_id(ride_id=ride_id)
+    if not ride:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    grid = await NearbyService.ride_grid(ride_repository, ride_id=ride.id, ride_code=ride.code)
+
+    if user_id is not None:
+        position = grid.position(user_id)
+        if position is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No position for this rider")
+        latitude, longitude = position
+    elif latitude is None or longitude is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass user_id or latitude and longitude",
+        )
+
+    if radius_m is not None:
+        neighbours = grid.within(latitude, longitude, radius_m, exclude=user_id)[:k]
+    else:
+        neighbours = grid.nearest(latitude, longitude, k, exclude=user_id)
+    return [NearbyRiderResponse(**neighbour._asdict()) for neighbour in neighbours]
+
+get_nearby_riders.__doc__ = """
+    Riders nearest to a rider (user_id) or a point (latitude/longitude), closest first.
+    With radius_m only riders within that many meters, at most k.
+    """
+
+
+@router.get(
+    "/{ride_id}/bounds",
+    response_model=RideBoundsResponse,
+    status_code=status.HTTP_200_OK,
+    responses={status.HTTP_404_NOT_FOUND: {}},
+)
+async def get_ride_bounds(
+    ride_id: int,
+    ride_repository: Annotated[RideRepository, Depends(get_ride_read_repository)],
+) -> RideBoundsResponse:
+    ride = await ride_repository.get_by_id(ride_id=ride_id)
+    if not ride:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    grid = await NearbyService.ride_grid(ride_repository, ride_id=ride.id, ride_code=ride.code)
+
+    bounds = grid.bounds()
+    if bounds is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No rider positions yet")
+    return RideBoundsResponse(**bounds._asdict(), rider_count=len(grid))
+
+get_ride_bounds.__doc__ = "Bounding box of the riders' latest positions, for framing the group on a map."
+
+
+@router.get(
+    "/{ride_id}/replay",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+    responses={status.HTTP_404_NOT_FOUND: {}, status.HTTP_403_FORBIDDEN: {}},
+)
+async def replay_ride(
+    ride_id: int,
+    ride_repository: Annotated[RideRepository, Depends(get_ride_read_repository)],
+    participation_repository: Annotated[ParticipationRepository, Depends(get_participation_repository)],
+    history_repository: Annotated[LocationHistoryRepository, Depends(get_location_history_read_repository)],
+    current_user: Annotated[UserResponse, Depends(get_current_user)],
+    start: datetime | None = None,
+    end: datetime | None = None,
+    min_interval_ms: Annotated[int, Query(ge=0)] = 0,
+) -> StreamingResponse:
+    ride = await ride_repository.get_by_id(ride_id=ride_id)
+    if not ride:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+    # Tracks are only shown to the organizer and the ride's participants
+    if ride.created_by_user_id != current_user.id:
+        participation = await participation_repository.get_by_user_and_ride(
+            user_id=current_user.id,
+            ride_id=ride.id,
+        )
+        if participation is None:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not a participant of this ride",
+            )
+
+    async def ndjson_lines():
+        async for frame in ReplayService.iter_frames(
+            history_repository,
+            ride_id=ride_id,
+            start=start,
+            end=end,
+            min_interval_ms=min_interval_ms,
+        ):
+            frame["location_timestamp"] = frame["location_timestamp"].isoformat()
+            yield json.dumps(frame) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+replay_ride.__doc__ = """
+    Stream the recorded track of a ride as NDJSON, one fix per line in time order.
+    Only for the ride's organizer and participants.
+    Optional time window (start/end) and per-rider downsampling (min_interval_ms).
+    """
     
 # ------------- PUT ------------- #
 
@@ -220,7 +389,11 @@ async def update_ride_by_id(
         is_active = ride_to_update.is_active,
         route_id = ride_to_update.route_id,
         visibility = ride_to_update.visibility,
+        broadcast_mode = ride_to_update.broadcast_mode,
     )
+    # A socket lookup before the commit may have cached the old row again
+    ride_code = ride_model.code
+    run_after_commit(ride_repository.session, lambda: ride_code_cache.invalidate(ride_code))
     return RideResponse.model_validate(ride_model)
 
 update_ride_by_id.__doc__ = "Update a ride by its id."
@@ -250,7 +423,9 @@ async def delete_ride_by_id(
             detail="Not allowed to delete this ride. The ride was created by another user"
             )
     
-    await ride_repository.delete_ride(ride=selected_ride)    
+    ride_code = selected_ride.code
+    await ride_repository.delete_ride(ride=selected_ride)
+    run_after_commit(ride_repository.session, lambda: ride_code_cache.invalidate(ride_code))
     return
 
 delete_ride_by_id.__doc__ = "Delete a ride by its id."
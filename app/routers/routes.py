@@ -1,44 +1,84 @@
 from typing import Annotated, List
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from app.database import run_after_commit
+from app.executors import cpu_executor
 from app.repositories import RouteRepository
-from app.schemas import RouteResponse, RouteCreate, RouteUpdate, UserResponse
-from app.injections import get_route_repository
-from app.routers.dependencies import get_current_user
+from app.schemas import (
+    RouteCreate,
+    RouteGeometryResponse,
+    RouteResponse,
+    RouteSummaryResponse,
+    RouteUpdate,
+    UserResponse,
+)
+from app.injections import get_route_repository, get_route_read_repository
+from app.routers.dependencies import get_current_user, parse_cursor
+from app.simplification import lod_zoom, route_simplifier
+from app.snapping import build_route_snapper, route_snappers
+from app.utils.geometry import build_route_geometry
+from app.utils.pagination import NEXT_CURSOR_HEADER, PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX, split_page
 
 router = APIRouter()
 
+GPX_MEDIA_TYPE = "application/gpx+xml"
+
+
+def gpx_etag(route_id: int, revision: int, variant: str | None = None) -> str:
+    # revision is bumped on every write of the route, so (id, revision) identifies the document
+    version = f"{route_id}-{revision}"
+    return f'"{version}-{variant}"' if variant else f'"{version}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
 # ------------- GET ------------- #
 
 @router.get(
     "/",
-    response_model=List[RouteResponse],
+    response_model=List[RouteSummaryResponse],
     status_code=status.HTTP_200_OK,
 )
 async def get_list_routes(
-    route_repository: Annotated[RouteRepository, Depends(get_route_repository)],
-) -> List[RouteResponse]:
-    """Get all routes in the database."""
-    routes = await route_repository.get_all_routes()
-    return [RouteResponse.model_validate(route) for route in routes]
+    response: Response,
+    route_repository: Annotated[RouteRepository, Depends(get_route_read_repository)],
+    limit: Annotated[int, Query(ge=1, le=PAGE_SIZE_MAX)] = PAGE_SIZE_DEFAULT,
+    after: str | None = None,
+    created_by: int | None = None,
+) -> List[RouteSummaryResponse]:
+    """Get a page of routes."""
+    after_key = parse_cursor(after, int)
+    routes = await route_repository.get_routes_page(
+        limit=limit + 1,
+        after=after_key[0] if after_key else None,
+        created_by_user_id=created_by,
+    )
+    routes, next_cursor = split_page(routes, limit=limit, key=lambda route: (route.id,))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return [RouteSummaryResponse.model_validate(route) for route in routes]
 
-get_list_routes.__doc__ = "Get all routes in the database."
+get_list_routes.__doc__ = "Get a page of routes, the X-Next-Cursor header points to the next one."
 
 
 @router.get(
     "/owned",
     status_code=status.HTTP_200_OK,
-    response_model=List[RouteResponse],
+    response_model=List[RouteSummaryResponse],
     responses={status.HTTP_404_NOT_FOUND: {}},
 )
 async def get_owned_routes(
     route_repository: Annotated[RouteRepository, Depends(get_route_repository)],
     current_user: Annotated[UserResponse, Depends(get_current_user)],
-) -> List[RouteResponse]:
+) -> List[RouteSummaryResponse]:
     """Get all routes created by the current user."""
     owned_routes = await route_repository.get_owned_routes(user_id=current_user.id)
     if not owned_routes:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No routes found")
-    return [RouteResponse.model_validate(route) for route in owned_routes]
+    return [RouteSummaryResponse.model_validate(route) for route in owned_routes]
 
 get_owned_routes.__doc__ = "Get all routes created by the current user."
 
@@ -62,6 +102,93 @@ async def get_route_by_id(
 get_route_by_id.__doc__ = "Get a route by its id."
 
 
+@router.get(
+    "/{id}/gpx",
+    response_class=Response,
+    status_code=status.HTTP_200_OK,
+    responses={
+        status.HTTP_200_OK: {"content": {GPX_MEDIA_TYPE: {}}},
+        status.HTTP_304_NOT_MODIFIED: {},
+        status.HTTP_404_NOT_FOUND: {},
+    },
+)
+async def get_route_gpx(
+    id: int,
+    route_repository: Annotated[RouteRepository, Depends(get_route_read_repository)],
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    """Get the raw GPX document of a route."""
+    version = await route_repository.get_gpx_version(route_id=id)
+    if version is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Route not found")
+
+    etag = gpx_etag(version.id, version.revision)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    # The client's copy is current: answer without loading the document
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    gpx_data = await route_repository.get_gpx_data(route_id=id)
+    if gpx_data is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Route not found")
+    return Response(content=gpx_data, media_type=GPX_MEDIA_TYPE, headers=headers)
+
+get_route_gpx.__doc__ = """
+    Get the raw GPX document of a route.
+    Supports conditional requests: send the ETag back in If-None-Match to get 304 Not Modified.
+    """
+
+
+@router.get(
+    "/{id}/geometry",
+    response_model=RouteGeometryResponse,
+    status_code=status.HTTP_200_OK,
+    responses={status.HTTP_304_NOT_MODIFIED: {}, status.HTTP_404_NOT_FOUND: {}},
+)
+async def get_route_geometry(
+    id: int,
+    response: Response,
+    route_repository: Annotated[RouteRepository, Depends(get_route_read_repository)],
+    zoom: Annotated[int | None, Query(ge=0, le=22)] = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> RouteGeometryResponse:
+    version = await route_repository.get_gpx_version(route_id=id)
+    if version is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Route not found")
+
+    level = lod_zoom(zoom)
+    etag = gpx_etag(version.id, version.revision, "full" if level is None else f"z{level}")
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    lod = await route_repository.get_lod(route_id=id, zoom=level)
+    if lod is None:
+        # Not simplified in the background yet
+        lods = await route_simplifier.compute(
+            id, version.revision, lambda: route_repository.get_geometry_source(route_id=id),
+        )
+        if lods is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Route not found")
+        lod = lods[level]
+
+    response.headers.update(headers)
+    return RouteGeometryResponse(
+        route_id=id,
+        zoom=lod.zoom,
+        tolerance_m=lod.tolerance_m,
+        point_count=lod.point_count,
+        polyline=lod.polyline,
+    )
+
+get_route_geometry.__doc__ = """
+    Get a route as an encoded polyline for drawing on a map.
+    With `zoom`, the track is simplified to about a pixel at that zoom level (the next
+    finer stored level is served); without it, or beyond the finest level, every point.
+    Supports conditional requests like GET /routes/{id}/gpx.
+    """
+
+
 # ------------- POST ------------- #
 
 @router.post(
@@ -76,12 +203,23 @@ async def create_route(
     current_user: Annotated[UserResponse, Depends(get_current_user)],
 ) -> RouteResponse:
     """Create a new route."""
+    # The upload is parsed once; the stored geometry also feeds the snapping index
+    geometry = await cpu_executor.run(build_route_geometry, route_to_create.gpx_data)
     route_model = await route_repository.create_route(
         title=route_to_create.title,
         description=route_to_create.description,
         gpx_data=route_to_create.gpx_data,
         created_by_user_id=current_user.id,
+        geometry=geometry,
     )
+    snapper = await cpu_executor.run(build_route_snapper, geometry)
+    route_id = route_model.id
+
+    def publish_route() -> None:
+        route_snappers.put(route_id, snapper)
+        route_simplifier.enqueue(route_id)
+
+    run_after_commit(route_repository.session, publish_route)
     return RouteResponse.model_validate(route_model)
 
 create_route.__doc__ = "Create a new route."
@@ -116,12 +254,25 @@ async def update_route_by_id(
             detail="Not authorized to update this route",
             )
 
+    geometry = None
+    if route_to_update.gpx_data is not None:
+        geometry = await cpu_executor.run(build_route_geometry, route_to_update.gpx_data)
+
     route_model = await route_repository.update_route(
         existing_route,
         title=route_to_update.title,
         description=route_to_update.description,
         gpx_data=route_to_update.gpx_data,
+        geometry=geometry,
     )
+    if geometry is not None:
+        snapper = await cpu_executor.run(build_route_snapper, geometry)
+
+        def publish_route() -> None:
+            route_snappers.put(id, snapper)
+            route_simplifier.enqueue(id)
+
+        run_after_commit(route_repository.session, publish_route)
     return RouteResponse.model_validate(route_model)
 
 
@@ -154,4 +305,10 @@ async def delete_route_by_id(
             detail="Not authorized to delete this route",
             )
     await route_repository.delete_route(route = selected_route)
+
+    def forget_route() -> None:
+        route_snappers.invalidate(id)
+        route_simplifier.forget(id)
+
+    run_after_commit(route_repository.session, forget_route)
     return
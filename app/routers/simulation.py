@@ -7,7 +7,11 @@ import asyncio
 import random
 import datetime
 
-from app.schemas import SimulationStart, SimulationAnimate
+from app.broadcast import compact_room
+from app.schemas import SimulationStart, SimulationAnimate, SimulationReplay
+from app.database import AsyncSessionLocal, pool_metrics, replica_pool_metrics, replica_router
+from app.executors import cpu_executor
+from app.security import password_executor
 
 from app.injections import (
     get_ride_repository,
@@ -17,6 +21,14 @@ from app.repositories import (
     RideRepository,
     ParticipationRepository,
 )
+from app.repositories import LocationHistoryRepository
+from app.repositories.ride import ride_code_cache
+from app.repositories.user import user_cache
+from app.retention import ride_archiver
+from app.services import ReplayService, location_buffer
+from app.simplification import route_simplifier
+from app.snapping import route_snappers
+from app.spatial import ride_positions
 
 router = APIRouter()
 
@@ -58,6 +70,52 @@ async def animate_task(ride_code: str, initial_movers: list[dict]):
     except Exception as e:
         print(f"CRITICAL ERROR in animate_task: {e}")
 
+async def replay_task(
+    ride_code: str,
+    ride_id: int,
+    speed: float,
+    start: datetime.datetime | None,
+    end: datetime.datetime | None,
+    min_interval_ms: int,
+):
+    """
+    Background task to re-emit a recorded ride into its rooms,
+    `speed` times faster than it happened.
+    Fixes go out as `replay_location` events, never as live location
+    events: other workers would feed those into their proximity and
+    spatial state, and compact sockets only get frames of live fixes.
+    """
+    from app.sockets import sio
+
+    print(f"DEBUG: Replaying ride {ride_code} at {speed}x")
+
+    try:
+        async with AsyncSessionLocal() as session:
+            history_repository = LocationHistoryRepository(session=session)
+            previous = None
+            async for frame in ReplayService.iter_frames(
+                history_repository,
+                ride_id=ride_id,
+                start=start,
+                end=end,
+                min_interval_ms=min_interval_ms,
+            ):
+                timestamp = frame["location_timestamp"]
+                if previous is not None:
+                    await asyncio.sleep((timestamp - previous).total_seconds() / speed)
+                previous = timestamp
+
+                payload = {
+                    "ride_code": ride_code,
+                    "user_id": frame["user_id"],
+                    "latitude": frame["latitude"],
+                    "longitude": frame["longitude"],
+                    "location_timestamp": timestamp.isoformat(),
+                }
+                await sio.emit("replay_location", payload, room=[ride_code, compact_room(ride_code)])
+    except Exception as e:
+        print(f"CRITICAL ERROR in replay_task: {e}")
+
 @router.post("/animate")
 async def animate_participants(
     data: SimulationAnimate, 
@@ -96,6 +154,55 @@ async def animate_participants(
         
     return {"message": "Animation started for existing participants"}
 
+@router.post("/replay")
+async def replay_ride(
+    data: SimulationReplay,
+    ride_repository: Annotated[RideRepository, Depends(get_ride_repository)],
+):
+    """
+    Re-emits the recorded location history of a ride into its Socket.IO rooms
+    as `replay_location` events.
+    """
+    ride = await ride_repository.get_by_id(ride_id=data.ride_id)
+    if not ride:
+        raise HTTPException(status_code=404, detail="Ride not found")
+
+    asyncio.create_task(replay_task(
+        ride.code,
+        ride.id,
+        data.speed,
+        data.start,
+        data.end,
+        data.min_interval_ms,
+    ))
+
+    return {"message": f"Replay of ride {ride.code} started at {data.speed}x"}
+
+@router.get("/metrics")
+async def get_metrics():
+    """
+    In-process counters of the real-time pipeline (this worker only).
+    """
+    from app.sockets import broadcaster, proximity, sio, throttle
+
+    return {
+        "database_pool": pool_metrics.stats(),
+        "database_replica": replica_router.stats() | {"pool": replica_pool_metrics.stats()},
+        "ride_code_cache": ride_code_cache.stats(),
+        "user_cache": user_cache.stats(),
+        "location_buffer": location_buffer.stats(),
+        "broadcaster": broadcaster.stats(),
+        "socket_manager": sio.manager.stats() if hasattr(sio.manager, "stats") else {"backend": "memory"},
+        "throttle": throttle.stats(),
+        "proximity": proximity.stats(),
+        "spatial_index": ride_positions.stats(),
+        "route_snapping": route_snappers.stats(),
+        "route_simplifier": route_simplifier.stats(),
+        "ride_archiver": ride_archiver.stats(),
+        "cpu_executor": cpu_executor.stats(),
+        "password_hashing": password_executor.stats(),
+    }
+
 @router.post("/start")
 async def start_simulation(data: SimulationStart):
     """
@@ -1,6 +1,6 @@
 from typing import Annotated, List
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from fastapi.security import OAuth2PasswordBearer
 
 from app.injections import (
@@ -13,6 +13,9 @@ from app.schemas import (
     UserResponse,
     UserCreate,
 )
+from app.routers.dependencies import parse_cursor
+from app.security import PasswordHashBusy
+from app.utils.pagination import NEXT_CURSOR_HEADER, PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX, split_page
 
 
 router = APIRouter()
@@ -23,7 +26,7 @@ router = APIRouter()
 @router.post(
     "/",
     status_code=status.HTTP_201_CREATED,
-    responses={status.HTTP_409_CONFLICT: {}},
+    responses={status.HTTP_409_CONFLICT: {}, status.HTTP_503_SERVICE_UNAVAILABLE: {}},
 )
 async def create_user(
     user_to_create: UserCreate,
@@ -40,6 +43,11 @@ async def create_user(
             username=user_to_create.username, password=user_to_create.password
         )   
         return UserResponse.model_validate(user_model)
+    except PasswordHashBusy as exception:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": "1"},
+        ) from exception
     except Exception as exception:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT) from exception
     
@@ -65,9 +73,18 @@ async def get_user(
     status_code=status.HTTP_200_OK
 )
 async def get_list_users(
+    response: Response,
     user_repository: Annotated[UserRepository, Depends(get_user_repository)],
+    limit: Annotated[int, Query(ge=1, le=PAGE_SIZE_MAX)] = PAGE_SIZE_DEFAULT,
+    after: str | None = None,
 ) -> List[UserResponse]:
-    
-    users = await user_repository.get_all_users()
+    after_key = parse_cursor(after, int)
+    users = await user_repository.get_users_page(
+        limit=limit + 1,
+        after=after_key[0] if after_key else None,
+    )
+    users, next_cursor = split_page(users, limit=limit, key=lambda user: (user.id,))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return [UserResponse.model_validate(user) for user in users]
 
@@ -1,6 +1,6 @@
 from datetime import datetime, timezone, timedelta
 from pydantic import BaseModel, ConfigDict, field_serializer, field_validator, Field
-from app.models import RouteVisibility
+from app.models import BroadcastMode, RouteVisibility
 
 
 class TimestampMixin(BaseModel):
@@ -43,6 +43,7 @@ class RideBase(BaseModel):
     start_time: datetime
     route_id: int | None = None
     visibility: RouteVisibility = RouteVisibility.ALWAYS
+    broadcast_mode: BroadcastMode = BroadcastMode.PER_FIX
 
 class RideCreate(RideBase):
     pass
@@ -60,6 +61,7 @@ class RideUpdate(RideBase):
     start_time: datetime | None = None
     is_active: bool | None = None
     visibility: RouteVisibility | None = None
+    broadcast_mode: BroadcastMode | None = None
 
 
 #------------------------ PARTICIPATION
@@ -113,6 +115,24 @@ class ParticipantResponse(TimestampMixin):
     latitude: float | None = None
     longitude: float | None = None
     location_timestamp: datetime | None = None
+    # Along the ride's route, None without a route or off route
+    progress_m: float | None = None
+    cross_track_m: float | None = None
+
+
+class NearbyRiderResponse(BaseModel):
+    user_id: int
+    latitude: float
+    longitude: float
+    distance_m: float
+
+
+class RideBoundsResponse(BaseModel):
+    min_latitude: float
+    min_longitude: float
+    max_latitude: float
+    max_longitude: float
+    rider_count: int
 
 
 #------------------------ ROUTE
@@ -134,8 +154,28 @@ class RouteResponse(RouteBase):
     created_by_user_id: int
     created_at: datetime
     updated_at: datetime
-    
-    
+
+class RouteSummaryResponse(TimestampMixin):
+    """Route without the GPX document, for lists. The document is at GET /routes/{id}/gpx."""
+    id: int
+    title: str
+    description: str | None = None
+    distance_meters: float
+    created_by_user_id: int
+    created_at: datetime
+    updated_at: datetime
+
+
+
+class RouteGeometryResponse(BaseModel):
+    """A route as an encoded polyline (Google format, 1e-5 degrees), simplified for a map zoom."""
+    route_id: int
+    # Level served, None for the full geometry
+    zoom: int | None
+    tolerance_m: float
+    point_count: int
+    polyline: str
+
 
 #------------------------ SIMULATION 
 
@@ -146,3 +186,10 @@ class SimulationStart(BaseModel):
     
 class SimulationAnimate(BaseModel):
     ride_id: int
+
+class SimulationReplay(BaseModel):
+    ride_id: int
+    speed: float = Field(10.0, gt=0)
+    start: datetime | None = None
+    end: datetime | None = None
+    min_interval_ms: int = Field(0, ge=0)
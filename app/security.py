@@ -1,18 +1,43 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Callable, TypeVar
 from jose import JWTError, jwt
 from pwdlib import PasswordHash
+from pwdlib.exceptions import PwdlibError
+from pwdlib.hashers.argon2 import Argon2Hasher
 
 import os
 from dotenv import load_dotenv
 
+from app.utils.metrics import LatencyHistogram
+
 load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key-change-me")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
 
-password_hash = PasswordHash.recommended()
+# Argon2id cost, tune against the login latency budget (see /simulation/metrics).
+# Existing hashes keep verifying after a change, they carry their own parameters.
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", 3))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", 65536))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", 4))
+# Threads hashing at the same time; argon2 releases the GIL while it runs
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+# Requests allowed to wait for a hashing thread before new ones are turned away
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 64))
+
+T = TypeVar("T")
+
+password_hash = PasswordHash((
+    Argon2Hasher(
+        time_cost=ARGON2_TIME_COST,
+        memory_cost=ARGON2_MEMORY_COST,
+        parallelism=ARGON2_PARALLELISM,
+    ),
+))
 
 def get_password_hash(password: str) -> str:
     return password_hash.hash(password)
@@ -23,9 +48,97 @@ def verify_password(
     ) -> bool:
     try:
         return password_hash.verify(plain_password, hashed_password)
-    except (PwdlibException, ValueError, TypeError):
+    except (PwdlibError, ValueError, TypeError):
         return False
 
+
+class PasswordHashBusy(RuntimeError):
+    """Too many password hashes are already waiting."""
+
+
+class PasswordHashExecutor:
+    """
+    Runs Argon2 on a small dedicated thread pool instead of the event loop.
+
+    A semaphore keeps at most `workers` hashes running; up to `max_queue`
+    more wait for a slot, beyond that PasswordHashBusy is raised so a login
+    burst degrades into fast rejections instead of a frozen worker.
+    """
+
+    def __init__(self, *, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._pool: ThreadPoolExecutor | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+        self.waiting = 0
+        self.rejected = 0
+        self.queue_wait = LatencyHistogram()
+        self.hash_latency = LatencyHistogram()
+        self.verify_latency = LatencyHistogram()
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "workers": self.workers,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "queue_wait": self.queue_wait.stats(),
+            "hash": self.hash_latency.stats(),
+            "verify": self.verify_latency.stats(),
+        }
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # A semaphore belongs to one event loop
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.workers)
+            self._loop = loop
+        return self._semaphore
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._pool
+
+    async def run(self, histogram: LatencyHistogram, func: Callable[..., T], *args) -> T:
+        semaphore = self._get_semaphore()
+        if semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise PasswordHashBusy("Password hashing queue is full")
+
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        try:
+            started_at = time.perf_counter()
+            self.queue_wait.observe(started_at - queued_at)
+            result = await asyncio.get_running_loop().run_in_executor(self._get_pool(), func, *args)
+            histogram.observe(time.perf_counter() - started_at)
+            return result
+        finally:
+            semaphore.release()
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+password_executor = PasswordHashExecutor()
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_executor.run(password_executor.hash_latency, get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_executor.run(
+        password_executor.verify_latency, verify_password, plain_password, hashed_password,
+    )
+
 def create_access_token(
         *,
         subject: str,
@@ -1,22 +1,272 @@
-from datetime import datetime
+import asyncio
+import os
+from datetime import datetime, timezone
+from typing import AsyncIterator
+
+from jose import JWTError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
 from app.database import AsyncSessionLocal
-from app.repositories import ParticipationRepository, RideRepository
+from app.security import decode_access_token
+from app.repositories import (
+    LocationHistoryRepository,
+    ParticipationRepository,
+    RideRepository,
+    RouteRepository,
+    UserRepository,
+)
+from app.repositories.ride import RideRecord
+from app.snapping import RouteSnapper, SnapResult, route_snappers
+from app.spatial import SpatialGrid, ride_positions
+from app.utils.cache import TTLCache
 
+LOCATION_FLUSH_INTERVAL_MS = int(os.getenv("LOCATION_FLUSH_INTERVAL_MS", 500))
+LOCATION_FLUSH_MAX_BATCH = int(os.getenv("LOCATION_FLUSH_MAX_BATCH", 500))
+LOCATION_HISTORY_ENABLED = os.getenv("LOCATION_HISTORY_ENABLED", "true").lower() == "true"
+LOCATION_HISTORY_MAX_BATCH = int(os.getenv("LOCATION_HISTORY_MAX_BATCH", 5000))
+# History kept in memory while the database is unreachable; oldest rows are dropped first
+LOCATION_HISTORY_MAX_PENDING = int(os.getenv("LOCATION_HISTORY_MAX_PENDING", 100000))
+# Deleted participations remembered so sockets drop their cached membership
+LOCATION_DEPARTED_MAX = int(os.getenv("LOCATION_DEPARTED_MAX", 10000))
+LOCATION_DEPARTED_TTL_SECONDS = float(os.getenv("LOCATION_DEPARTED_TTL_SECONDS", 3600))
 
-class LocationService:
-    @staticmethod
-    async def process_location_update(
-        user_id: int,
-        ride_code: str,
+
+def parse_location_timestamp(location_timestamp: str | datetime) -> datetime:
+    if isinstance(location_timestamp, str):
+        try:
+            return datetime.fromisoformat(location_timestamp)
+        except ValueError:
+            raise ValueError("Service Warning: Invalid location timestamp format")
+    return location_timestamp
+
+
+class LocationWriteBuffer:
+    """
+    Write-behind buffer for live participant positions.
+
+    Keeps only the latest fix per participation and periodically
+    writes everything pending to `participations` as one bulk UPDATE.
+    Every fix is also queued for `location_history` and appended in the
+    same flush with multi-row INSERTs (COPY on PostgreSQL), in a separate
+    transaction; fixes of participations deleted meanwhile are dropped.
+    Participations found missing are remembered as departed, so sockets
+    holding them in their session stop sending for them.
+    """
+
+    def __init__(
+        self,
+        *,
+        flush_interval_ms: int = LOCATION_FLUSH_INTERVAL_MS,
+        max_batch_size: int = LOCATION_FLUSH_MAX_BATCH,
+        history_enabled: bool = LOCATION_HISTORY_ENABLED,
+        history_batch_size: int = LOCATION_HISTORY_MAX_BATCH,
+        history_max_pending: int = LOCATION_HISTORY_MAX_PENDING,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+    ):
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.history_enabled = history_enabled
+        self.history_batch_size = history_batch_size
+        self.history_max_pending = history_max_pending
+        self.session_factory = session_factory
+
+        self._pending: dict[int, dict] = {}
+        self._history: list[dict] = []
+        self._batch_ready = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._departed: TTLCache[int, bool] = TTLCache(
+            max_size=LOCATION_DEPARTED_MAX, ttl_seconds=LOCATION_DEPARTED_TTL_SECONDS,
+        )
+
+        self.flushed_rows = 0
+        self.flush_count = 0
+        self.history_rows = 0
+        self.history_dropped = 0
+        self.history_orphaned = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "pending": len(self._pending),
+            "flush_count": self.flush_count,
+            "flushed_rows": self.flushed_rows,
+            "history_pending": len(self._history),
+            "history_rows": self.history_rows,
+            "history_dropped": self.history_dropped,
+            "history_orphaned": self.history_orphaned,
+            "departed": len(self._departed),
+            "flush_interval_ms": int(self.flush_interval * 1000),
+            "max_batch_size": self.max_batch_size,
+        }
+
+    def add(
+        self,
+        *,
+        participation_id: int,
         latitude: float,
         longitude: float,
-        location_timestamp: str | datetime,
-    ): 
+        location_timestamp: datetime,
+        speed: float | None = None,
+        altitude: float | None = None,
+    ) -> None:
+        # Overwrite: only the newest fix of a rider is worth persisting
+        self._pending[participation_id] = {
+            "participation_id": participation_id,
+            "latitude": latitude,
+            "longitude": longitude,
+            "location_timestamp": location_timestamp,
+        }
+        if len(self._pending) >= self.max_batch_size:
+            self._batch_ready.set()
+
+        if self.history_enabled:
+            self._history.append({
+                "participation_id": participation_id,
+                "latitude": latitude,
+                "longitude": longitude,
+                "speed": speed,
+                "altitude": altitude,
+                "timestamp": location_timestamp,
+            })
+            self._trim_history()
+            if len(self._history) >= self.history_batch_size:
+                self._batch_ready.set()
+
+    def forget(self, participation_id: int) -> None:
+        """Drop what is buffered for a deleted participation and remember it as departed."""
+        self._pending.pop(participation_id, None)
+        self._history[:] = [row for row in self._history if row["participation_id"] != participation_id]
+        self._departed.set(participation_id, True)
+
+    def has_departed(self, participation_id: int) -> bool:
+        return self._departed.get(participation_id, False)
+
+    def _trim_history(self) -> None:
+        overflow = len(self._history) - self.history_max_pending
+        if overflow > 0:
+            del self._history[:overflow]
+            self.history_dropped += overflow
+
+    async def flush(self) -> int:
+        """Write all pending positions and history. Returns the number of updated rows."""
+        async with self._flush_lock:
+            updated = 0
+            while self._pending or self._history:
+                keys = list(self._pending)[: self.max_batch_size]
+                batch = [self._pending.pop(key) for key in keys]
+                try:
+                    updated += await self._write_positions(batch)
+                except Exception:
+                    # Put the batch back unless a newer fix arrived meanwhile
+                    for key, item in zip(keys, batch):
+                        self._pending.setdefault(key, item)
+                    raise
+
+                # Own transaction, a failing history write must not hold back live positions
+                history = self._history[: self.history_batch_size]
+                del self._history[: len(history)]
+                try:
+                    self.history_rows += await self._write_history(history)
+                except Exception:
+                    self._history[:0] = history
+                    self._trim_history()
+                    raise
+
+            self.flushed_rows += updated
+            self.flush_count += 1
+            return updated
+
+    async def _write_positions(self, batch: list[dict]) -> int:
+        if not batch:
+            return 0
+        async with self.session_factory() as session:
+            async with session.begin():
+                participation_repository = ParticipationRepository(session=session)
+                updated = await participation_repository.bulk_update_locations(updates=batch)
+                if updated != len(batch):
+                    # Some riders left; not every driver reports executemany rowcounts, so look
+                    existing = await participation_repository.get_existing_ids(
+                        participation_ids=[item["participation_id"] for item in batch],
+                    )
+                    for item in batch:
+                        if item["participation_id"] not in existing:
+                            self._departed.set(item["participation_id"], True)
+                return updated
+
+    async def _write_history(self, history: list[dict]) -> int:
+        if not history:
+            return 0
+        async with self.session_factory() as session:
+            async with session.begin():
+                participation_repository = ParticipationRepository(session=session)
+                history_repository = LocationHistoryRepository(session=session)
+                # Riders who left (or whose ride was deleted) since the fix was buffered
+                existing = await participation_repository.get_existing_ids(
+                    participation_ids=[row["participation_id"] for row in history],
+                    lock=True,
+                )
+                rows = [row for row in history if row["participation_id"] in existing]
+                for row in history:
+                    if row["participation_id"] not in existing:
+                        self._departed.set(row["participation_id"], True)
+                self.history_orphaned += len(history) - len(rows)
+                return await history_repository.append_many(rows=rows)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error flushing location buffer: {e}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and drain whatever is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+location_buffer = LocationWriteBuffer()
+
+
+class LocationService:
+    @staticmethod
+    async def resolve_ride(ride_code: str) -> RideRecord | None:
+        # The session only checks out a connection on a cache miss
+        async with AsyncSessionLocal() as session:
+            ride_repository = RideRepository(session=session)
+            return await ride_repository.get_record_by_code(ride_code=ride_code)
+
+    @staticmethod
+    async def resolve_membership(ride_code: str, user_id: int) -> dict[str, int]:
+        """
+        Look up the participation of a user in a ride once, so the socket
+        can keep the ids in its session and skip the lookup afterwards.
+        """
         async with AsyncSessionLocal() as session:
             ride_repository = RideRepository(session=session)
             participation_repository = ParticipationRepository(session=session)
 
-            ride = await ride_repository.get_by_code(ride_code=ride_code)
+            ride = await ride_repository.get_record_by_code(ride_code=ride_code)
             if not ride:
                 raise ValueError(f"Service Warning: Ride {ride_code} not found")
 
@@ -24,29 +274,173 @@ class LocationService:
                 user_id=user_id,
                 ride_id=ride.id,
             )
+            if not participation:
+                raise ValueError(f"Service Warning: User {user_id} not found in ride {ride_code}")
+
+            return {
+                "ride_id": ride.id,
+                "participation_id": participation.id,
+                "user_id": user_id,
+            }
+
+    @staticmethod
+    def enqueue_location_update(
+        participation_id: int,
+        latitude: float,
+        longitude: float,
+        location_timestamp: str | datetime,
+        speed: float | None = None,
+        altitude: float | None = None,
+    ) -> None:
+        """Queue a fix for the write-behind buffer instead of writing it now."""
+        location_buffer.add(
+            participation_id=participation_id,
+            latitude=float(latitude),
+            longitude=float(longitude),
+            location_timestamp=parse_location_timestamp(location_timestamp),
+            speed=float(speed) if speed is not None else None,
+            altitude=float(altitude) if altitude is not None else None,
+        )
+
+    @staticmethod
+    def forget_participation(participation_id: int) -> None:
+        location_buffer.forget(participation_id)
+
+    @staticmethod
+    def has_departed(participation_id: int) -> bool:
+        """Whether the participation was deleted (seen by this worker) since the socket resolved it."""
+        return location_buffer.has_departed(participation_id)
 
-            if participation:
-        
-                if isinstance(location_timestamp, str):
-                    try:
-                        timestamp = datetime.fromisoformat(location_timestamp)
-                    except ValueError:
-                        raise ValueError("Service Warning: Invalid location timestamp format")
-                else:
-                    timestamp = location_timestamp
-
-                await participation_repository.update_participation(
-                    participation=participation,
-                    latitude=float(latitude),
-                    longitude=float(longitude),
-                    location_timestamp=timestamp,
-                )
-            else:
-                raise ValueError(f"Service Warning: User {user_id} not found in ride {ride_code}")      
-    
     @staticmethod
     async def validate_ride(ride_code: str) -> bool:
+        ride = await LocationService.resolve_ride(ride_code)
+        return ride is not None
+
+
+class SocketAuthService:
+    @staticmethod
+    async def identify(token: str) -> dict[str, int | str]:
+        """
+        Decode an access token and load its user once per socket connection.
+        Raises ValueError if the token or the user is not valid.
+        """
+        try:
+            payload = decode_access_token(token)
+            sub = payload.get("sub")
+            if sub is None:
+                raise JWTError("Subject not found in token")
+            user_id = int(sub)
+        except (ValueError, JWTError):
+            raise ValueError("Service Warning: Invalid token")
+
         async with AsyncSessionLocal() as session:
-            ride_repository = RideRepository(session=session)
-            ride = await ride_repository.get_by_code(ride_code=ride_code)
-            return ride is not None
+            user_repository = UserRepository(session=session)
+            user = await user_repository.get_record_by_id(user_id=user_id)
+            if not user:
+                raise ValueError("Service Warning: User not found")
+
+            return {"user_id": user.id, "username": user.username}
+
+
+class ReplayService:
+    @staticmethod
+    async def iter_frames(
+        history_repository: LocationHistoryRepository,
+        *,
+        ride_id: int,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        min_interval_ms: int = 0,
+    ) -> AsyncIterator[dict]:
+        """
+        Stream a ride's recorded fixes in time order, keeping at most one
+        fix per rider every `min_interval_ms`.
+        """
+        last_sent: dict[int, datetime] = {}
+        async for row in history_repository.stream_for_ride(ride_id=ride_id, start=start, end=end):
+            timestamp = row["timestamp"]
+            if timestamp.tzinfo is None:
+                timestamp = timestamp.replace(tzinfo=timezone.utc)
+
+            previous = last_sent.get(row["user_id"])
+            if previous is not None and (timestamp - previous).total_seconds() * 1000 < min_interval_ms:
+                continue
+            last_sent[row["user_id"]] = timestamp
+
+            yield {
+                "user_id": row["user_id"],
+                "latitude": row["latitude"],
+                "longitude": row["longitude"],
+                "speed": row["speed"],
+                "altitude": row["altitude"],
+                "location_timestamp": timestamp,
+            }
+
+
+class NearbyService:
+    @staticmethod
+    async def ride_grid(ride_repository: RideRepository, *, ride_id: int, ride_code: str) -> SpatialGrid:
+        """
+        This process's spatial index of the ride. Seeded from the stored last
+        positions when no fix of the ride has passed through this worker yet.
+        """
+        grid = ride_positions.get(ride_code)
+        if grid is None:
+            positions = await ride_repository.get_last_positions(ride_id=ride_id)
+            # Numeric columns come back as Decimal
+            grid = ride_positions.seed(
+                ride_code,
+                ((user_id, float(latitude), float(longitude)) for user_id, latitude, longitude in positions),
+            )
+        return grid
+
+
+class ProgressService:
+    @staticmethod
+    async def fetch_geometry(route_id: int) -> bytes | str | None:
+        async with AsyncSessionLocal() as session:
+            route_repository = RouteRepository(session=session)
+            return await route_repository.get_geometry_source(route_id=route_id)
+
+    @staticmethod
+    def annotate(ride: RideRecord | None, location: dict) -> None:
+        """
+        Add `progress_m` and `cross_track_m` to a live fix. Never waits: if
+        the route's snapper is not built yet, this starts building it and
+        the fix goes out without progress.
+        """
+        if ride is None or ride.route_id is None:
+            return
+        route_id = ride.route_id
+        snapper = route_snappers.prepare(route_id, lambda: ProgressService.fetch_geometry(route_id))
+        if snapper is None:
+            return
+
+        result = route_snappers.snap(
+            ride.code, location['user_id'], snapper, location['latitude'], location['longitude'],
+        )
+        if result is not None:
+            location['progress_m'] = round(result.progress_m, 1)
+            location['cross_track_m'] = round(result.cross_track_m, 1)
+
+    @staticmethod
+    async def ride_snapper(route_repository: RouteRepository, *, route_id: int) -> RouteSnapper | None:
+        return await route_snappers.load(
+            route_id, lambda: route_repository.get_geometry_source(route_id=route_id),
+        )
+
+    @staticmethod
+    def snap_position(
+        snapper: RouteSnapper | None,
+        *,
+        ride_code: str,
+        user_id: int,
+        latitude: float | None,
+        longitude: float | None,
+    ) -> SnapResult | None:
+        """Snap a stored position, hinted by the rider's live progress but without changing it."""
+        if snapper is None or latitude is None or longitude is None:
+            return None
+        return route_snappers.snap(
+            ride_code, user_id, snapper, float(latitude), float(longitude), remember=False,
+        )
@@ -0,0 +1,178 @@
+import asyncio
+import os
+from typing import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.database import AsyncSessionLocal
+from app.executors import cpu_executor
+from app.repositories import RouteRepository
+from app.utils.cache import TTLCache
+from app.utils.geometry import (
+    RouteGeometry,
+    RouteLod,
+    build_route_geometry,
+    encode_polyline,
+    simplify_levels,
+    unpack_geometry,
+)
+
+ROUTE_LOD_ENABLED = os.getenv("ROUTE_LOD_ENABLED", "true").lower() == "true"
+# Map zooms with a stored simplified polyline; a request is served the next finer one
+ROUTE_LOD_ZOOMS = sorted({int(zoom) for zoom in os.getenv("ROUTE_LOD_ZOOMS", "6,8,10,12,14,16").split(",")})
+# Allowed deviation from the full track, in screen pixels at the level's zoom
+ROUTE_LOD_TOLERANCE_PX = float(os.getenv("ROUTE_LOD_TOLERANCE_PX", 1.0))
+# Levels computed on request (not stored yet) kept per worker
+ROUTE_LOD_CACHE_SIZE = int(os.getenv("ROUTE_LOD_CACHE_SIZE", 128))
+ROUTE_LOD_CACHE_TTL_SECONDS = float(os.getenv("ROUTE_LOD_CACHE_TTL_SECONDS", 3600))
+
+
+def lod_zoom(zoom: int | None, zooms: list[int] = ROUTE_LOD_ZOOMS) -> int | None:
+    """The stored level for a map zoom: the coarsest one at least as fine, None for full resolution."""
+    if zoom is None:
+        return None
+    return next((level for level in zooms if level >= zoom), None)
+
+
+def compute_route_lods(
+    source: RouteGeometry | bytes | str,
+    zooms: list[int],
+    tolerance_px: float,
+    include_full: bool = False,
+) -> list[RouteLod]:
+    """Simplified levels of a geometry, packed geometry or GPX; runs in the CPU pool."""
+    if isinstance(source, str):
+        source = build_route_geometry(source)
+    elif isinstance(source, bytes):
+        source = unpack_geometry(source)
+
+    lods = simplify_levels(source, zooms, tolerance_px=tolerance_px)
+    if include_full:
+        lods.append(RouteLod(None, 0.0, source.point_count, encode_polyline(source.lats, source.lons)))
+    return lods
+
+
+class RouteSimplifier:
+    """
+    Background worker that simplifies route geometry once per route.
+
+    Route writes enqueue the route after their transaction commits; the
+    worker runs Douglas-Peucker in the CPU pool and stores one encoded
+    polyline per zoom level. Requests for a route whose levels are not
+    stored yet get them computed on the spot (cached in this process) and
+    enqueue the route, so a missed or failed run heals itself.
+    """
+
+    def __init__(
+        self,
+        *,
+        zooms: list[int] = ROUTE_LOD_ZOOMS,
+        tolerance_px: float = ROUTE_LOD_TOLERANCE_PX,
+        cache_size: int = ROUTE_LOD_CACHE_SIZE,
+        cache_ttl_seconds: float = ROUTE_LOD_CACHE_TTL_SECONDS,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+    ):
+        self.zooms = zooms
+        self.tolerance_px = tolerance_px
+        self.session_factory = session_factory
+
+        self._queue: asyncio.Queue[int] = asyncio.Queue()
+        self._queued: set[int] = set()
+        self._task: asyncio.Task | None = None
+        # (route_id, route revision) -> levels
+        self._computed: TTLCache[tuple[int, int], dict[int | None, RouteLod]] = TTLCache(
+            max_size=cache_size, ttl_seconds=cache_ttl_seconds,
+        )
+
+        self.simplified = 0
+        self.computed_on_request = 0
+        self.failed = 0
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "running": self._task is not None,
+            "queued": len(self._queued),
+            "simplified": self.simplified,
+            "computed_on_request": self.computed_on_request,
+            "failed": self.failed,
+            "cache": self._computed.stats(),
+            "zooms": self.zooms,
+        }
+
+    def clear(self) -> None:
+        self._computed.clear()
+
+    def forget(self, route_id: int) -> None:
+        """The route was deleted, drop its levels computed on request."""
+        self._computed.invalidate_where(lambda key: key[0] == route_id)
+
+    def enqueue(self, route_id: int) -> None:
+        if route_id not in self._queued:
+            self._queued.add(route_id)
+            self._queue.put_nowait(route_id)
+
+    async def simplify(self, route_id: int) -> int:
+        """Compute and store the route's levels. Returns how many were written."""
+        async with self.session_factory() as session:
+            async with session.begin():
+                route_repository = RouteRepository(session=session)
+                # Locked, so a concurrent GPX update cannot land between reading and writing
+                source = await route_repository.get_geometry_source(route_id=route_id, for_update=True)
+                if source is None:
+                    return 0
+                if isinstance(source, str):
+                    # Not backfilled yet: store the geometry on the way
+                    source = await cpu_executor.run(build_route_geometry, source)
+                    await route_repository.save_geometry(route_id=route_id, geometry=source)
+                lods = await cpu_executor.run(compute_route_lods, source, self.zooms, self.tolerance_px)
+                await route_repository.save_lods(route_id=route_id, lods=lods)
+
+        self.simplified += 1
+        return len(lods)
+
+    async def compute(
+        self,
+        route_id: int,
+        revision: int,
+        load_source: Callable[[], Awaitable[bytes | str | None]],
+    ) -> dict[int | None, RouteLod] | None:
+        """Every level of a route whose levels are not stored yet, including the full one (key None)."""
+        lods = self._computed.get((route_id, revision))
+        if lods is None:
+            source = await load_source()
+            if source is None:
+                return None
+            levels = await cpu_executor.run(
+                compute_route_lods, source, self.zooms, self.tolerance_px, include_full=True,
+            )
+            lods = {lod.zoom: lod for lod in levels}
+            self._computed.set((route_id, revision), lods)
+            self.computed_on_request += 1
+            self.enqueue(route_id)
+        return lods
+
+    async def _run(self) -> None:
+        while True:
+            route_id = await self._queue.get()
+            self._queued.discard(route_id)
+            try:
+                await self.simplify(route_id)
+            except Exception as e:
+                self.failed += 1
+                print(f"Error simplifying route {route_id}: {e}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+route_simplifier = RouteSimplifier()
@@ -0,0 +1,308 @@
+import asyncio
+import math
+import os
+import time
+from typing import Awaitable, Callable, NamedTuple, Sequence
+
+from app.executors import cpu_executor
+from app.utils.cache import TTLCache
+from app.utils.geo import EARTH_RADIUS_M
+from app.utils.geometry import RouteGeometry, build_route_geometry, geometry_from_points, unpack_geometry
+
+# Edge of a segment-index cell; around the typical snapping distance keeps lookups to a few cells
+SNAP_CELL_M = float(os.getenv("SNAP_CELL_M", 100))
+# Fixes farther than this from the route are off route and get no progress
+SNAP_MAX_DISTANCE_M = float(os.getenv("SNAP_MAX_DISTANCE_M", 500))
+# Segments this close to the best match are equally plausible (out-and-back, loops);
+# the one nearest to the rider's previous progress wins
+SNAP_AMBIGUITY_M = float(os.getenv("SNAP_AMBIGUITY_M", 30))
+# Route indexes kept per worker, rebuilt after the TTL in case another worker changed the GPX
+SNAP_CACHE_SIZE = int(os.getenv("SNAP_CACHE_SIZE", 256))
+SNAP_CACHE_TTL_SECONDS = float(os.getenv("SNAP_CACHE_TTL_SECONDS", 3600))
+# Last progress per rider, forgotten for rides without fixes for this long
+SNAP_PROGRESS_TTL_SECONDS = float(os.getenv("SNAP_PROGRESS_TTL_SECONDS", 1800))
+
+_METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+# Loads a route's packed geometry, or its GPX if it has none yet, see build_route_snapper
+GeometryLoader = Callable[[], Awaitable[bytes | str | None]]
+
+
+class SnapResult(NamedTuple):
+    # Along-track distance from the start of the route
+    progress_m: float
+    # Distance from the route, positive left of the direction of travel
+    cross_track_m: float
+    segment: int
+
+
+class RouteSnapper:
+    """
+    Projects positions onto a route polyline.
+
+    Points are projected to a local plane in meters around the route's
+    center, cumulative along-track distances are precomputed and every
+    segment is registered in the cells of a uniform grid it passes
+    through. A snap only looks at the segments of the cells around the
+    fix instead of the whole route. Plain lists and dicts, so an index
+    can be built in the CPU process pool and sent back.
+    """
+
+    def __init__(
+        self,
+        lats: Sequence[float],
+        lons: Sequence[float],
+        *,
+        cumulative_m: Sequence[float] | None = None,
+        cell_m: float = SNAP_CELL_M,
+    ):
+        self.cell_m = cell_m
+        count = len(lats)
+        self.point_count = count
+
+        self._lat0 = (min(lats) + max(lats)) / 2 if count else 0.0
+        self._lon0 = (min(lons) + max(lons)) / 2 if count else 0.0
+        self._kx = _METERS_PER_DEGREE * math.cos(math.radians(self._lat0))
+        self._xs = [(lon - self._lon0) * self._kx for lon in lons]
+        self._ys = [(lat - self._lat0) * _METERS_PER_DEGREE for lat in lats]
+
+        # Haversine, so the total matches the route's distance_meters
+        if cumulative_m is None:
+            cumulative_m = geometry_from_points(lats, lons).cumulative_m
+        self._cumulative = list(cumulative_m) or [0.0]
+
+        self._cells: dict[tuple[int, int], list[int]] = {}
+        for segment in range(count - 1):
+            for cell in self._segment_cells(segment):
+                self._cells.setdefault(cell, []).append(segment)
+
+    @property
+    def length_m(self) -> float:
+        return self._cumulative[-1]
+
+    def _project(self, latitude: float, longitude: float) -> tuple[float, float]:
+        return (longitude - self._lon0) * self._kx, (latitude - self._lat0) * _METERS_PER_DEGREE
+
+    def _cell(self, x: float, y: float) -> tuple[int, int]:
+        return math.floor(x / self.cell_m), math.floor(y / self.cell_m)
+
+    def _segment_cells(self, segment: int) -> set[tuple[int, int]]:
+        x1, y1, x2, y2 = self._xs[segment], self._ys[segment], self._xs[segment + 1], self._ys[segment + 1]
+        (col1, row1), (col2, row2) = self._cell(x1, y1), self._cell(x2, y2)
+        if (abs(col2 - col1) + 1) * (abs(row2 - row1) + 1) <= 9:
+            return {
+                (col, row)
+                for col in range(min(col1, col2), max(col1, col2) + 1)
+                for row in range(min(row1, row2), max(row1, row2) + 1)
+            }
+
+        # Long diagonal: walk it in half-cell steps, the neighbours cover clipped corners
+        steps = math.ceil(math.hypot(x2 - x1, y2 - y1) / (self.cell_m / 2))
+        cells = set()
+        for step in range(steps + 1):
+            t = step / steps
+            col, row = self._cell(x1 + (x2 - x1) * t, y1 + (y2 - y1) * t)
+            cells.update((col + dc, row + dr) for dc in (-1, 0, 1) for dr in (-1, 0, 1))
+        return cells
+
+    def _ring(self, center: tuple[int, int], radius: int):
+        col, row = center
+        if radius == 0:
+            yield center
+            return
+        for d in range(-radius, radius + 1):
+            yield col + d, row - radius
+            yield col + d, row + radius
+        for d in range(-radius + 1, radius):
+            yield col - radius, row + d
+            yield col + radius, row + d
+
+    def _measure(self, segment: int, x: float, y: float) -> tuple[float, float, float]:
+        """(distance, progress, signed cross-track) of a point against one segment."""
+        ax, ay = self._xs[segment], self._ys[segment]
+        dx, dy = self._xs[segment + 1] - ax, self._ys[segment + 1] - ay
+        px, py = x - ax, y - ay
+        length_sq = dx * dx + dy * dy
+        t = 0.0 if length_sq == 0 else min(1.0, max(0.0, (px * dx + py * dy) / length_sq))
+
+        distance = math.hypot(px - dx * t, py - dy * t)
+        start = self._cumulative[segment]
+        progress = start + (self._cumulative[segment + 1] - start) * t
+        cross = (dx * py - dy * px) / math.sqrt(length_sq) if length_sq else distance
+        return distance, progress, cross
+
+    def snap(
+        self,
+        latitude: float,
+        longitude: float,
+        *,
+        hint_m: float | None = None,
+        max_distance_m: float = SNAP_MAX_DISTANCE_M,
+        ambiguity_m: float = SNAP_AMBIGUITY_M,
+    ) -> SnapResult | None:
+        """
+        Closest point of the route, None if the fix is off route. Where the
+        route passes the fix more than once, `hint_m` (the rider's previous
+        progress) picks the pass.
+        """
+        if not self._cells:
+            return None
+
+        x, y = self._project(latitude, longitude)
+        center = self._cell(x, y)
+        seen: set[int] = set()
+        candidates: list[tuple[float, float, float, int]] = []
+        best = math.inf
+        radius = 0
+        # After rings 0..r, every segment closer than r * cell_m has been seen
+        while (radius - 1) * self.cell_m < min(best + ambiguity_m, max_distance_m):
+            for cell in self._ring(center, radius):
+                for segment in self._cells.get(cell, ()):
+                    if segment in seen:
+                        continue
+                    seen.add(segment)
+                    distance, progress, cross = self._measure(segment, x, y)
+                    if distance <= max_distance_m:
+                        candidates.append((distance, progress, cross, segment))
+                        best = min(best, distance)
+            radius += 1
+
+        if not candidates:
+            return None
+        plausible = [candidate for candidate in candidates if candidate[0] <= best + ambiguity_m]
+        if hint_m is None:
+            chosen = min(plausible)
+        else:
+            chosen = min(plausible, key=lambda candidate: (abs(candidate[1] - hint_m), candidate[0]))
+        _, progress, cross, segment = chosen
+        return SnapResult(progress, cross, segment)
+
+
+def build_route_snapper(source: RouteGeometry | bytes | str, cell_m: float = SNAP_CELL_M) -> RouteSnapper:
+    """
+    Snapper from a route's geometry, its packed form, or for routes without
+    a stored geometry yet, its GPX (one without segments if unparseable).
+    """
+    if isinstance(source, str):
+        source = build_route_geometry(source)
+    elif isinstance(source, bytes):
+        source = unpack_geometry(source)
+    return RouteSnapper(source.lats, source.lons, cumulative_m=source.cumulative_m, cell_m=cell_m)
+
+
+class RouteSnappers:
+    """
+    RouteSnapper per route id for this worker, built in the CPU pool, plus
+    each rider's last progress per ride code to tell passes apart.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_routes: int = SNAP_CACHE_SIZE,
+        ttl_seconds: float = SNAP_CACHE_TTL_SECONDS,
+        progress_ttl_seconds: float = SNAP_PROGRESS_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._snappers: TTLCache[int, RouteSnapper] = TTLCache(
+            max_size=max_routes, ttl_seconds=ttl_seconds, clock=clock,
+        )
+        # Ride code -> user_id -> progress_m
+        self._progress: TTLCache[str, dict[int, float]] = TTLCache(
+            max_size=max_routes * 16, ttl_seconds=progress_ttl_seconds, clock=clock,
+        )
+        self._building: dict[int, asyncio.Task] = {}
+
+        self.builds = 0
+        self.snaps = 0
+        self.off_route = 0
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "routes": self._snappers.stats(),
+            "building": len(self._building),
+            "builds": self.builds,
+            "snaps": self.snaps,
+            "off_route": self.off_route,
+        }
+
+    def clear(self) -> None:
+        self._snappers.clear()
+        self._progress.clear()
+
+    def get(self, route_id: int) -> RouteSnapper | None:
+        return self._snappers.get(route_id)
+
+    def put(self, route_id: int, snapper: RouteSnapper) -> None:
+        self._snappers.set(route_id, snapper)
+
+    def invalidate(self, route_id: int) -> None:
+        self._snappers.invalidate(route_id)
+
+    def forget_ride(self, ride_code: str) -> None:
+        """Drop the riders' progress of an archived ride."""
+        self._progress.invalidate(ride_code)
+
+    async def _build(self, route_id: int, fetch_geometry: GeometryLoader) -> RouteSnapper | None:
+        try:
+            source = await fetch_geometry()
+            if source is None:
+                return None
+            snapper = await cpu_executor.run(build_route_snapper, source)
+            self.builds += 1
+            self.put(route_id, snapper)
+            return snapper
+        finally:
+            self._building.pop(route_id, None)
+
+    def _start_build(self, route_id: int, fetch_geometry: GeometryLoader) -> asyncio.Task:
+        task = self._building.get(route_id)
+        if task is None:
+            task = self._building[route_id] = asyncio.create_task(self._build(route_id, fetch_geometry))
+            task.add_done_callback(_log_build_error)
+        return task
+
+    async def load(self, route_id: int, fetch_geometry: GeometryLoader) -> RouteSnapper | None:
+        """The route's snapper, building it first if needed (one build per route at a time)."""
+        snapper = self.get(route_id)
+        if snapper is None:
+            snapper = await asyncio.shield(self._start_build(route_id, fetch_geometry))
+        return snapper
+
+    def prepare(self, route_id: int, fetch_geometry: GeometryLoader) -> RouteSnapper | None:
+        """The route's snapper if it is ready; otherwise start building it in the background."""
+        snapper = self.get(route_id)
+        if snapper is None:
+            self._start_build(route_id, fetch_geometry)
+        return snapper
+
+    def snap(
+        self,
+        ride_code: str,
+        user_id: int,
+        snapper: RouteSnapper,
+        latitude: float,
+        longitude: float,
+        *,
+        remember: bool = True,
+    ) -> SnapResult | None:
+        """Snap a rider's fix, using (and with `remember`, updating) their last progress."""
+        progress = self._progress.get(ride_code)
+        result = snapper.snap(latitude, longitude, hint_m=progress.get(user_id) if progress else None)
+        self.snaps += 1
+        if result is None:
+            self.off_route += 1
+        elif remember:
+            if progress is None:
+                progress = {}
+            progress[user_id] = result.progress_m
+            self._progress.set(ride_code, progress)
+        return result
+
+
+def _log_build_error(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Error building route snapper: {task.exception()}")
+
+
+route_snappers = RouteSnappers()
@@ -1,23 +1,147 @@
+import os
 import socketio
 from datetime import datetime
+from socketio.exceptions import ConnectionRefusedError
 
-from app.services import LocationService
+from app.broadcast import LocationBroadcaster
+from app.models import BroadcastMode
+from app.proximity import ProximityEngine
+from app.pubsub import FanoutPubSubManager, create_client_manager
+from app.spatial import ride_positions
+from app.services import LocationService, ProgressService, SocketAuthService, parse_location_timestamp
+from app.snapping import route_snappers
+from app.throttle import LocationThrottle
 
-sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+# Anonymous sockets may watch rides but never send locations
+SOCKET_ALLOW_ANONYMOUS = os.getenv("SOCKET_ALLOW_ANONYMOUS", "true").lower() == "true"
+
+# SOCKETIO_MANAGER_URL shares rooms across workers, see app/pubsub.py
+sio = socketio.AsyncServer(
+    async_mode='asgi',
+    cors_allowed_origins='*',
+    client_manager=create_client_manager(),
+)
+broadcaster = LocationBroadcaster(sio)
+throttle = LocationThrottle()
+proximity = ProximityEngine(sio)
+
+async def relay_remote_emit(event, data, room):
+    await broadcaster.relay_remote(event, data, room)
+
+    # Riders on other workers count for this worker's proximity alerts and spatial index too
+    if event in ('location_update', 'location_batch'):
+        locations = [data] if event == 'location_update' else data['locations']
+        ride = await LocationService.resolve_ride(room)
+        for location in locations:
+            latitude, longitude = float(location['latitude']), float(location['longitude'])
+            ride_positions.update(room, location['user_id'], latitude, longitude)
+            proximity.update(
+                room,
+                location['user_id'],
+                latitude,
+                longitude,
+                leader_id=ride.created_by_user_id if ride else None,
+            )
+
+if isinstance(sio.manager, FanoutPubSubManager):
+    sio.manager.add_remote_listener(relay_remote_emit)
+
+def get_token(environ, auth) -> str | None:
+    if isinstance(auth, dict) and auth.get('token'):
+        return auth['token']
+
+    header = environ.get('HTTP_AUTHORIZATION', '')
+    if header.lower().startswith('bearer '):
+        return header[7:]
+    return None
 
 @sio.event
-async def connect(sid, environ):
-    print(f"Client connected: {sid}")
+async def connect(sid, environ, auth=None):
+    """
+    Authenticate once per connection.
+    auth: {'token': '<access token from /auth/login>'}
+    """
+    token = get_token(environ, auth)
+    if token is None:
+        if not SOCKET_ALLOW_ANONYMOUS:
+            raise ConnectionRefusedError('Authentication required')
+        print(f"Client connected: {sid} (anonymous)")
+        return
+
+    try:
+        identity = await SocketAuthService.identify(token)
+    except ValueError as e:
+        raise ConnectionRefusedError(str(e))
+
+    await sio.save_session(sid, {**identity, 'rides': {}})
+    print(f"Client connected: {sid} (user {identity['user_id']})")
+
+def forget_rider(*, ride_code: str, user_id: int, participation_id: int) -> None:
+    """Drop the rider's live state kept by this worker."""
+    throttle.forget(participation_id)
+    proximity.forget(ride_code, user_id)
+    ride_positions.remove(ride_code, user_id)
+
+def leave_ride(*, ride_code: str, user_id: int, participation_id: int) -> None:
+    """The participation was deleted: nothing of it may be sent or stored anymore."""
+    LocationService.forget_participation(participation_id)
+    forget_rider(ride_code=ride_code, user_id=user_id, participation_id=participation_id)
+
+def forget_ride(ride_code: str) -> None:
+    """The ride was archived: drop all live state this worker keeps for it."""
+    broadcaster.forget_room(ride_code)
+    proximity.forget_ride(ride_code)
+    ride_positions.forget_ride(ride_code)
+    route_snappers.forget_ride(ride_code)
 
 @sio.event
 async def disconnect(sid):
+    session = await sio.get_session(sid)
+    for ride_code, membership in session.get('rides', {}).items():
+        forget_rider(
+            ride_code=ride_code,
+            user_id=membership['user_id'],
+            participation_id=membership['participation_id'],
+        )
+    broadcaster.unsubscribe_compact(sid)
     print(f"Client disconnected: {sid}")
 
+async def get_membership(sid, ride_code: str) -> dict[str, int]:
+    """
+    Participation ids of the authenticated user in the ride, taken from the
+    socket session. Falls back to one DB lookup (then remembered) if
+    join_ride did not resolve it, or if the participation has been deleted
+    since (the rider left, or the ride was deleted or archived).
+    """
+    session = await sio.get_session(sid)
+    user_id = session.get('user_id')
+    if user_id is None:
+        raise ValueError("Service Warning: Authentication required")
+
+    membership = session.get('rides', {}).get(ride_code)
+    if membership:
+        if not LocationService.has_departed(membership['participation_id']):
+            return membership
+        forget_rider(ride_code=ride_code, user_id=user_id, participation_id=membership['participation_id'])
+        async with sio.session(sid) as session:
+            session['rides'].pop(ride_code, None)
+
+    membership = await LocationService.resolve_membership(ride_code=ride_code, user_id=user_id)
+    async with sio.session(sid) as session:
+        session.setdefault('rides', {})[ride_code] = membership
+    return membership
+
 @sio.event
 async def join_ride(sid, data):
     """
     Client joins a ride "room" to receive updates.
-    data: {'ride_code': 'ABC123'}
+    data: {'ride_code': 'ABC123', 'format': 'json' | 'compact'}
+
+    With 'compact' the socket receives binary `location_frame` events
+    (see app/utils/frames.py) instead of JSON location events.
+
+    For authenticated sockets the participation is resolved once and kept
+    in the socket session, so later location updates need no lookup.
     """
     ride_code = data.get('ride_code')
     if not ride_code:
@@ -28,54 +152,95 @@ async def join_ride(sid, data):
     if not exist:
         await sio.emit('error', {'msg': f'Ride {ride_code} not found'}, room=sid)
         return  
+
+    try:
+        await get_membership(sid, ride_code)
+    except ValueError as e:
+        # Anonymous or not a participant: can still watch the ride
+        print(f"join_ride without participation: {e}")
     
     # Join ride room
-    await sio.enter_room(sid, ride_code)
+    if data.get('format') == 'compact':
+        await broadcaster.subscribe_compact(sid, ride_code)
+    else:
+        await sio.enter_room(sid, ride_code)
     await sio.emit('message', {'msg': f'Joined ride {ride_code}'}, room=sid)
 
 @sio.event
 async def update_location(sid, data):
     """
-    1. Validate input
-    2. Broadcast to room (FAST!)
-    3. Save to DB (ASYNC BACKGROUND)
+    1. Validate input (identity and membership from the socket session, no DB)
+       and drop fixes too close in time or distance to the last accepted one
+    2. Broadcast to room (FAST!): per fix, or in the next tick's
+       `location_batch` for rides in batched mode
+    3. Queue for DB (WRITE-BEHIND, flushed in bulk)
     
     Client sends new GPS coordinates.
     data: {
         'ride_code': 'ABC123',
-        'user_id': 1,
         'latitude': 55.755, 
-        'longitude': 37.625
+        'longitude': 37.625,
+        'speed': 5.2,       # optional, m/s
+        'altitude': 520.0   # optional, m
     }
+    A 'user_id' in the payload is ignored, the sender is the socket's user.
     """
     ride_code = data.get('ride_code')
-    user_id = data.get('user_id')
     latitude = data.get('latitude')
     longitude = data.get('longitude')
     location_timestamp = data.get('location_timestamp')
     
-    if not (ride_code and user_id and latitude and longitude):
+    if not (ride_code and latitude and longitude):
         return
 
     if not location_timestamp:
         location_timestamp = datetime.utcnow().isoformat()
 
+    try:
+        membership = await get_membership(sid, ride_code)
+        timestamp = parse_location_timestamp(location_timestamp)
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError) as e:
+        print(f"Error processing location update: {e}")
+        await sio.emit('error', {'msg': str(e)}, room=sid)
+        return
+
+    if not throttle.admit(membership['participation_id'], latitude, longitude):
+        return
+
     # 1. BROADCAST 
-    await sio.emit('location_update', {
-        'user_id': user_id,
+    location = {
+        'user_id': membership['user_id'],
         'latitude': latitude,
         'longitude': longitude,
         'location_timestamp': location_timestamp
-    }, room=ride_code)
+    }
+    # 'progress_m' / 'cross_track_m' are added once the ride's route is indexed
+    ride = await LocationService.resolve_ride(ride_code)
+    ProgressService.annotate(ride, location)
+    await broadcaster.publish(
+        ride_code,
+        location,
+        batched=bool(ride and ride.broadcast_mode == BroadcastMode.BATCHED),
+    )
+    ride_positions.update(ride_code, membership['user_id'], latitude, longitude)
+    proximity.update(
+        ride_code,
+        membership['user_id'],
+        latitude,
+        longitude,
+        leader_id=ride.created_by_user_id if ride else None,
+    )
 
-    # 2. Save to DB (async background)
+    # 2. Queue for the write-behind buffer (flushed in bulk in the background)
     try:
-        await LocationService.process_location_update(
-            user_id=user_id,
-            ride_code=ride_code,
+        LocationService.enqueue_location_update(
+            participation_id=membership['participation_id'],
             latitude=latitude,
             longitude=longitude,
-            location_timestamp=location_timestamp
+            location_timestamp=timestamp,
+            speed=data.get('speed'),
+            altitude=data.get('altitude'),
         )
     except ValueError as e:
         print(f"Error processing location update: {e}")
@@ -0,0 +1,299 @@
+import heapq
+import math
+import os
+import time
+from typing import Callable, Iterable, NamedTuple
+
+from app.utils.geo import EARTH_RADIUS_M, haversine_distance
+
+# Edge of a grid cell; around the typical query radius keeps scans to a few cells
+SPATIAL_CELL_M = float(os.getenv("SPATIAL_CELL_M", 250))
+# Drop a ride's index after this long without a fix
+SPATIAL_INDEX_TTL_SECONDS = float(os.getenv("SPATIAL_INDEX_TTL_SECONDS", 1800))
+
+_METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+# Rings are only trusted up to this share of their nominal radius
+_RING_SAFETY = 0.99
+
+
+class Neighbour(NamedTuple):
+    user_id: int
+    latitude: float
+    longitude: float
+    distance_m: float
+
+
+class Bounds(NamedTuple):
+    min_latitude: float
+    min_longitude: float
+    max_latitude: float
+    max_longitude: float
+
+
+class SpatialGrid:
+    """
+    Uniform lat/lon grid over one ride's latest rider positions.
+
+    Cells are `cell_m` tall and, at the latitude of the first fix, as wide;
+    moving a rider is O(1), and queries only look at the cells a search
+    radius can reach instead of every rider. Not meant for rides spanning
+    the antimeridian or the poles.
+    """
+
+    def __init__(self, *, cell_m: float = SPATIAL_CELL_M):
+        self.cell_m = cell_m
+        self._lat_step = cell_m / _METERS_PER_DEGREE
+        self._lon_step: float | None = None
+
+        # user_id -> (latitude, longitude, cell)
+        self._positions: dict[int, tuple[float, float, tuple[int, int]]] = {}
+        self._cells: dict[tuple[int, int], set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._positions
+
+    def _cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        return math.floor(latitude / self._lat_step), math.floor(longitude / self._lon_step)
+
+    def position(self, user_id: int) -> tuple[float, float] | None:
+        entry = self._positions.get(user_id)
+        return None if entry is None else entry[:2]
+
+    def update(self, user_id: int, latitude: float, longitude: float) -> None:
+        if self._lon_step is None:
+            self._lon_step = self._lat_step / max(math.cos(math.radians(latitude)), 0.01)
+
+        cell = self._cell(latitude, longitude)
+        previous = self._positions.get(user_id)
+        if previous is not None and previous[2] != cell:
+            self._discard(user_id, previous[2])
+        if previous is None or previous[2] != cell:
+            self._cells.setdefault(cell, set()).add(user_id)
+        self._positions[user_id] = (latitude, longitude, cell)
+
+    def remove(self, user_id: int) -> None:
+        previous = self._positions.pop(user_id, None)
+        if previous is not None:
+            self._discard(user_id, previous[2])
+
+    def _discard(self, user_id: int, cell: tuple[int, int]) -> None:
+        members = self._cells[cell]
+        members.discard(user_id)
+        if not members:
+            del self._cells[cell]
+
+    def _ring(self, center: tuple[int, int], radius: int) -> Iterable[tuple[int, int]]:
+        """Occupied cells at Chebyshev distance `radius` from `center`."""
+        row, col = center
+        if radius == 0:
+            if center in self._cells:
+                yield center
+            return
+        for d in range(-radius, radius + 1):
+            for cell in ((row - radius, col + d), (row + radius, col + d)):
+                if cell in self._cells:
+                    yield cell
+        for d in range(-radius + 1, radius):
+            for cell in ((row + d, col - radius), (row + d, col + radius)):
+                if cell in self._cells:
+                    yield cell
+
+    def _covered_m(self, latitude: float, rings: int) -> float:
+        """Distance from a point that `rings` full rings around its cell are guaranteed to cover."""
+        lon_m = self._lon_step * _METERS_PER_DEGREE * math.cos(math.radians(latitude))
+        return rings * min(self.cell_m, lon_m) * _RING_SAFETY
+
+    def _scan(self, latitude: float, longitude: float, exclude: int | None):
+        """Yield (ring, [(user_id, lat, lon)] in it) outwards until every rider was seen."""
+        center = self._cell(latitude, longitude)
+        remaining = len(self._positions) - (exclude in self._positions)
+        radius = 0
+        while remaining > 0:
+            if 8 * radius > len(self._cells):
+                # Sparse far field: visiting the occupied cells beats walking empty rings
+                cells = [
+                    cell for cell in self._cells
+                    if max(abs(cell[0] - center[0]), abs(cell[1] - center[1])) >= radius
+                ]
+            else:
+                cells = self._ring(center, radius)
+            candidates = [
+                (user_id, *self._positions[user_id][:2])
+                for cell in cells
+                for user_id in self._cells[cell]
+                if user_id != exclude
+            ]
+            remaining -= len(candidates)
+            yield radius, candidates
+            radius += 1
+
+    @staticmethod
+    def _lower_bound_m(latitude: float, lat: float, lon_scale: float, longitude: float, lon: float) -> float:
+        """Cheap distance lower bound from the coordinate differences alone."""
+        return max(abs(lat - latitude), abs(lon - longitude) * lon_scale) * _METERS_PER_DEGREE * _RING_SAFETY
+
+    def within(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_m: float,
+        *,
+        exclude: int | None = None,
+    ) -> list[Neighbour]:
+        """Riders at most `radius_m` away, nearest first."""
+        lon_scale = math.cos(math.radians(latitude))
+        found = []
+        for ring, candidates in self._scan(latitude, longitude, exclude):
+            for user_id, lat, lon in candidates:
+                if self._lower_bound_m(latitude, lat, lon_scale, longitude, lon) > radius_m:
+                    continue
+                distance = haversine_distance(latitude, longitude, lat, lon)
+                if distance <= radius_m:
+                    found.append(Neighbour(user_id, lat, lon, distance))
+            # Farther rings only hold riders beyond the radius
+            if self._covered_m(latitude, ring) >= radius_m:
+                break
+        found.sort(key=lambda neighbour: neighbour.distance_m)
+        return found
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int,
+        *,
+        exclude: int | None = None,
+    ) -> list[Neighbour]:
+        """The `k` riders closest to the point, nearest first."""
+        if k <= 0:
+            return []
+        lon_scale = math.cos(math.radians(latitude))
+        # Max-heap of the best k so far (negated distances)
+        best: list[tuple[float, int, float, float]] = []
+        for ring, candidates in self._scan(latitude, longitude, exclude):
+            for user_id, lat, lon in candidates:
+                if len(best) == k and self._lower_bound_m(latitude, lat, lon_scale, longitude, lon) > -best[0][0]:
+                    continue
+                entry = (-haversine_distance(latitude, longitude, lat, lon), user_id, lat, lon)
+                if len(best) < k:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+            # Anything in a farther ring is at least this far away
+            if len(best) == k and -best[0][0] <= self._covered_m(latitude, ring):
+                break
+        return sorted(
+            (Neighbour(user_id, lat, lon, -distance) for distance, user_id, lat, lon in best),
+            key=lambda neighbour: neighbour.distance_m,
+        )
+
+    def bounds(self) -> Bounds | None:
+        """Bounding box of all riders, from the riders in the outermost cells only."""
+        if not self._positions:
+            return None
+        rows = [cell[0] for cell in self._cells]
+        cols = [cell[1] for cell in self._cells]
+        min_row, max_row, min_col, max_col = min(rows), max(rows), min(cols), max(cols)
+
+        edge_users = [
+            user_id
+            for cell, members in self._cells.items()
+            if cell[0] in (min_row, max_row) or cell[1] in (min_col, max_col)
+            for user_id in members
+        ]
+        lats = [self._positions[user_id][0] for user_id in edge_users]
+        lons = [self._positions[user_id][1] for user_id in edge_users]
+        return Bounds(min(lats), min(lons), max(lats), max(lons))
+
+
+class RideSpatialIndexes:
+    """SpatialGrid per active ride code, dropping rides without fixes for `ttl_seconds`."""
+
+    def __init__(
+        self,
+        *,
+        cell_m: float = SPATIAL_CELL_M,
+        ttl_seconds: float = SPATIAL_INDEX_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.cell_m = cell_m
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._grids: dict[str, SpatialGrid] = {}
+        self._touched: dict[str, float] = {}
+        self._pruned_at = clock()
+
+        self.updates = 0
+        self.queries = 0
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "rides": len(self._grids),
+            "riders": sum(len(grid) for grid in self._grids.values()),
+            "updates": self.updates,
+            "queries": self.queries,
+            "cell_m": self.cell_m,
+        }
+
+    def clear(self) -> None:
+        self._grids.clear()
+        self._touched.clear()
+
+    def get(self, ride_code: str) -> SpatialGrid | None:
+        self._maybe_prune(self._clock())
+        grid = self._grids.get(ride_code)
+        if grid is not None:
+            self.queries += 1
+        return grid
+
+    def seed(self, ride_code: str, positions: Iterable[tuple[int, float, float]]) -> SpatialGrid:
+        """Index for a ride this process has no fixes of yet, from stored last positions."""
+        self._maybe_prune(self._clock())
+        grid = self._grids.get(ride_code)
+        if grid is None:
+            grid = self._grids[ride_code] = SpatialGrid(cell_m=self.cell_m)
+            self._touched[ride_code] = self._clock()
+            for user_id, latitude, longitude in positions:
+                grid.update(user_id, latitude, longitude)
+        self.queries += 1
+        return grid
+
+    def update(self, ride_code: str, user_id: int, latitude: float, longitude: float) -> None:
+        now = self._clock()
+        grid = self._grids.get(ride_code)
+        if grid is None:
+            grid = self._grids[ride_code] = SpatialGrid(cell_m=self.cell_m)
+        grid.update(user_id, latitude, longitude)
+        self._touched[ride_code] = now
+        self.updates += 1
+        self._maybe_prune(now)
+
+    def remove(self, ride_code: str, user_id: int) -> None:
+        """The rider left the ride or disconnected."""
+        grid = self._grids.get(ride_code)
+        if grid is not None:
+            grid.remove(user_id)
+
+    def forget_ride(self, ride_code: str) -> None:
+        """The ride was archived."""
+        self._grids.pop(ride_code, None)
+        self._touched.pop(ride_code, None)
+
+    def _maybe_prune(self, now: float) -> None:
+        if now - self._pruned_at >= self.ttl_seconds:
+            self.prune(now)
+
+    def prune(self, now: float | None = None) -> int:
+        now = self._clock() if now is None else now
+        self._pruned_at = now
+        expired = [code for code, touched in self._touched.items() if now - touched >= self.ttl_seconds]
+        for code in expired:
+            self._grids.pop(code, None)
+            self._touched.pop(code, None)
+        return len(expired)
+
+
+ride_positions = RideSpatialIndexes()
@@ -0,0 +1,76 @@
+import os
+import time
+from typing import Callable
+
+from app.utils.geo import haversine_distance
+
+# A fix closer than this in time to the last accepted one is dropped
+LOCATION_MIN_INTERVAL_MS = int(os.getenv("LOCATION_MIN_INTERVAL_MS", 500))
+# A fix that moved less than this from the last accepted one is dropped...
+LOCATION_MIN_DISTANCE_M = float(os.getenv("LOCATION_MIN_DISTANCE_M", 2.0))
+# ...unless the rider has been silent for this long (keeps stationary riders alive)
+LOCATION_KEEPALIVE_MS = int(os.getenv("LOCATION_KEEPALIVE_MS", 15000))
+
+
+class LocationThrottle:
+    """
+    Per-participant admission filter for incoming GPS fixes.
+
+    Only admitted fixes are broadcast and persisted; suppressed ones are
+    superseded by the next admitted fix of the same rider.
+    """
+
+    def __init__(
+        self,
+        *,
+        min_interval_ms: int = LOCATION_MIN_INTERVAL_MS,
+        min_distance_m: float = LOCATION_MIN_DISTANCE_M,
+        keepalive_ms: int = LOCATION_KEEPALIVE_MS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_interval = min_interval_ms / 1000
+        self.min_distance_m = min_distance_m
+        self.keepalive = keepalive_ms / 1000
+        self._clock = clock
+
+        # participation_id -> (latitude, longitude, accepted_at)
+        self._last: dict[int, tuple[float, float, float]] = {}
+
+        self.admitted = 0
+        self.suppressed_interval = 0
+        self.suppressed_distance = 0
+
+    def admit(self, participation_id: int, latitude: float, longitude: float) -> bool:
+        now = self._clock()
+        last = self._last.get(participation_id)
+
+        if last is not None:
+            last_latitude, last_longitude, accepted_at = last
+            elapsed = now - accepted_at
+
+            if elapsed < self.min_interval:
+                self.suppressed_interval += 1
+                return False
+
+            if elapsed < self.keepalive and self.min_distance_m > 0:
+                moved = haversine_distance(last_latitude, last_longitude, latitude, longitude)
+                if moved < self.min_distance_m:
+                    self.suppressed_distance += 1
+                    return False
+
+        self._last[participation_id] = (latitude, longitude, now)
+        self.admitted += 1
+        return True
+
+    def forget(self, participation_id: int) -> None:
+        self._last.pop(participation_id, None)
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "tracked": len(self._last),
+            "admitted": self.admitted,
+            "suppressed_interval": self.suppressed_interval,
+            "suppressed_distance": self.suppressed_distance,
+            "min_interval_ms": int(self.min_interval * 1000),
+            "min_distance_m": self.min_distance_m,
+        }
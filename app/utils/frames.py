@@ -0,0 +1,164 @@
+"""
+Compact binary location frames for Socket.IO clients that opt in.
+
+Frame layout (all integers little-endian):
+    u8   version
+    u8   flags            FRAME_KEY if every entry is absolute
+    i64  base_ms          epoch milliseconds all entry times are relative to
+    var  count
+    count x entry:
+        var  index        small per-room participant index
+        var  entry_flags  ENTRY_ABSOLUTE if lat/lon are not deltas
+        svar lat          fixed-point degrees * 1e7 (or delta from last frame)
+        svar lon          fixed-point degrees * 1e7 (or delta from last frame)
+        svar dt_ms        entry timestamp - base_ms
+
+`var` is an unsigned LEB128 varint, `svar` a zigzag-encoded signed varint.
+"""
+import struct
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+FRAME_VERSION = 1
+FRAME_KEY = 0x01
+ENTRY_ABSOLUTE = 0x01
+
+COORD_SCALE = 10_000_000
+
+_HEADER = struct.Struct("<BBq")
+
+
+class FrameEntry(NamedTuple):
+    index: int
+    lat: int
+    lon: int
+    timestamp_ms: int
+    absolute: bool
+
+
+def to_fixed(degrees: float) -> int:
+    return round(degrees * COORD_SCALE)
+
+
+def from_fixed(value: int) -> float:
+    return value / COORD_SCALE
+
+
+def to_epoch_ms(value: datetime | str) -> int:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _write_svarint(out: bytearray, value: int) -> None:
+    _write_varint(out, (value << 1) ^ (value >> 63))
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _read_svarint(data: bytes, pos: int) -> tuple[int, int]:
+    value, pos = _read_varint(data, pos)
+    return (value >> 1) ^ -(value & 1), pos
+
+
+def encode_frame(entries: list[FrameEntry], *, keyframe: bool) -> bytes:
+    base_ms = min((entry.timestamp_ms for entry in entries), default=0)
+
+    out = bytearray(_HEADER.pack(FRAME_VERSION, FRAME_KEY if keyframe else 0, base_ms))
+    _write_varint(out, len(entries))
+    for entry in entries:
+        _write_varint(out, entry.index)
+        _write_varint(out, ENTRY_ABSOLUTE if entry.absolute else 0)
+        _write_svarint(out, entry.lat)
+        _write_svarint(out, entry.lon)
+        _write_svarint(out, entry.timestamp_ms - base_ms)
+    return bytes(out)
+
+
+def decode_frame(data: bytes) -> tuple[bool, list[FrameEntry]]:
+    """Reference decoder, returns (keyframe, entries) with raw (possibly delta) values."""
+    version, flags, base_ms = _HEADER.unpack_from(data)
+    if version != FRAME_VERSION:
+        raise ValueError(f"Unsupported frame version {version}")
+
+    count, pos = _read_varint(data, _HEADER.size)
+    entries = []
+    for _ in range(count):
+        index, pos = _read_varint(data, pos)
+        entry_flags, pos = _read_varint(data, pos)
+        lat, pos = _read_svarint(data, pos)
+        lon, pos = _read_svarint(data, pos)
+        dt_ms, pos = _read_svarint(data, pos)
+        entries.append(FrameEntry(index, lat, lon, base_ms + dt_ms, bool(entry_flags & ENTRY_ABSOLUTE)))
+    return bool(flags & FRAME_KEY), entries
+
+
+class RoomFrameEncoder:
+    """
+    Per-room encoder state: participant indexes and the last position the
+    room was sent for each of them, so frames can carry deltas.
+    """
+
+    def __init__(self, *, keyframe_interval: int):
+        self.keyframe_interval = keyframe_interval
+        self.indexes: dict[int, int] = {}
+        self._last_sent: dict[int, tuple[int, int]] = {}
+        self._frames_since_key = 0
+        self._force_key = True
+
+    def request_keyframe(self) -> None:
+        self._force_key = True
+
+    def encode(self, locations: list[dict]) -> tuple[bytes, dict[int, int]]:
+        """
+        Encode `locations` ({'user_id', 'latitude', 'longitude', 'location_timestamp'})
+        into a frame. Returns the frame and the newly assigned {index: user_id}.
+        """
+        # Frame N after a keyframe is the next keyframe: absolute positions every N frames
+        keyframe = self._force_key or self._frames_since_key >= self.keyframe_interval - 1
+        if keyframe:
+            self._last_sent.clear()
+            self._force_key = False
+            self._frames_since_key = 0
+        else:
+            self._frames_since_key += 1
+
+        new_indexes: dict[int, int] = {}
+        entries = []
+        for location in locations:
+            user_id = location["user_id"]
+            index = self.indexes.get(user_id)
+            if index is None:
+                index = self.indexes[user_id] = len(self.indexes)
+                new_indexes[index] = user_id
+
+            lat = to_fixed(float(location["latitude"]))
+            lon = to_fixed(float(location["longitude"]))
+            timestamp_ms = to_epoch_ms(location["location_timestamp"])
+
+            last = self._last_sent.get(index)
+            if last is None:
+                entries.append(FrameEntry(index, lat, lon, timestamp_ms, True))
+            else:
+                entries.append(FrameEntry(index, lat - last[0], lon - last[1], timestamp_ms, False))
+            self._last_sent[index] = (lat, lon)
+
+        return encode_frame(entries, keyframe=keyframe), new_indexes
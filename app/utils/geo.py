@@ -1,9 +1,21 @@
+import io
 import math
 import xml.etree.ElementTree as ET
+from typing import IO, Iterator, NamedTuple, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # optional, the kernels below fall back to pure Python
+    np = None
+
+HAS_NUMPY = np is not None
+EARTH_RADIUS_M = 6371000
+# Points per vectorized distance call while streaming a GPX document
+GPX_CHUNK_POINTS = 4096
 
 def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """Calculate distance between two points in meters."""
-    R = 6371000  # Earth radius in meters
+    R = EARTH_RADIUS_M
     phi1, phi2 = math.radians(lat1), math.radians(lat2)
     dphi = math.radians(lat2 - lat1)
     dlambda = math.radians(lon2 - lon1)
@@ -13,42 +25,248 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
     return R * c
 
+
+# ------------- ARRAY KERNELS ------------- #
+# All kernels take degrees and return meters. With NumPy they return arrays,
+# without it lists; `vectorized` forces one implementation (tests, benchmarks).
+
+def _use_numpy(vectorized: bool | None) -> bool:
+    if vectorized is None:
+        return HAS_NUMPY
+    if vectorized and not HAS_NUMPY:
+        raise RuntimeError("NumPy is not installed")
+    return vectorized
+
+
+def _haversine_np(lat1, lon1, lat2, lon2):
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lon2) - np.radians(lon1)
+
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return EARTH_RADIUS_M * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def consecutive_distances(
+    lats: Sequence[float],
+    lons: Sequence[float],
+    *,
+    vectorized: bool | None = None,
+):
+    """Distance between each point and the next one (n - 1 values)."""
+    if _use_numpy(vectorized):
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        return _haversine_np(lats[:-1], lons[:-1], lats[1:], lons[1:])
+
+    return [
+        haversine_distance(lats[i], lons[i], lats[i + 1], lons[i + 1])
+        for i in range(len(lats) - 1)
+    ]
+
+
+def distances_from(
+    lat: float,
+    lon: float,
+    lats: Sequence[float],
+    lons: Sequence[float],
+    *,
+    vectorized: bool | None = None,
+):
+    """Distance from one point to each of many points."""
+    if _use_numpy(vectorized):
+        return _haversine_np(
+            lat, lon,
+            np.asarray(lats, dtype=np.float64),
+            np.asarray(lons, dtype=np.float64),
+        )
+
+    return [haversine_distance(lat, lon, other_lat, other_lon) for other_lat, other_lon in zip(lats, lons)]
+
+
+def distance_matrix(
+    lats: Sequence[float],
+    lons: Sequence[float],
+    *,
+    vectorized: bool | None = None,
+):
+    """All-pairs distances, an n x n symmetric matrix with a zero diagonal."""
+    if _use_numpy(vectorized):
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        return _haversine_np(lats[:, None], lons[:, None], lats[None, :], lons[None, :])
+
+    count = len(lats)
+    matrix = [[0.0] * count for _ in range(count)]
+    for i in range(count):
+        for j in range(i + 1, count):
+            matrix[i][j] = matrix[j][i] = haversine_distance(lats[i], lons[i], lats[j], lons[j])
+    return matrix
+
+
+def path_length(lats: Sequence[float], lons: Sequence[float], *, vectorized: bool | None = None) -> float:
+    """Length of the polyline through the points."""
+    if len(lats) < 2:
+        return 0.0
+    return float(sum(consecutive_distances(lats, lons, vectorized=vectorized)))
+
+
+def unit_vectors(lats, lons):
+    """
+    Points as 3-D unit vectors (n x 3, NumPy only). The dot product of two
+    of them is the cosine of their central angle, so many pairwise
+    distances come from one matrix product, see `dot_to_meters`.
+    """
+    phi = np.radians(np.asarray(lats, dtype=np.float64))
+    lam = np.radians(np.asarray(lons, dtype=np.float64))
+    cos_phi = np.cos(phi)
+    return np.stack((cos_phi * np.cos(lam), cos_phi * np.sin(lam), np.sin(phi)), axis=-1)
+
+
+def dot_to_meters(dots):
+    """Great-circle distance for dot products of unit vectors (via the chord, precise for close points)."""
+    chord = np.sqrt(np.clip(2.0 - 2.0 * np.asarray(dots, dtype=np.float64), 0.0, 4.0))
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(chord / 2.0)
+
+
+# ------------- GPX ------------- #
+
+class GpxStats(NamedTuple):
+    distance_meters: float
+    point_count: int
+    elevation_gain_meters: float
+    # (min_lat, min_lon, max_lat, max_lon), None without points
+    bounds: tuple[float, float, float, float] | None
+
+
+class _TrackAccumulator:
+    """
+    Running totals over a sequence of points. Coordinates are buffered in
+    chunks of GPX_CHUNK_POINTS and measured with the array kernels, so
+    memory stays bounded by the chunk size.
+    """
+
+    def __init__(self):
+        self.distance = 0.0
+        self.count = 0
+        self.elevation_gain = 0.0
+        self.min_lat = self.min_lon = math.inf
+        self.max_lat = self.max_lon = -math.inf
+        self._lats: list[float] = []
+        self._lons: list[float] = []
+        self._last_ele: float | None = None
+
+    def _measure_chunk(self) -> None:
+        self.distance += path_length(self._lats, self._lons)
+        # Keep the last point, the next chunk continues from it
+        del self._lats[:-1]
+        del self._lons[:-1]
+
+    def add(self, lat: float, lon: float, ele: float | None) -> None:
+        self._lats.append(lat)
+        self._lons.append(lon)
+        if len(self._lats) > GPX_CHUNK_POINTS:
+            self._measure_chunk()
+
+        if ele is not None:
+            if self._last_ele is not None and ele > self._last_ele:
+                self.elevation_gain += ele - self._last_ele
+            self._last_ele = ele
+
+        self.count += 1
+        self.min_lat = min(self.min_lat, lat)
+        self.max_lat = max(self.max_lat, lat)
+        self.min_lon = min(self.min_lon, lon)
+        self.max_lon = max(self.max_lon, lon)
+
+    def stats(self) -> GpxStats:
+        self._measure_chunk()
+        bounds = (self.min_lat, self.min_lon, self.max_lat, self.max_lon) if self.count else None
+        return GpxStats(self.distance, self.count, self.elevation_gain, bounds)
+
+
+def _local_name(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+
+def _iter_gpx_points(gpx_content: str | bytes | IO[bytes]) -> Iterator[tuple[str, float, float, float | None]]:
+    """
+    Yield (tag, lat, lon, ele) for every trkpt/rtept in one streaming pass.
+
+    Every point is detached from the tree as soon as it has been read, so
+    memory does not grow with the number of points. Points without valid
+    coordinates are skipped; malformed XML raises ET.ParseError.
+    """
+    if isinstance(gpx_content, str):
+        gpx_content = gpx_content.encode("utf-8")
+    if isinstance(gpx_content, bytes):
+        gpx_content = io.BytesIO(gpx_content)
+
+    parents: list[ET.Element] = []
+
+    for event, element in ET.iterparse(gpx_content, events=("start", "end")):
+        if event == "start":
+            parents.append(element)
+            continue
+
+        parents.pop()
+        tag = _local_name(element.tag)
+        if tag not in ("trkpt", "rtept"):
+            continue
+
+        try:
+            lat = float(element.get("lat"))
+            lon = float(element.get("lon"))
+        except (TypeError, ValueError):
+            lat = lon = None
+
+        ele = None
+        for child in element:
+            if _local_name(child.tag) == "ele":
+                try:
+                    ele = float(child.text)
+                except (TypeError, ValueError):
+                    pass
+                break
+
+        if lat is not None:
+            yield tag, lat, lon, ele
+
+        # Earlier points are already detached, so the parent stays small
+        if parents:
+            parents[-1].remove(element)
+
+
+def parse_gpx_stats(gpx_content: str | bytes | IO[bytes]) -> GpxStats:
+    """
+    Single streaming pass over a GPX document. Track points are used if
+    there are any, route points otherwise (like a GPS unit would).
+    """
+    tracks = {"trkpt": _TrackAccumulator(), "rtept": _TrackAccumulator()}
+    for tag, lat, lon, ele in _iter_gpx_points(gpx_content):
+        tracks[tag].add(lat, lon, ele)
+
+    track = tracks["trkpt"] if tracks["trkpt"].count else tracks["rtept"]
+    return track.stats()
+
+
+def parse_gpx_points(
+    gpx_content: str | bytes | IO[bytes],
+) -> tuple[list[float], list[float], list[float | None]]:
+    """Latitudes, longitudes and elevations of the track points (route points if there is no track)."""
+    points: dict[str, tuple[list, list, list]] = {"trkpt": ([], [], []), "rtept": ([], [], [])}
+    for tag, lat, lon, ele in _iter_gpx_points(gpx_content):
+        lats, lons, eles = points[tag]
+        lats.append(lat)
+        lons.append(lon)
+        eles.append(ele)
+    return points["trkpt"] if points["trkpt"][0] else points["rtept"]
+
+
 def calculate_gpx_distance(gpx_content: str) -> float:
     """Parse GPX and calculate total distance in meters."""
     try:
-        # Simple XML parsing (strip namespaces for easier access)
-        content_bytes = gpx_content.encode("utf-8")
-        it = ET.iterparse(java_io_InputStream(content_bytes) if False else None) # Wait, standard ET
-        
-        # Actually just use fromstring
-        tree = ET.fromstring(gpx_content)
-        
-        # Remove namespaces locally for easier XPath
-        for el in tree.iter():
-            if '}' in el.tag:
-                el.tag = el.tag.split('}', 1)[1]
-        
-        points = []
-        # Try trkpt
-        for trkpt in tree.findall(".//trkpt"):
-            lat = float(trkpt.get("lat"))
-            lon = float(trkpt.get("lon"))
-            points.append((lat, lon))
-            
-        # Fallback to rtept
-        if not points:
-            for rtept in tree.findall(".//rtept"):
-                lat = float(rtept.get("lat"))
-                lon = float(rtept.get("lon"))
-                points.append((lat, lon))
-        
-        total_distance = 0.0
-        for i in range(len(points) - 1):
-            p1 = points[i]
-            p2 = points[i+1]
-            total_distance += haversine_distance(p1[0], p1[1], p2[0], p2[1])
-            
-        return total_distance
+        return parse_gpx_stats(gpx_content).distance_meters
     except Exception as e:
         print(f"Error calculating GPX distance: {e}")
         return 0.0
@@ -0,0 +1,264 @@
+"""
+Route geometry derived once from a route's GPX, so readers never parse XML.
+
+Packed layout (all little-endian):
+    u8   version
+    u32  count
+    f64  lat[count]
+    f64  lon[count]
+    f64  cumulative_m[count]   along-track distance from the first point
+    f32  elevation[count]      NaN where the GPX has no <ele>
+
+The encoded polyline is the Google polyline format at 1e-5 degrees, which
+map clients decode natively. Simplified levels for map zooms come from one
+Douglas-Peucker pass, see `douglas_peucker_tolerances`.
+"""
+import math
+import struct
+import sys
+from array import array
+from typing import IO, NamedTuple
+
+from app.utils.geo import EARTH_RADIUS_M, HAS_NUMPY, consecutive_distances, np, parse_gpx_points
+
+GEOMETRY_VERSION = 1
+POLYLINE_PRECISION = 5
+
+_HEADER = struct.Struct("<BI")
+_METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+# Web Mercator ground resolution at the equator for zoom 0 (256 px tiles)
+_METERS_PER_PIXEL_Z0 = 2 * math.pi * EARTH_RADIUS_M / 256
+# Ranges shorter than this are measured in pure Python, NumPy's call overhead dominates
+_NUMPY_MIN_RANGE = 64
+
+
+class RouteLod(NamedTuple):
+    """One level of detail of a route; zoom None is the full geometry."""
+    zoom: int | None
+    tolerance_m: float
+    point_count: int
+    polyline: str
+
+
+class RouteGeometry(NamedTuple):
+    lats: list[float]
+    lons: list[float]
+    cumulative_m: list[float]
+    elevations: list[float | None]
+
+    @property
+    def point_count(self) -> int:
+        return len(self.lats)
+
+    @property
+    def distance_meters(self) -> float:
+        return self.cumulative_m[-1] if self.cumulative_m else 0.0
+
+    @property
+    def bounds(self) -> tuple[float, float, float, float] | None:
+        """(min_lat, min_lon, max_lat, max_lon), None without points."""
+        if not self.lats:
+            return None
+        return min(self.lats), min(self.lons), max(self.lats), max(self.lons)
+
+    @property
+    def elevation_gain_meters(self) -> float:
+        gain, last = 0.0, None
+        for ele in self.elevations:
+            if ele is None:
+                continue
+            if last is not None and ele > last:
+                gain += ele - last
+            last = ele
+        return gain
+
+
+def geometry_from_points(
+    lats: list[float],
+    lons: list[float],
+    elevations: list[float | None] | None = None,
+) -> RouteGeometry:
+    cumulative = [0.0] if lats else []
+    if len(lats) > 1:
+        total = 0.0
+        for distance in consecutive_distances(lats, lons):
+            total += float(distance)
+            cumulative.append(total)
+    return RouteGeometry(
+        list(lats), list(lons), cumulative, list(elevations) if elevations is not None else [None] * len(lats),
+    )
+
+
+def build_route_geometry(gpx_content: str | bytes | IO[bytes]) -> RouteGeometry:
+    """Geometry of a GPX document, empty if it cannot be parsed."""
+    try:
+        lats, lons, elevations = parse_gpx_points(gpx_content)
+    except Exception as e:
+        print(f"Error parsing GPX geometry: {e}")
+        lats, lons, elevations = [], [], []
+    return geometry_from_points(lats, lons, elevations)
+
+
+def _to_bytes(typecode: str, values) -> bytes:
+    packed = array(typecode, values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _from_bytes(typecode: str, data: memoryview) -> list[float]:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tolist()
+
+
+def pack_geometry(geometry: RouteGeometry) -> bytes:
+    return b"".join((
+        _HEADER.pack(GEOMETRY_VERSION, geometry.point_count),
+        _to_bytes("d", geometry.lats),
+        _to_bytes("d", geometry.lons),
+        _to_bytes("d", geometry.cumulative_m),
+        _to_bytes("f", (math.nan if ele is None else ele for ele in geometry.elevations)),
+    ))
+
+
+def unpack_geometry(data: bytes) -> RouteGeometry:
+    version, count = _HEADER.unpack_from(data)
+    if version != GEOMETRY_VERSION:
+        raise ValueError(f"Unsupported geometry version {version}")
+
+    view = memoryview(data)[_HEADER.size:]
+    doubles = count * 8
+    lats = _from_bytes("d", view[:doubles])
+    lons = _from_bytes("d", view[doubles:2 * doubles])
+    cumulative = _from_bytes("d", view[2 * doubles:3 * doubles])
+    elevations = [None if math.isnan(ele) else ele for ele in _from_bytes("f", view[3 * doubles:3 * doubles + count * 4])]
+    return RouteGeometry(lats, lons, cumulative, elevations)
+
+
+def encode_polyline(lats, lons, *, precision: int = POLYLINE_PRECISION) -> str:
+    factor = 10 ** precision
+    out: list[str] = []
+    last_lat = last_lon = 0
+    for lat, lon in zip(lats, lons):
+        lat, lon = round(lat * factor), round(lon * factor)
+        for delta in (lat - last_lat, lon - last_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                out.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            out.append(chr(value + 63))
+        last_lat, last_lon = lat, lon
+    return "".join(out)
+
+
+def decode_polyline(encoded: str, *, precision: int = POLYLINE_PRECISION) -> list[tuple[float, float]]:
+    """Reference decoder, returns (lat, lon) pairs."""
+    factor = 10 ** precision
+    points = []
+    pos = lat = lon = 0
+    while pos < len(encoded):
+        deltas = []
+        for _ in range(2):
+            result = shift = 0
+            while True:
+                byte = ord(encoded[pos]) - 63
+                pos += 1
+                result |= (byte & 0x1F) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        points.append((lat / factor, lon / factor))
+    return points
+
+
+def meters_per_pixel(zoom: float, latitude: float) -> float:
+    return _METERS_PER_PIXEL_Z0 * math.cos(math.radians(latitude)) / 2 ** zoom
+
+
+def _farthest_python(xs, ys, start: int, end: int) -> tuple[int, float]:
+    ax, ay = xs[start], ys[start]
+    dx, dy = xs[end] - ax, ys[end] - ay
+    length_sq = dx * dx + dy * dy
+    best, best_distance = start + 1, -1.0
+    for i in range(start + 1, end):
+        px, py = xs[i] - ax, ys[i] - ay
+        t = 0.0 if length_sq == 0 else min(1.0, max(0.0, (px * dx + py * dy) / length_sq))
+        distance = (px - dx * t) ** 2 + (py - dy * t) ** 2
+        if distance > best_distance:
+            best, best_distance = i, distance
+    return best, math.sqrt(best_distance)
+
+
+def _farthest_numpy(xs, ys, start: int, end: int) -> tuple[int, float]:
+    ax, ay = xs[start], ys[start]
+    dx, dy = xs[end] - ax, ys[end] - ay
+    px, py = xs[start + 1:end] - ax, ys[start + 1:end] - ay
+    length_sq = dx * dx + dy * dy
+    t = np.zeros_like(px) if length_sq == 0 else np.clip((px * dx + py * dy) / length_sq, 0.0, 1.0)
+    distances = (px - dx * t) ** 2 + (py - dy * t) ** 2
+    farthest = int(np.argmax(distances))
+    return start + 1 + farthest, math.sqrt(distances[farthest])
+
+
+def douglas_peucker_tolerances(lats: list[float], lons: list[float]) -> list[float]:
+    """
+    For every point, the largest tolerance (meters) at which Douglas-Peucker
+    still keeps it; endpoints are infinite. Simplifying with tolerance t
+    keeps exactly the points whose value is above t, so one pass serves
+    every level of detail.
+    """
+    count = len(lats)
+    tolerances = [0.0] * count
+    if count == 0:
+        return tolerances
+    tolerances[0] = tolerances[-1] = math.inf
+
+    lat0 = (min(lats) + max(lats)) / 2
+    kx = _METERS_PER_DEGREE * math.cos(math.radians(lat0))
+    xs = [lon * kx for lon in lons]
+    ys = [lat * _METERS_PER_DEGREE for lat in lats]
+    xs_np, ys_np = (np.array(xs), np.array(ys)) if HAS_NUMPY else (None, None)
+
+    stack = [(0, count - 1, math.inf)]
+    while stack:
+        start, end, parent = stack.pop()
+        if end - start < 2:
+            continue
+        if HAS_NUMPY and end - start >= _NUMPY_MIN_RANGE:
+            farthest, distance = _farthest_numpy(xs_np, ys_np, start, end)
+        else:
+            farthest, distance = _farthest_python(xs, ys, start, end)
+        # A point never outlives the split that made it a candidate
+        tolerance = min(distance, parent)
+        tolerances[farthest] = tolerance
+        stack.append((start, farthest, tolerance))
+        stack.append((farthest, end, tolerance))
+    return tolerances
+
+
+def simplify_levels(geometry: RouteGeometry, zooms: list[int], *, tolerance_px: float) -> list[RouteLod]:
+    """Encoded polylines for each zoom, simplified to `tolerance_px` pixels at that zoom."""
+    if not geometry.point_count:
+        return [RouteLod(zoom, 0.0, 0, "") for zoom in zooms]
+
+    tolerances = douglas_peucker_tolerances(geometry.lats, geometry.lons)
+    min_lat, _, max_lat, _ = geometry.bounds
+    latitude = (min_lat + max_lat) / 2
+
+    levels = []
+    for zoom in zooms:
+        tolerance_m = meters_per_pixel(zoom, latitude) * tolerance_px
+        kept = [i for i, tolerance in enumerate(tolerances) if tolerance > tolerance_m]
+        levels.append(RouteLod(
+            zoom,
+            tolerance_m,
+            len(kept),
+            encode_polyline([geometry.lats[i] for i in kept], [geometry.lons[i] for i in kept]),
+        ))
+    return levels
@@ -0,0 +1,57 @@
+import bisect
+import math
+from typing import Sequence
+
+# Upper bounds in milliseconds, the last bucket catches everything slower
+DEFAULT_LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram (Prometheus style, cumulative on output).
+    Constant memory, percentiles are estimated as the bucket's upper bound.
+    """
+
+    def __init__(self, buckets_ms: Sequence[float] = DEFAULT_LATENCY_BUCKETS_MS):
+        self.buckets_ms = tuple(sorted(buckets_ms))
+        self._counts = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, seconds: float) -> None:
+        ms = seconds * 1000
+        self._counts[bisect.bisect_left(self.buckets_ms, ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (0 < q <= 1)."""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(q * self.count)
+        seen = 0
+        for bound, count in zip(self.buckets_ms, self._counts):
+            seen += count
+            if seen >= rank:
+                return float(bound)
+        return self.max_ms
+
+    def stats(self) -> dict[str, object]:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets_ms, self._counts):
+            cumulative += count
+            buckets[f"le_{bound:g}ms"] = cumulative
+        buckets["le_inf"] = self.count
+
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "buckets": buckets,
+        }
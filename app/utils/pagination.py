@@ -0,0 +1,59 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is the sort key of the last row of a page, JSON encoded and
+base64url'd. The next page continues strictly after that key, so a page
+costs one index range scan no matter how deep the client has paged.
+"""
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Callable, Sequence, TypeVar
+
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", 100))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", 1000))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+T = TypeVar("T")
+
+
+def encode_cursor(*values: int | str | datetime) -> str:
+    payload = json.dumps(
+        [value.isoformat() if isinstance(value, datetime) else value for value in values],
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: type) -> tuple:
+    """Decode a cursor into a key of the given types, ValueError if it does not fit."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError("Invalid cursor")
+
+    key = []
+    for value, kind in zip(values, types):
+        if kind is datetime and isinstance(value, str):
+            key.append(datetime.fromisoformat(value))
+        elif kind is int and isinstance(value, int) and not isinstance(value, bool):
+            key.append(value)
+        else:
+            raise ValueError("Invalid cursor")
+    return tuple(key)
+
+
+def split_page(rows: Sequence[T], *, limit: int, key: Callable[[T], tuple]) -> tuple[Sequence[T], str | None]:
+    """
+    Repositories fetch `limit + 1` rows; the extra row only tells whether
+    there is a next page. Returns the page and the cursor to the next one.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*key(rows[-1]))
@@ -0,0 +1,68 @@
+import sys
+import timeit
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+# Benchmark: NumPy vs pure-Python geodesy kernels on the sample GPX tracks
+# ------------------------------------------------------------------------------
+# Usage (from the repository root):
+#   python -m tests.benchmarks.geo_kernels [repeat]
+#
+# Arguments:
+#   repeat:  (Optional) Timing runs per case, the best one is reported. Default is 5.
+# ------------------------------------------------------------------------------
+
+from app.utils.geo import (
+    HAS_NUMPY,
+    consecutive_distances,
+    distance_matrix,
+    distances_from,
+    parse_gpx_stats,
+)
+
+GPX_DIR = Path(__file__).resolve().parent.parent / "GPX"
+
+
+def load_points(path: Path) -> tuple[list[float], list[float]]:
+    lats, lons = [], []
+    for _, element in ET.iterparse(path):
+        if element.tag.rpartition("}")[2] == "trkpt":
+            lats.append(float(element.get("lat")))
+            lons.append(float(element.get("lon")))
+    return lats, lons
+
+
+def best_of(repeat: int, func) -> float:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main() -> None:
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    if not HAS_NUMPY:
+        print("NumPy is not installed, only the pure-Python kernels can run.")
+
+    print(f"{'case':<34}{'python':>12}{'numpy':>12}{'speedup':>10}")
+    for path in sorted(GPX_DIR.glob("*.gpx")):
+        lats, lons = load_points(path)
+        cases = {
+            "consecutive": lambda vectorized: consecutive_distances(lats, lons, vectorized=vectorized),
+            "one-to-many": lambda vectorized: distances_from(lats[0], lons[0], lats, lons, vectorized=vectorized),
+            # The full matrix is quadratic, keep the pure-Python run bearable
+            "all-pairs (first 300)": lambda vectorized: distance_matrix(lats[:300], lons[:300], vectorized=vectorized),
+        }
+        for name, case in cases.items():
+            python_s = best_of(repeat, lambda: case(False))
+            line = f"{path.name + ' ' + name:<34}{python_s * 1e3:>10.3f}ms"
+            if HAS_NUMPY:
+                numpy_s = best_of(repeat, lambda: case(True))
+                line += f"{numpy_s * 1e3:>10.3f}ms{python_s / numpy_s:>9.1f}x"
+            print(line)
+
+        stats = best_of(repeat, lambda: parse_gpx_stats(path.read_bytes()))
+        print(f"{path.name + ' parse_gpx_stats':<34}{stats * 1e3:>10.3f}ms  ({len(lats)} points)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import sys
+import time
+
+# Benchmark: proximity engine tick latency per ride size and share of moved riders
+# ------------------------------------------------------------------------------
+# Usage (from the repository root):
+#   python -m tests.benchmarks.proximity [ticks]
+#
+# Arguments:
+#   ticks:  (Optional) Ticks measured per case. Default is 200.
+# ------------------------------------------------------------------------------
+
+from app.proximity import PROXIMITY_RADIUS_M, PROXIMITY_HYSTERESIS, RideProximity
+from app.utils.geo import HAS_NUMPY, np
+
+
+def measure(riders: int, moved: int, ticks: int) -> tuple[float, float]:
+    rng = np.random.default_rng(0)
+    lats = 48.1 + rng.random(riders) * 0.05
+    lons = 11.5 + rng.random(riders) * 0.05
+
+    ride = RideProximity(leader_id=0)
+    for user_id in range(riders):
+        ride.update(user_id, lats[user_id], lons[user_id])
+    ride.tick(PROXIMITY_RADIUS_M, PROXIMITY_HYSTERESIS)
+
+    durations = []
+    for _ in range(ticks):
+        for user_id in rng.choice(riders, moved, replace=False):
+            lats[user_id] += rng.normal() * 0.0005
+            ride.update(int(user_id), lats[user_id], lons[user_id])
+        started_at = time.perf_counter()
+        ride.tick(PROXIMITY_RADIUS_M, PROXIMITY_HYSTERESIS)
+        durations.append(time.perf_counter() - started_at)
+    return float(np.median(durations)), float(np.percentile(durations, 95))
+
+
+def main() -> None:
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    if not HAS_NUMPY:
+        print("NumPy is not installed, the proximity engine is disabled.")
+        return
+
+    print(f"{'riders':>8}{'moved':>8}{'p50':>12}{'p95':>12}")
+    for riders in (50, 200, 500, 1000):
+        for share in (0.02, 0.1, 1.0):
+            moved = max(1, int(riders * share))
+            p50, p95 = measure(riders, moved, ticks)
+            print(f"{riders:>8}{moved:>8}{p50 * 1e6:>10.0f}us{p95 * 1e6:>10.0f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import math
+import random
+import sys
+import timeit
+
+# Benchmark: Douglas-Peucker levels of detail for a route
+# ------------------------------------------------------------------------------
+# Usage (from the repository root):
+#   python -m tests.benchmarks.route_simplification [repeat]
+#
+# Arguments:
+#   repeat:  (Optional) Timing runs per case, the best one is reported. Default is 3.
+#
+# Routes wander with a slowly turning heading and ~10 m between points.
+# Reports the time for all levels and the points / polyline size per zoom.
+# ------------------------------------------------------------------------------
+
+from app.simplification import ROUTE_LOD_TOLERANCE_PX, ROUTE_LOD_ZOOMS
+from app.utils.geometry import encode_polyline, geometry_from_points, simplify_levels
+
+
+def best_of(repeat: int, func) -> float:
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat=repeat, number=1))
+
+
+def main() -> None:
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    rng = random.Random(0)
+
+    for points in (1000, 10000, 100000):
+        lats, lons, heading = [48.1], [11.5], 0.0
+        for _ in range(points - 1):
+            heading += rng.gauss(0, 0.1)
+            lats.append(lats[-1] + 0.00009 * math.cos(heading))
+            lons.append(lons[-1] + 0.000135 * math.sin(heading))
+        geometry = geometry_from_points(lats, lons)
+
+        elapsed = best_of(repeat, lambda: simplify_levels(geometry, ROUTE_LOD_ZOOMS, tolerance_px=ROUTE_LOD_TOLERANCE_PX))
+        full = len(encode_polyline(lats, lons))
+        print(f"{points} points: {elapsed * 1e3:.1f} ms for {len(ROUTE_LOD_ZOOMS)} levels, full polyline {full / 1024:.1f} KB")
+        for lod in simplify_levels(geometry, ROUTE_LOD_ZOOMS, tolerance_px=ROUTE_LOD_TOLERANCE_PX):
+            print(f"  z{lod.zoom:<3}{lod.point_count:>8} points{len(lod.polyline) / 1024:>9.1f} KB  ({lod.tolerance_m:.1f} m)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import math
+import random
+import sys
+import timeit
+
+# Benchmark: route snapping through the segment grid vs scanning every segment
+# ------------------------------------------------------------------------------
+# Usage (from the repository root):
+#   python -m tests.benchmarks.route_snapping [repeat]
+#
+# Arguments:
+#   repeat:  (Optional) Timing runs per case, the best one is reported. Default is 5.
+#
+# Routes wander with a slowly turning heading and ~10 m between points;
+# fixes are scattered ~50 m around random route points.
+# ------------------------------------------------------------------------------
+
+from app.snapping import SNAP_CELL_M, RouteSnapper
+
+QUERIES = 200
+
+
+def best_of(repeat: int, func) -> float:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main() -> None:
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    rng = random.Random(0)
+
+    print(f"cell {SNAP_CELL_M:.0f} m, per fix")
+    print(f"{'points':>8}{'build':>12}{'grid':>12}{'scan':>12}")
+    for points in (1000, 10000, 100000):
+        lats, lons, heading = [48.1], [11.5], 0.0
+        for _ in range(points - 1):
+            heading += rng.gauss(0, 0.1)
+            lats.append(lats[-1] + 0.00009 * math.cos(heading))
+            lons.append(lons[-1] + 0.000135 * math.sin(heading))
+
+        build = best_of(1, lambda: RouteSnapper(lats, lons))
+        snapper = RouteSnapper(lats, lons)
+        fixes = []
+        for _ in range(QUERIES):
+            i = rng.randrange(points)
+            fixes.append((lats[i] + rng.gauss(0, 0.0005), lons[i] + rng.gauss(0, 0.0007)))
+
+        def scan(lat, lon):
+            x, y = snapper._project(lat, lon)
+            return min(snapper._measure(segment, x, y) for segment in range(points - 1))
+
+        grid = best_of(repeat, lambda: [snapper.snap(*fix) for fix in fixes]) / QUERIES
+        line = f"{points:>8}{build * 1e3:>10.1f}ms{grid * 1e6:>10.1f}us"
+        if points <= 10000:
+            brute = best_of(1, lambda: [scan(*fix) for fix in fixes]) / QUERIES
+            line += f"{brute * 1e6:>10.1f}us"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
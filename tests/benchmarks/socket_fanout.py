@@ -0,0 +1,116 @@
+import asyncio
+import multiprocessing
+import sys
+import time
+
+# Benchmark: cross-worker Socket.IO fan-out through the bundled broker
+# ------------------------------------------------------------------------------
+# Usage (from the repository root):
+#   python -m tests.benchmarks.socket_fanout [messages] [max_workers]
+#
+# Arguments:
+#   messages:     (Optional) location_update emits per worker. Default is 20000.
+#   max_workers:  (Optional) Largest worker count, runs 1, 2, 4, ... up to it. Default is 4.
+#
+# Every worker is a separate process with its own AsyncServer and
+# BrokerPubSubManager, all emitting to the same ride room. "emits/s" is
+# the aggregate rate the workers publish at, "delivered/s" the rate at
+# which the other workers receive them (each emit reaches workers - 1).
+# ------------------------------------------------------------------------------
+
+import socketio
+
+from app.pubsub import BrokerPubSubManager, MessageBroker
+
+
+async def _worker(url: str, messages: int, workers: int, barrier, results) -> None:
+    manager = BrokerPubSubManager(url, channel="bench")
+    server = socketio.AsyncServer(async_mode="asgi", client_manager=manager)
+
+    expected = messages * (workers - 1)
+    received = 0
+    done = asyncio.Event()
+    if not expected:
+        done.set()
+
+    async def count(event, data, room):
+        nonlocal received
+        received += 1
+        if received >= expected:
+            done.set()
+
+    manager.add_remote_listener(count)
+    manager.initialize()
+    await manager.subscribed.wait()
+    await asyncio.to_thread(barrier.wait)
+
+    started_at = time.perf_counter()
+    for i in range(messages):
+        await server.emit("location_update", {
+            "user_id": i % 50,
+            "latitude": 48.1 + i * 1e-6,
+            "longitude": 11.5,
+            "location_timestamp": "2025-11-18T15:30:00",
+        }, room="BENCH1")
+    published_s = time.perf_counter() - started_at
+
+    await asyncio.wait_for(done.wait(), 120)
+    results.put((published_s, time.perf_counter() - started_at, received))
+    await manager.close()
+
+
+def run_worker(url: str, messages: int, workers: int, barrier, results) -> None:
+    asyncio.run(_worker(url, messages, workers, barrier, results))
+
+
+def run_broker(port_queue) -> None:
+    async def serve():
+        broker = MessageBroker()
+        port_queue.put(await broker.start(port=0))
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+def measure(ctx, url: str, messages: int, workers: int) -> tuple[float, float]:
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=run_worker, args=(url, messages, workers, barrier, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get(timeout=300) for _ in processes]
+    for process in processes:
+        process.join()
+
+    published_s = max(outcome[0] for outcome in outcomes)
+    total_s = max(outcome[1] for outcome in outcomes)
+    delivered = sum(outcome[2] for outcome in outcomes)
+    return messages * workers / published_s, delivered / total_s
+
+
+def main() -> None:
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    ctx = multiprocessing.get_context("spawn")
+    port_queue = ctx.Queue()
+    broker = ctx.Process(target=run_broker, args=(port_queue,), daemon=True)
+    broker.start()
+    url = f"tcp://127.0.0.1:{port_queue.get(timeout=30)}"
+
+    print(f"{'workers':>8}{'emits/s':>14}{'delivered/s':>14}")
+    workers = 1
+    try:
+        while workers <= max_workers:
+            emits, delivered = measure(ctx, url, messages, workers)
+            print(f"{workers:>8}{emits:>14,.0f}{delivered:>14,.0f}")
+            workers *= 2
+    finally:
+        broker.terminate()
+
+
+if __name__ == "__main__":
+    main()
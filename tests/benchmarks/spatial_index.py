@@ -0,0 +1,80 @@
+import random
+import sys
+import timeit
+
+# Benchmark: spatial grid vs brute-force haversine for per-ride neighbour queries
+# ------------------------------------------------------------------------------
+# Usage (from the repository root):
+#   python -m tests.benchmarks.spatial_index [repeat]
+#
+# Arguments:
+#   repeat:  (Optional) Timing runs per case, the best one is reported. Default is 5.
+#
+# Riders are spread over ~5 x 5 km; every query starts at a random rider.
+# ------------------------------------------------------------------------------
+
+from app.spatial import SPATIAL_CELL_M, SpatialGrid
+from app.utils.geo import HAS_NUMPY, distances_from, haversine_distance, np
+
+K = 5
+RADIUS_M = 500
+QUERIES = 200
+
+
+def best_of(repeat: int, func) -> float:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main() -> None:
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    rng = random.Random(0)
+
+    print(f"cell {SPATIAL_CELL_M:.0f} m, k={K}, radius {RADIUS_M} m, per query")
+    print(f"{'riders':>8}{'case':>10}{'grid':>12}{'brute':>12}{'numpy':>12}")
+    for riders in (100, 500, 2000, 10000):
+        lats = [48.1 + rng.random() * 0.045 for _ in range(riders)]
+        lons = [11.5 + rng.random() * 0.067 for _ in range(riders)]
+        grid = SpatialGrid()
+        for user_id in range(riders):
+            grid.update(user_id, lats[user_id], lons[user_id])
+        queries = [rng.randrange(riders) for _ in range(QUERIES)]
+        lat_array, lon_array = (np.array(lats), np.array(lons)) if HAS_NUMPY else (None, None)
+
+        def brute(user_id):
+            return sorted(
+                (haversine_distance(lats[user_id], lons[user_id], lats[other], lons[other]), other)
+                for other in range(riders) if other != user_id
+            )
+
+        def vectorized(user_id):
+            distances = distances_from(lats[user_id], lons[user_id], lat_array, lon_array)
+            distances[user_id] = np.inf
+            return distances
+
+        cases = {
+            "knn": (
+                lambda: [grid.nearest(lats[u], lons[u], K, exclude=u) for u in queries],
+                lambda: [brute(u)[:K] for u in queries],
+                lambda: [np.argpartition(vectorized(u), K)[:K] for u in queries],
+            ),
+            "radius": (
+                lambda: [grid.within(lats[u], lons[u], RADIUS_M, exclude=u) for u in queries],
+                lambda: [[o for d, o in brute(u) if d <= RADIUS_M] for u in queries],
+                lambda: [np.flatnonzero(vectorized(u) <= RADIUS_M) for u in queries],
+            ),
+        }
+        for name, (grid_case, brute_case, numpy_case) in cases.items():
+            line = f"{riders:>8}{name:>10}"
+            for case in (grid_case, brute_case) + ((numpy_case,) if HAS_NUMPY else ()):
+                line += f"{best_of(repeat, case) / QUERIES * 1e6:>10.1f}us"
+            print(line)
+
+        moves = [(rng.randrange(riders), 48.1 + rng.random() * 0.045, 11.5 + rng.random() * 0.067) for _ in range(QUERIES)]
+        update = best_of(repeat, lambda: [grid.update(*move) for move in moves]) / QUERIES
+        print(f"{riders:>8}{'update':>10}{update * 1e6:>10.1f}us")
+
+
+if __name__ == "__main__":
+    main()
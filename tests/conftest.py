@@ -11,14 +11,35 @@ from httpx import AsyncClient, ASGITransport
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.pool import NullPool
 
+from app.database import configure_sqlite
 from app.injections import get_session
 from app.main import create_app
 from app.models import DbModel, UserModel, RideModel, ParticipationModel
+from app.repositories.ride import ride_code_cache
+from app.repositories.user import user_cache
+from app.simplification import route_simplifier
+from app.snapping import route_snappers
+from app.spatial import ride_positions
 from app.security import get_password_hash
 
 # Используем файловую базу с NullPool для надежности в асинхронных тестах
 TEST_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # In-process caches outlive the per-test database, reset them between tests
+    ride_code_cache.clear()
+    user_cache.clear()
+    ride_positions.clear()
+    route_snappers.clear()
+    route_simplifier.clear()
+    yield
+    ride_code_cache.clear()
+    user_cache.clear()
+    ride_positions.clear()
+    route_snappers.clear()
+    route_simplifier.clear()
+
 @pytest_asyncio.fixture(scope="function")
 async def app() -> FastAPI:
     application = create_app()
@@ -30,6 +51,7 @@ async def app() -> FastAPI:
 async def session() -> AsyncGenerator[AsyncSession, None]:
     # 1. Создаем движок
     engine = create_async_engine(TEST_DATABASE_URL, poolclass=NullPool)
+    configure_sqlite(engine)
 
     # 2. Создаем таблицы
     async with engine.begin() as conn:
@@ -148,3 +170,10 @@ async def ride_factory(session: AsyncSession, test_user: UserModel) -> RideFacto
         return ride
     
     return _create_ride
+
+# ------------------ GPX ------------------ #
+
+def gpx_document(lats, lons) -> str:
+    """Minimal GPX track through the given points."""
+    points = "".join(f'<trkpt lat="{lat}" lon="{lon}"/>' for lat, lon in zip(lats, lons))
+    return f'<?xml version="1.0"?><gpx version="1.1"><trk><trkseg>{points}</trkseg></trk></gpx>'
@@ -89,7 +89,7 @@ async def run_single_ghost(index, username, password, ride_code):
 
         # 4. Connect Socket
         try:
-            await sio.connect(BASE_URL, transports=['websocket', 'polling'])
+            await sio.connect(BASE_URL, auth={"token": token}, transports=['websocket', 'polling'])
             await sio.emit("join_ride", {"ride_code": ride_code})
 
             # Random Start Position (Munich Center + Offset)
@@ -99,7 +99,6 @@ async def run_single_ghost(index, username, password, ride_code):
             # Send INITIAL location (so they appear on map)
             payload = {
                 "ride_code": ride_code,
-                "user_id": user_id,
                 "latitude": lat,
                 "longitude": lon,
                 "location_timestamp": None # Let server/client timestamp it
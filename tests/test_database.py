@@ -0,0 +1,121 @@
+from datetime import datetime, timezone
+
+import pytest
+import pytest_asyncio
+
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app import injections
+from app.database import PoolMetrics, ReplicaRouter, create_engine_from_url, replica_lag_seconds
+from app.models import DbModel, RideModel, UserModel
+
+
+@pytest_asyncio.fixture(scope="function")
+async def replica_factory(tmp_path):
+    """A second SQLite file standing in for the read replica."""
+    engine = create_engine_from_url(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}", metrics=PoolMetrics())
+    async with engine.begin() as conn:
+        await conn.run_sync(DbModel.metadata.create_all)
+    yield async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_engine_sets_pragmas_and_counts_checkouts(tmp_path):
+    metrics = PoolMetrics()
+    engine = create_engine_from_url(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", metrics=metrics)
+    try:
+        async with engine.connect() as connection:
+            assert (await connection.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+            # 1 = NORMAL
+            assert (await connection.execute(text("PRAGMA synchronous"))).scalar() == 1
+        async with engine.connect():
+            pass
+
+        stats = metrics.stats()
+        assert stats["connects"] == 1
+        assert stats["checkouts"] == 2
+        assert stats["checkout_wait"]["count"] == 2
+        assert (stats["checked_out"], stats["idle"]) == (0, 1)
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_read_endpoints_use_healthy_replica(
+    test_client: AsyncClient,
+    monkeypatch: pytest.MonkeyPatch,
+    replica_factory: async_sessionmaker[AsyncSession],
+    test_ride: RideModel,
+):
+    async with replica_factory() as replica:
+        user = UserModel(username="replicated", password="x")
+        replica.add(user)
+        await replica.flush()
+        replica.add(RideModel(
+            code="REP001",
+            title="Replica Ride",
+            start_time=datetime(2025, 11, 18, 15, 30, tzinfo=timezone.utc),
+            created_by_user_id=user.id,
+        ))
+        await replica.commit()
+
+    router = ReplicaRouter(replica_factory)
+    monkeypatch.setattr(injections, "replica_router", router)
+
+    response = await test_client.get("/rides/")
+    assert [ride["code"] for ride in response.json()] == ["REP001"]
+    # Writes and point lookups stay on the primary
+    response = await test_client.get(f"/rides/{test_ride.id}")
+    assert response.json()["code"] == test_ride.code
+    assert router.stats()["replica_sessions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_read_endpoints_fall_back_to_primary(
+    test_client: AsyncClient,
+    monkeypatch: pytest.MonkeyPatch,
+    replica_factory: async_sessionmaker[AsyncSession],
+    tmp_path,
+    test_ride: RideModel,
+):
+    # Lagging replica (SQLite reports 0s, any negative limit fails the check)
+    lagging = ReplicaRouter(replica_factory, max_lag_seconds=-1)
+    monkeypatch.setattr(injections, "replica_router", lagging)
+    response = await test_client.get("/rides/")
+    assert [ride["code"] for ride in response.json()] == [test_ride.code]
+    assert lagging.stats()["fallbacks"] == 1
+
+    # Unreachable replica: the failed check is reused until check_seconds pass
+    now = [0.0]
+    engine = create_engine_from_url(f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'replica.db'}", metrics=PoolMetrics())
+    down = ReplicaRouter(async_sessionmaker(bind=engine), check_seconds=5, clock=lambda: now[0])
+    monkeypatch.setattr(injections, "replica_router", down)
+    try:
+        for _ in range(2):
+            response = await test_client.get("/rides/")
+            assert [ride["code"] for ride in response.json()] == [test_ride.code]
+        stats = down.stats()
+        assert (stats["fallbacks"], stats["healthy"], stats["replica_sessions"]) == (2, False, 0)
+
+        # The directory appears, the next check after the interval recovers
+        (tmp_path / "missing").mkdir()
+        now[0] = 10.0
+        replica_session = await down.open_session()
+        assert replica_session is not None
+        await replica_session.close()
+    finally:
+        await engine.dispose()
+
+
+def test_replica_lag_trusts_replayed_wal_only_while_streaming():
+    caught_up = dict(in_recovery=True, replayed_all=True, replay_age=900.0)
+    assert replica_lag_seconds(streaming=True, **caught_up) == 0.0
+    # Disconnected receiver: having replayed what it got says nothing about the primary
+    assert replica_lag_seconds(streaming=False, **caught_up) == 900.0
+    assert replica_lag_seconds(streaming=False, in_recovery=True, replayed_all=True, replay_age=None) is None
+
+    assert replica_lag_seconds(streaming=True, in_recovery=True, replayed_all=False, replay_age=3.5) == 3.5
+    assert replica_lag_seconds(streaming=False, in_recovery=False, replayed_all=None, replay_age=None) == 0.0
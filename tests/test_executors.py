@@ -0,0 +1,33 @@
+import pytest
+
+from app.executors import CpuExecutor
+from app.utils.geo import calculate_gpx_distance, haversine_distance
+
+GPX = '<gpx><trk><trkseg><trkpt lat="48.0" lon="11.0"/><trkpt lat="48.01" lon="11.0"/></trkseg></trk></gpx>'
+
+
+@pytest.mark.asyncio
+async def test_executor_runs_in_thread_until_started():
+    executor = CpuExecutor(max_workers=1)
+
+    distance = await executor.run(calculate_gpx_distance, GPX)
+
+    assert distance == pytest.approx(haversine_distance(48.0, 11.0, 48.01, 11.0))
+    assert executor.stats()["thread_runs"] == 1
+    assert executor.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_executor_runs_in_process_pool():
+    executor = CpuExecutor(max_workers=1)
+    executor.start()
+    try:
+        assert await executor.run(calculate_gpx_distance, GPX) > 0
+        with pytest.raises(ValueError):
+            await executor.run(int, "not a number")
+    finally:
+        await executor.stop()
+
+    stats = executor.stats()
+    assert (stats["running"], stats["thread_runs"]) == (False, 0)
+    assert (stats["completed"], stats["failed"]) == (1, 1)
@@ -0,0 +1,56 @@
+import json
+from datetime import datetime, timezone
+
+from app.utils.frames import RoomFrameEncoder, decode_frame, from_fixed, to_fixed
+
+
+def make_location(user_id: int, lat: float, lon: float, second: int = 0) -> dict:
+    return {
+        "user_id": user_id,
+        "latitude": lat,
+        "longitude": lon,
+        "location_timestamp": datetime(2025, 11, 18, 15, 30, second, tzinfo=timezone.utc).isoformat(),
+    }
+
+
+def test_first_frame_is_absolute_then_deltas():
+    encoder = RoomFrameEncoder(keyframe_interval=10)
+
+    frame, new_indexes = encoder.encode([make_location(7, 48.1351, 11.5820), make_location(9, 48.2, 11.6)])
+    keyframe, entries = decode_frame(frame)
+    assert keyframe is True
+    assert new_indexes == {0: 7, 1: 9}
+    assert from_fixed(entries[0].lat) == 48.1351
+    assert all(entry.absolute for entry in entries)
+
+    frame, new_indexes = encoder.encode([make_location(7, 48.1352, 11.5820, second=1)])
+    keyframe, [entry] = decode_frame(frame)
+    assert keyframe is False
+    assert new_indexes == {}
+    assert entry.absolute is False
+    assert (entry.lat, entry.lon) == (to_fixed(48.1352) - to_fixed(48.1351), 0)
+    assert entry.timestamp_ms == int(datetime(2025, 11, 18, 15, 30, 1, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def test_keyframe_interval_and_request():
+    encoder = RoomFrameEncoder(keyframe_interval=3)
+    flags = []
+    for second in range(7):
+        frame, _ = encoder.encode([make_location(1, 48.0 + second / 1000, 11.0, second)])
+        flags.append(decode_frame(frame)[0])
+    assert [i for i, keyframe in enumerate(flags) if keyframe] == [0, 3, 6]
+
+    encoder.request_keyframe()
+    frame, _ = encoder.encode([make_location(1, 48.5, 11.0)])
+    keyframe, [entry] = decode_frame(frame)
+    assert keyframe and entry.absolute
+
+
+def test_frame_is_smaller_than_json():
+    locations = [make_location(user_id, 48.1 + user_id / 1000, 11.5, 0) for user_id in range(100)]
+    encoder = RoomFrameEncoder(keyframe_interval=10)
+    encoder.encode(locations)
+
+    moved = [make_location(user_id, 48.1 + user_id / 1000 + 0.00001, 11.5, 1) for user_id in range(100)]
+    frame, _ = encoder.encode(moved)
+    assert len(frame) * 10 < len(json.dumps(moved))
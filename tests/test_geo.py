@@ -0,0 +1,93 @@
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import pytest
+
+from app.utils.geo import (
+    calculate_gpx_distance,
+    consecutive_distances,
+    distance_matrix,
+    distances_from,
+    haversine_distance,
+    parse_gpx_stats,
+    path_length,
+)
+
+GPX_DIR = Path(__file__).parent / "GPX"
+
+
+def test_parse_gpx_stats_single_pass_totals():
+    gpx = """<?xml version="1.0"?>
+    <gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1">
+      <trk><trkseg>
+        <trkpt lat="48.0" lon="11.0"><ele>500</ele></trkpt>
+        <trkpt lat="48.001" lon="11.0"><ele>510</ele></trkpt>
+        <trkpt lat="48.002" lon="11.002"><ele>505</ele></trkpt>
+        <trkpt lat="bad" lon="11.0"/>
+        <trkpt lat="48.003" lon="11.001"><ele>512</ele></trkpt>
+      </trkseg></trk>
+    </gpx>"""
+
+    stats = parse_gpx_stats(gpx)
+
+    expected = (
+        haversine_distance(48.0, 11.0, 48.001, 11.0)
+        + haversine_distance(48.001, 11.0, 48.002, 11.002)
+        + haversine_distance(48.002, 11.002, 48.003, 11.001)
+    )
+    assert stats.point_count == 4
+    assert stats.distance_meters == pytest.approx(expected)
+    assert stats.elevation_gain_meters == pytest.approx(17.0)
+    assert stats.bounds == (48.0, 11.0, 48.003, 11.002)
+
+
+def test_parse_gpx_stats_falls_back_to_route_points():
+    gpx = '<gpx><rte><rtept lat="48.0" lon="11.0"/><rtept lat="48.01" lon="11.0"/></rte></gpx>'
+    stats = parse_gpx_stats(gpx)
+    assert stats.point_count == 2
+    assert stats.distance_meters == pytest.approx(haversine_distance(48.0, 11.0, 48.01, 11.0))
+
+    with pytest.raises(ET.ParseError):
+        parse_gpx_stats("<gpx><trk>")
+    assert calculate_gpx_distance("<gpx><trk>") == 0.0
+
+
+def test_calculate_gpx_distance_on_real_track():
+    gpx = (GPX_DIR / "GPX_2.gpx").read_text(encoding="utf-8")
+
+    stats = parse_gpx_stats(gpx)
+
+    assert stats.point_count == 1196
+    assert calculate_gpx_distance(gpx) == pytest.approx(stats.distance_meters)
+    assert 20_000 < stats.distance_meters < 30_000
+
+
+LATS = [48.0, 48.001, 48.002, 47.9]
+LONS = [11.0, 11.0, 11.002, 11.1]
+
+
+def test_python_kernels_match_scalar_haversine():
+    pairs = consecutive_distances(LATS, LONS, vectorized=False)
+    assert pairs == [haversine_distance(LATS[i], LONS[i], LATS[i + 1], LONS[i + 1]) for i in range(3)]
+
+    assert distances_from(48.0, 11.0, LATS, LONS, vectorized=False)[2] == haversine_distance(48.0, 11.0, 48.002, 11.002)
+
+    matrix = distance_matrix(LATS, LONS, vectorized=False)
+    assert matrix[1][3] == matrix[3][1] == haversine_distance(48.001, 11.0, 47.9, 11.1)
+    assert matrix[2][2] == 0.0
+    assert path_length(LATS, LONS, vectorized=False) == pytest.approx(sum(pairs))
+
+
+def test_numpy_kernels_match_python_kernels():
+    pytest.importorskip("numpy")
+
+    assert consecutive_distances(LATS, LONS, vectorized=True) == pytest.approx(
+        consecutive_distances(LATS, LONS, vectorized=False)
+    )
+    assert distances_from(48.0, 11.0, LATS, LONS, vectorized=True) == pytest.approx(
+        distances_from(48.0, 11.0, LATS, LONS, vectorized=False)
+    )
+    matrix = distance_matrix(LATS, LONS, vectorized=True)
+    assert matrix.shape == (4, 4)
+    for row, expected in zip(matrix, distance_matrix(LATS, LONS, vectorized=False)):
+        assert list(row) == pytest.approx(expected, abs=1e-6)
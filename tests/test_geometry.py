@@ -0,0 +1,98 @@
+from pathlib import Path
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.backfill import backfill_route_geometries
+from app.models import RouteGeometryModel, RouteModel, UserModel
+from app.repositories import RouteRepository
+from app.utils.geo import parse_gpx_stats
+from app.utils.geometry import (
+    build_route_geometry,
+    decode_polyline,
+    encode_polyline,
+    pack_geometry,
+    unpack_geometry,
+)
+
+GPX_DIR = Path(__file__).parent / "GPX"
+GPX = (
+    '<?xml version="1.0"?><gpx version="1.1"><trk><trkseg>'
+    '<trkpt lat="48.1" lon="11.5"><ele>500</ele></trkpt>'
+    '<trkpt lat="48.11" lon="11.5"/>'
+    '<trkpt lat="48.12" lon="11.51"><ele>512.5</ele></trkpt>'
+    '</trkseg></trk></gpx>'
+)
+
+
+def test_geometry_matches_gpx_stats_and_round_trips():
+    gpx = (GPX_DIR / "GPX_2.gpx").read_text(encoding="utf-8")
+    stats = parse_gpx_stats(gpx)
+
+    geometry = build_route_geometry(gpx)
+    assert geometry.point_count == stats.point_count
+    assert geometry.distance_meters == pytest.approx(stats.distance_meters)
+    assert geometry.elevation_gain_meters == pytest.approx(stats.elevation_gain_meters)
+    assert geometry.bounds == stats.bounds
+
+    restored = unpack_geometry(pack_geometry(geometry))
+    assert restored.lats == geometry.lats and restored.cumulative_m == geometry.cumulative_m
+    # Elevations are stored as float32
+    assert restored.elevations == pytest.approx(geometry.elevations, abs=1e-3)
+
+    assert build_route_geometry("<gpx><trk>").point_count == 0
+
+
+def test_polyline_matches_reference_encoding():
+    # Example from the format's documentation
+    encoded = encode_polyline([38.5, 40.7, 43.252], [-120.2, -120.95, -126.453])
+    assert encoded == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+    assert decode_polyline(encoded) == [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+
+
+@pytest.mark.asyncio
+async def test_route_writes_keep_geometry_in_sync(
+    test_client: AsyncClient,
+    auth_headers: dict[str, str],
+    session: AsyncSession,
+):
+    response = await test_client.post("/routes/", json={"title": "Short", "gpx_data": GPX}, headers=auth_headers)
+    route_id = response.json()["id"]
+    route_repository = RouteRepository(session=session)
+
+    stored = await route_repository.get_geometry(route_id=route_id)
+    assert stored.point_count == 3
+    assert stored.distance_meters == pytest.approx(response.json()["distance_meters"])
+    assert stored.elevation_gain_meters == pytest.approx(12.5)
+    assert decode_polyline(stored.polyline) == [(48.1, 11.5), (48.11, 11.5), (48.12, 11.51)]
+
+    longer = GPX.replace("</trkseg>", '<trkpt lat="48.2" lon="11.51"/></trkseg>')
+    response = await test_client.put(f"/routes/{route_id}", json={"gpx_data": longer}, headers=auth_headers)
+    session.expire_all()
+    stored = await route_repository.get_geometry(route_id=route_id)
+    assert stored.point_count == 4
+    assert unpack_geometry(stored.points).distance_meters == pytest.approx(response.json()["distance_meters"])
+
+    response = await test_client.delete(f"/routes/{route_id}", headers=auth_headers)
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert await route_repository.get_geometry(route_id=route_id) is None
+
+
+@pytest.mark.asyncio
+async def test_backfill_writes_missing_geometries(session: AsyncSession, test_user: UserModel):
+    session.add_all([
+        RouteModel(title=f"Legacy {i}", gpx_data=GPX, distance_meters=0, created_by_user_id=test_user.id)
+        for i in range(5)
+    ])
+    await session.commit()
+    session_factory = async_sessionmaker(bind=session.bind, expire_on_commit=False)
+
+    assert await backfill_route_geometries(batch_size=2, session_factory=session_factory) == 5
+    assert await backfill_route_geometries(session_factory=session_factory) == 0
+    assert await backfill_route_geometries(session_factory=session_factory, include_current=True) == 5
+
+    rows = (await session.execute(select(RouteGeometryModel))).scalars().all()
+    assert [row.point_count for row in rows] == [3] * 5
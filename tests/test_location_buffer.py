@@ -0,0 +1,209 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models import LocationHistoryModel, ParticipationModel, RideModel, UserModel
+from app.repositories import LocationHistoryRepository
+from app.services import LocationWriteBuffer
+
+
+def make_buffer(session: AsyncSession, **kwargs) -> LocationWriteBuffer:
+    session_factory = async_sessionmaker(bind=session.bind, expire_on_commit=False)
+    return LocationWriteBuffer(session_factory=session_factory, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_buffer_keeps_only_latest_fix_per_rider(
+    session: AsyncSession,
+    test_ride: RideModel,
+    test_participation: ParticipationModel,
+):
+    buffer = make_buffer(session)
+    for step in range(5):
+        buffer.add(
+            participation_id=test_participation.id,
+            latitude=48.0 + step,
+            longitude=11.0 + step,
+            location_timestamp=datetime(2025, 11, 18, 15, 30, step, tzinfo=timezone.utc),
+        )
+    assert buffer.pending == 1
+
+    updated = await buffer.flush()
+    assert updated == 1
+    assert buffer.pending == 0
+
+    await session.refresh(test_participation)
+    assert float(test_participation.latitude) == pytest.approx(52.0)
+    assert float(test_participation.longitude) == pytest.approx(15.0)
+
+
+@pytest.mark.asyncio
+async def test_buffer_flushes_in_batches(
+    session: AsyncSession,
+    test_ride: RideModel,
+    test_user: UserModel,
+):
+    participations = []
+    for i in range(5):
+        user = UserModel(username=f"rider_{i}", password="x")
+        session.add(user)
+        await session.flush()
+        participation = ParticipationModel(user_id=user.id, ride_id=test_ride.id)
+        session.add(participation)
+        participations.append(participation)
+    await session.commit()
+
+    buffer = make_buffer(session, max_batch_size=2)
+    for participation in participations:
+        buffer.add(
+            participation_id=participation.id,
+            latitude=48.1,
+            longitude=11.5,
+            location_timestamp=datetime.now(timezone.utc),
+        )
+    # Deleted participation is silently skipped by the UPDATE
+    buffer.add(
+        participation_id=9999,
+        latitude=1.0,
+        longitude=1.0,
+        location_timestamp=datetime.now(timezone.utc),
+    )
+
+    updated = await buffer.flush()
+    assert updated == 5
+    assert buffer.flushed_rows == 5
+
+
+@pytest.mark.asyncio
+async def test_buffer_stop_drains_pending(
+    session: AsyncSession,
+    test_ride: RideModel,
+    test_participation: ParticipationModel,
+):
+    buffer = make_buffer(session, flush_interval_ms=60_000)
+    buffer.start()
+    buffer.add(
+        participation_id=test_participation.id,
+        latitude=50.0,
+        longitude=10.0,
+        location_timestamp=datetime.now(timezone.utc),
+    )
+    await buffer.stop()
+
+    assert buffer.pending == 0
+    await session.refresh(test_participation)
+    assert float(test_participation.latitude) == pytest.approx(50.0)
+
+
+@pytest.mark.asyncio
+async def test_buffer_appends_every_fix_to_history_in_one_insert(
+    session: AsyncSession,
+    test_participation: ParticipationModel,
+):
+    statements = []
+
+    def count_statements(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(session.bind.sync_engine, "before_cursor_execute", count_statements)
+    try:
+        buffer = make_buffer(session)
+        for step in range(50):
+            buffer.add(
+                participation_id=test_participation.id,
+                latitude=48.0 + step / 1000,
+                longitude=11.0,
+                location_timestamp=datetime(2025, 11, 18, 15, 30, step, tzinfo=timezone.utc),
+                speed=4.5,
+            )
+        assert buffer.pending == 1
+        await buffer.flush()
+    finally:
+        event.remove(session.bind.sync_engine, "before_cursor_execute", count_statements)
+
+    inserts = [statement for statement in statements if statement.startswith("INSERT INTO location_history")]
+    assert len(inserts) == 1
+    assert buffer.history_rows == 50
+
+    rows = (await session.execute(
+        select(LocationHistoryModel)
+        .where(LocationHistoryModel.participation_id == test_participation.id)
+        .order_by(LocationHistoryModel.timestamp)
+    )).scalars().all()
+    assert len(rows) == 50
+    assert rows[-1].latitude == pytest.approx(48.049)
+    assert rows[0].speed == 4.5
+
+
+@pytest.mark.asyncio
+async def test_buffer_keeps_history_when_flush_fails(
+    session: AsyncSession,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    buffer = make_buffer(session, history_max_pending=3)
+    for step in range(5):
+        buffer.add(
+            participation_id=1,
+            latitude=48.0,
+            longitude=11.0,
+            location_timestamp=datetime.now(timezone.utc),
+        )
+    # Only the newest rows are kept in memory
+    assert buffer.stats()["history_pending"] == 3
+    assert buffer.history_dropped == 2
+
+    async def broken_append(self, *, rows):
+        raise RuntimeError("database is down")
+
+    monkeypatch.setattr(LocationHistoryRepository, "append_many", broken_append)
+    with pytest.raises(RuntimeError):
+        await buffer.flush()
+
+    # Live positions are written in their own transaction
+    assert buffer.pending == 0
+    assert buffer.stats()["history_pending"] == 3
+
+
+@pytest.mark.asyncio
+async def test_buffer_drops_history_of_deleted_participation(
+    session: AsyncSession,
+    test_ride: RideModel,
+    test_participation: ParticipationModel,
+):
+    def enforce_foreign_keys(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+    rider = UserModel(username="leaver", password="x")
+    session.add(rider)
+    await session.flush()
+    leaver = ParticipationModel(user_id=rider.id, ride_id=test_ride.id)
+    session.add(leaver)
+    await session.commit()
+
+    buffer = make_buffer(session)
+    for participation_id in (leaver.id, test_participation.id):
+        buffer.add(
+            participation_id=participation_id,
+            latitude=50.0,
+            longitude=10.0,
+            location_timestamp=datetime.now(timezone.utc),
+        )
+    # The rider leaves with a fix still buffered
+    await session.delete(leaver)
+    await session.commit()
+
+    event.listen(session.bind.sync_engine, "connect", enforce_foreign_keys)
+    try:
+        assert await buffer.flush() == 1
+    finally:
+        event.remove(session.bind.sync_engine, "connect", enforce_foreign_keys)
+
+    assert buffer.stats()["history_pending"] == 0
+    assert buffer.history_orphaned == 1
+    await session.refresh(test_participation)
+    assert float(test_participation.latitude) == pytest.approx(50.0)
+    rows = (await session.execute(select(LocationHistoryModel))).scalars().all()
+    assert [row.participation_id for row in rows] == [test_participation.id]
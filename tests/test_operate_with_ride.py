@@ -94,6 +94,7 @@ async def test_get_ride_by_code_success(
         "is_active": ANY,
         "route_id": ANY,
         "visibility": ANY,
+        "broadcast_mode": ANY,
     }
 
     response = await test_client.get(f"/rides/code/{test_ride.code}")
@@ -118,6 +119,7 @@ async def test_get_ride_by_id_success(
         "is_active": ANY,
         "route_id": ANY,
         "visibility": ANY,
+        "broadcast_mode": ANY,
     }
 
     response = await test_client.get(f"/rides/{test_ride.id}")
@@ -215,6 +217,7 @@ async def test_edit_ride_by_id_success(
         "is_active": update_payload["is_active"],
         "route_id": response_data["route_id"],
         "visibility": response_data["visibility"],
+        "broadcast_mode": response_data["broadcast_mode"],
     }
     assert response_data == expected_response
     
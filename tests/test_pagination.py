@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import RideModel
+from app.utils.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+
+from tests.conftest import RideFactoryType
+
+START = datetime(2025, 11, 18, 15, 30, tzinfo=timezone.utc)
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(START, 42)
+    assert decode_cursor(cursor, datetime, int) == (START, 42)
+
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, int)
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor", int)
+
+
+@pytest.mark.asyncio
+async def test_rides_keyset_pages_cover_every_ride_once(
+    test_client: AsyncClient,
+    ride_factory: RideFactoryType,
+):
+    # Two rides share a start time, the id breaks the tie
+    created = [await ride_factory(start_time=START + timedelta(hours=hour)) for hour in (0, 1, 1, 2, 3)]
+
+    seen, after = [], None
+    while True:
+        params = {"limit": 2} | ({"after": after} if after else {})
+        response = await test_client.get("/rides/", params=params)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()) <= 2
+        seen += [ride["id"] for ride in response.json()]
+        after = response.headers.get(NEXT_CURSOR_HEADER)
+        if after is None:
+            break
+
+    assert seen == [ride.id for ride in created]
+
+
+@pytest.mark.asyncio
+async def test_rides_filters(
+    test_client: AsyncClient,
+    session: AsyncSession,
+    ride_factory: RideFactoryType,
+    test_ride: RideModel,
+):
+    later = await ride_factory(start_time=START + timedelta(days=1))
+    inactive = await ride_factory(start_time=START + timedelta(days=2))
+    inactive.is_active = False
+    await session.commit()
+
+    response = await test_client.get("/rides/", params={
+        "start_from": (START + timedelta(hours=1)).isoformat(),
+        "is_active": True,
+        "created_by": test_ride.created_by_user_id,
+    })
+
+    assert [ride["id"] for ride in response.json()] == [later.id]
+
+
+@pytest.mark.asyncio
+async def test_list_rejects_invalid_cursor(test_client: AsyncClient):
+    response = await test_client.get("/participations/", params={"after": "garbage"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
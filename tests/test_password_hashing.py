@@ -0,0 +1,61 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.security import (
+    PasswordHashBusy,
+    PasswordHashExecutor,
+    get_password_hash,
+    get_password_hash_async,
+    verify_password_async,
+)
+from app.utils.metrics import LatencyHistogram
+
+
+def test_latency_histogram_buckets_and_percentiles():
+    histogram = LatencyHistogram(buckets_ms=(10, 100))
+    for seconds in (0.001, 0.005, 0.05, 0.5):
+        histogram.observe(seconds)
+
+    stats = histogram.stats()
+    assert stats["count"] == 4
+    assert stats["buckets"] == {"le_10ms": 2, "le_100ms": 3, "le_inf": 4}
+    assert histogram.percentile(0.5) == 10
+    assert histogram.percentile(0.75) == 100
+    assert histogram.percentile(1.0) == pytest.approx(500)
+
+
+@pytest.mark.asyncio
+async def test_async_hash_and_verify_round_trip():
+    hashed = await get_password_hash_async("s3cret-pass")
+
+    assert await verify_password_async("s3cret-pass", hashed)
+    assert not await verify_password_async("wrong", hashed)
+    assert not await verify_password_async("s3cret-pass", "not-a-hash")
+    assert await verify_password_async("legacy", get_password_hash("legacy"))
+
+
+@pytest.mark.asyncio
+async def test_executor_rejects_when_queue_is_full():
+    executor = PasswordHashExecutor(workers=1, max_queue=1)
+    release = threading.Event()
+    histogram = LatencyHistogram()
+
+    running = asyncio.create_task(executor.run(histogram, release.wait))
+    await asyncio.sleep(0.01)
+    queued = asyncio.create_task(executor.run(histogram, lambda: "done"))
+    await asyncio.sleep(0.01)
+    assert executor.waiting == 1
+
+    with pytest.raises(PasswordHashBusy):
+        await executor.run(histogram, lambda: "rejected")
+
+    release.set()
+    assert await queued == "done"
+    await running
+    executor.shutdown()
+
+    assert executor.rejected == 1
+    assert histogram.count == 2
+    assert executor.queue_wait.count == 2
@@ -0,0 +1,109 @@
+import pytest
+
+from app.proximity import ProximityEngine, RideProximity
+from app.utils.geo import HAS_NUMPY, distance_matrix, dot_to_meters, np
+
+from tests.test_sockets import FakeSocketServer
+
+pytestmark = pytest.mark.skipif(not HAS_NUMPY, reason="the proximity engine needs NumPy")
+
+# ~111 m per 0.001 degrees of latitude
+LAT, LON = 48.1, 11.5
+
+
+def test_nearest_neighbours_match_brute_force_after_incremental_ticks():
+    rng = np.random.default_rng(7)
+    lats = LAT + rng.random(60) * 0.05
+    lons = LON + rng.random(60) * 0.05
+    ride = RideProximity()
+    for user_id, (lat, lon) in enumerate(zip(lats, lons)):
+        ride.update(user_id, lat, lon)
+    ride.tick(1500, 0.1)
+
+    # Few riders per tick take the row-by-row path, many the full product
+    for moved_count in (1, 3, 5, 40, 2):
+        for user_id in rng.choice(60, moved_count, replace=False):
+            lats[user_id] += rng.normal() * 0.003
+            lons[user_id] += rng.normal() * 0.003
+            ride.update(int(user_id), lats[user_id], lons[user_id])
+        ride.tick(1500, 0.1)
+
+        expected = np.asarray(distance_matrix(lats, lons))
+        np.fill_diagonal(expected, np.inf)
+        assert np.allclose(dot_to_meters(ride.nearest_dot), expected.min(axis=1), atol=0.01)
+        assert (ride.nearest_index == expected.argmin(axis=1)).all()
+
+
+def test_removed_riders_leave_nearest_neighbours():
+    rng = np.random.default_rng(3)
+    lats = list(LAT + rng.random(30) * 0.05)
+    lons = list(LON + rng.random(30) * 0.05)
+    ride = RideProximity()
+    for user_id, (lat, lon) in enumerate(zip(lats, lons)):
+        ride.update(user_id, lat, lon)
+    ride.tick(1500, 0.1)
+
+    # Someone's nearest neighbour, and a rider that was never ticked
+    removed = [int(ride.user_ids[ride.nearest_index[0]]), 7, 30]
+    ride.update(30, LAT, LON)
+    for user_id in removed:
+        assert ride.remove(user_id)
+    assert not ride.remove(30)
+    ride.tick(1500, 0.1)
+
+    kept = [user_id for user_id in range(30) if user_id not in removed]
+    assert ride.user_ids == kept
+    expected = np.asarray(distance_matrix([lats[i] for i in kept], [lons[i] for i in kept]))
+    np.fill_diagonal(expected, np.inf)
+    assert (ride.nearest_index == expected.argmin(axis=1)).all()
+    assert np.allclose(dot_to_meters(ride.nearest_dot), expected.min(axis=1), atol=0.01)
+
+
+def test_alerts_on_leaving_and_returning_with_hysteresis():
+    ride = RideProximity(leader_id=1)
+    ride.update(1, LAT, LON)
+    ride.update(2, LAT + 0.001, LON)
+    assert ride.tick(1000, 0.1) == []
+
+    ride.update(2, LAT + 0.010, LON)  # ~1.1 km behind the leader
+    [alert] = ride.tick(1000, 0.1)
+    assert alert["user_id"] == 2
+    assert alert["status"] == "outside" and alert["reference"] == "leader"
+    assert alert["distance_m"] == pytest.approx(1112, abs=2)
+    assert (alert["nearest_user_id"], alert["nearest_m"]) == (1, alert["distance_m"])
+
+    # Inside the radius but not by the hysteresis margin yet
+    ride.update(2, LAT + 0.0085, LON)
+    assert ride.tick(1000, 0.1) == []
+    ride.update(2, LAT + 0.0080, LON)
+    [alert] = ride.tick(1000, 0.1)
+    assert alert["status"] == "inside"
+
+
+def test_without_leader_position_distances_are_to_the_group():
+    ride = RideProximity(leader_id=99)
+    for user_id in range(4):
+        ride.update(user_id, LAT + user_id * 0.0001, LON)
+    ride.update(4, LAT, LON + 0.05)  # ~3.7 km east of everyone else
+
+    [alert] = ride.tick(1500, 0.1)
+    assert (alert["user_id"], alert["reference"]) == (4, "group")
+
+
+@pytest.mark.asyncio
+async def test_engine_sends_alerts_to_ride_rooms_on_tick():
+    fake = FakeSocketServer()
+    engine = ProximityEngine(fake, radius_m=500, tick_interval_ms=60_000)
+    try:
+        engine.update("ABC123", 1, LAT, LON, leader_id=1)
+        engine.update("ABC123", 2, LAT + 0.01, LON, leader_id=1)
+        assert await engine.tick("ABC123") == 2
+        assert await engine.tick("ABC123") == 0
+
+        [(event, data, room)] = fake.emitted
+        assert event == "proximity_alert"
+        assert (data["ride_code"], data["user_id"], data["status"]) == ("ABC123", 2, "outside")
+        assert room == ["ABC123", "ABC123:compact"]
+        assert engine.stats()["alerts_sent"] == 1
+    finally:
+        await engine.stop()
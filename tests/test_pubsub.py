@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+import pytest
+import pytest_asyncio
+
+import socketio
+
+from app.broadcast import LocationBroadcaster, compact_room
+from app.pubsub import BrokerPubSubManager, ChunkAssembler, MessageBroker, split_notify_payload
+from app.utils.frames import decode_frame, to_fixed
+
+from tests.test_sockets import FakeSocketServer
+
+
+@pytest_asyncio.fixture(scope="function")
+async def broker_url():
+    broker = MessageBroker()
+    port = await broker.start(port=0)
+    yield f"tcp://127.0.0.1:{port}"
+    await broker.stop()
+
+
+async def start_worker(url: str) -> tuple[socketio.AsyncServer, BrokerPubSubManager]:
+    manager = BrokerPubSubManager(url, channel="test")
+    server = socketio.AsyncServer(async_mode="asgi", client_manager=manager)
+    # A server initializes its manager on the first connection, tests have none
+    manager.initialize()
+    await asyncio.wait_for(manager.subscribed.wait(), 5)
+    return server, manager
+
+
+def test_notify_payload_chunks_reassemble_interleaved():
+    big = json.dumps({"locations": [{"user_id": i, "latitude": 48.1} for i in range(2000)]})
+    first = split_notify_payload(big, "host.1", max_bytes=1000)
+    second = split_notify_payload(big[::-1], "host.2", max_bytes=1000)
+    assert len(first) > 1 and all(len(part) <= 1000 for part in first)
+    assert split_notify_payload("{}", "host.3") == ["{}"]
+
+    assembler = ChunkAssembler()
+    results = [assembler.feed(part) for pair in zip(first, second) for part in pair]
+    assert [result for result in results if result is not None] == [big, big[::-1]]
+
+
+@pytest.mark.asyncio
+async def test_broker_fans_out_emits_to_other_workers(broker_url: str):
+    server_a, manager_a = await start_worker(broker_url)
+    server_b, manager_b = await start_worker(broker_url)
+    received = {"a": [], "b": []}
+
+    async def on_a(event, data, room):
+        received["a"].append((event, data, room))
+
+    async def on_b(event, data, room):
+        received["b"].append((event, data, room))
+
+    manager_a.add_remote_listener(on_a)
+    manager_b.add_remote_listener(on_b)
+    try:
+        location = {"user_id": 1, "latitude": 48.2, "longitude": 11.6}
+        await server_a.emit("location_update", location, room="ABC123")
+        # Compact frames stay on the emitting worker
+        await server_a.emit("location_frame", b"\x01", room="ABC123:compact", ignore_queue=True)
+
+        for _ in range(100):
+            if received["b"]:
+                break
+            await asyncio.sleep(0.01)
+
+        assert received["b"] == [("location_update", location, "ABC123")]
+        # A worker does not get its own messages back
+        assert received["a"] == []
+        assert manager_a.stats()["published"] == 1
+        assert manager_b.stats()["received"] == 1
+    finally:
+        await manager_a.close()
+        await manager_b.close()
+
+
+@pytest.mark.asyncio
+async def test_remote_locations_are_encoded_for_local_compact_sockets():
+    fake = FakeSocketServer()
+    broadcaster = LocationBroadcaster(fake)
+    await broadcaster.subscribe_compact("viewer", "ABC123")
+
+    await broadcaster.relay_remote("location_batch", {
+        "ride_code": "ABC123",
+        "locations": [{
+            "user_id": 7,
+            "latitude": 48.2,
+            "longitude": 11.6,
+            "location_timestamp": "2025-11-18T15:30:00",
+        }],
+    }, "ABC123")
+    # Rooms without compact sockets are ignored
+    await broadcaster.relay_remote("location_update", {"user_id": 8}, "OTHER1")
+
+    [frame] = [data for event, data, room in fake.emitted if event == "location_frame"]
+    assert fake.emitted[-1][2] == compact_room("ABC123")
+    keyframe, [entry] = decode_frame(frame)
+    assert keyframe and entry.lat == to_fixed(48.2)
@@ -0,0 +1,140 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app import sockets
+from app.broadcast import compact_room
+from app.models import LocationHistoryModel, ParticipationModel, RideModel, UserModel
+from app.routers import simulation
+from app.security import create_access_token
+from app.spatial import ride_positions
+
+from tests.test_sockets import FakeSocketServer, fake_sio  # noqa: F401 (fixture)
+
+START = datetime(2025, 11, 18, 15, 30, tzinfo=timezone.utc)
+
+
+async def record_track(session: AsyncSession, participation: ParticipationModel, count: int) -> None:
+    for second in range(count):
+        session.add(LocationHistoryModel(
+            participation_id=participation.id,
+            latitude=48.0 + second / 1000,
+            longitude=11.0,
+            timestamp=START + timedelta(seconds=second),
+        ))
+    await session.commit()
+
+
+def headers_for(user_id: int) -> dict[str, str]:
+    return {"Authorization": f"Bearer {create_access_token(subject=str(user_id))}"}
+
+
+@pytest.mark.asyncio
+async def test_replay_streams_ndjson_in_time_order(
+    test_client: AsyncClient,
+    session: AsyncSession,
+    test_ride: RideModel,
+    test_participation: ParticipationModel,
+):
+    await record_track(session, test_participation, 10)
+
+    response = await test_client.get(f"/rides/{test_ride.id}/replay", headers=headers_for(test_participation.user_id))
+
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    frames = [json.loads(line) for line in response.text.splitlines()]
+    assert len(frames) == 10
+    assert frames[0]["user_id"] == test_participation.user_id
+    assert frames[-1]["latitude"] == pytest.approx(48.009)
+    timestamps = [datetime.fromisoformat(frame["location_timestamp"]) for frame in frames]
+    assert timestamps == sorted(timestamps)
+
+
+@pytest.mark.asyncio
+async def test_replay_time_window_and_downsampling(
+    test_client: AsyncClient,
+    session: AsyncSession,
+    test_ride: RideModel,
+    test_participation: ParticipationModel,
+):
+    await record_track(session, test_participation, 10)
+
+    response = await test_client.get(
+        f"/rides/{test_ride.id}/replay",
+        params={
+            "start": (START + timedelta(seconds=2)).isoformat(),
+            "end": (START + timedelta(seconds=8)).isoformat(),
+            "min_interval_ms": 2000,
+        },
+        headers=headers_for(test_participation.user_id),
+    )
+
+    assert response.status_code == status.HTTP_200_OK, response.text
+    frames = [json.loads(line) for line in response.text.splitlines()]
+    seconds = [datetime.fromisoformat(frame["location_timestamp"]).second for frame in frames]
+    assert seconds == [2, 4, 6]
+
+
+@pytest.mark.asyncio
+async def test_replay_unknown_ride_returns_404(test_client: AsyncClient, auth_headers: dict[str, str]):
+    response = await test_client.get("/rides/9999/replay", headers=auth_headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_replay_is_only_for_members(
+    test_client: AsyncClient,
+    auth_headers: dict[str, str],
+    session: AsyncSession,
+    test_ride: RideModel,
+    test_participation: ParticipationModel,
+):
+    await record_track(session, test_participation, 3)
+
+    response = await test_client.get(f"/rides/{test_ride.id}/replay")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    # auth_headers belong to a user who never joined the ride
+    response = await test_client.get(f"/rides/{test_ride.id}/replay", headers=auth_headers)
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    # The organizer does not need a participation
+    organizer = UserModel(username="organizer", password="x")
+    session.add(organizer)
+    await session.flush()
+    test_ride.created_by_user_id = organizer.id
+    await session.commit()
+    response = await test_client.get(f"/rides/{test_ride.id}/replay", headers=headers_for(organizer.id))
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.text.splitlines()) == 3
+
+
+@pytest.mark.asyncio
+async def test_simulated_replay_stays_out_of_live_state(
+    monkeypatch: pytest.MonkeyPatch,
+    fake_sio: FakeSocketServer,
+    session: AsyncSession,
+    test_ride: RideModel,
+    test_participation: ParticipationModel,
+):
+    await record_track(session, test_participation, 3)
+    monkeypatch.setattr(
+        simulation, "AsyncSessionLocal", async_sessionmaker(bind=session.bind, expire_on_commit=False),
+    )
+
+    await simulation.replay_task(test_ride.code, test_ride.id, 1000, None, None, 0)
+
+    replayed = [(data, room) for event, data, room in fake_sio.emitted if event == "replay_location"]
+    assert len(replayed) == 3
+    assert replayed[0][1] == [test_ride.code, compact_room(test_ride.code)]
+    assert fake_sio.events("location_update") == []
+
+    # What another worker would receive through the client manager
+    for data, room in replayed:
+        await sockets.relay_remote_emit("replay_location", data, test_ride.code)
+    assert ride_positions.get(test_ride.code) is None
+    assert sockets.proximity.stats()["rides"] == 0
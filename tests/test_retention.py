@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models import (
+    LocationHistoryArchiveModel,
+    LocationHistoryModel,
+    ParticipationArchiveModel,
+    ParticipationModel,
+    RideArchiveModel,
+    RideModel,
+)
+from app.repositories.ride import RideRecord, ride_code_cache
+from app.retention import RideArchiver
+from app.snapping import build_route_snapper, route_snappers
+from app.sockets import broadcaster, proximity
+from app.spatial import ride_positions
+from app.utils.frames import RoomFrameEncoder
+from tests.conftest import gpx_document
+
+NOW = datetime(2025, 11, 20, 12, 0, tzinfo=timezone.utc)
+
+
+def make_archiver(session: AsyncSession, **kwargs) -> RideArchiver:
+    session_factory = async_sessionmaker(bind=session.bind, expire_on_commit=False)
+    return RideArchiver(session_factory=session_factory, now=lambda: NOW, **kwargs)
+
+
+async def count(session: AsyncSession, model) -> int:
+    return (await session.execute(select(func.count()).select_from(model))).scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_archiver_moves_old_rides_with_children(
+    session: AsyncSession,
+    ride_factory,
+    test_ride: RideModel,
+    test_participation: ParticipationModel,
+):
+    session.add(LocationHistoryModel(
+        participation_id=test_participation.id,
+        latitude=48.0,
+        longitude=11.0,
+        timestamp=test_ride.start_time,
+    ))
+    recent = await ride_factory(start_time=NOW - timedelta(hours=2))
+    await session.commit()
+    ride_code_cache.set(test_ride.code, RideRecord.from_model(test_ride))
+
+    ride_id, ride_code = test_ride.id, test_ride.code
+
+    archiver = make_archiver(session, batch_size=1)
+    assert await archiver.run_once() == 1
+
+    session.expire_all()
+    assert [ride.id for ride in (await session.execute(select(RideModel))).scalars()] == [recent.id]
+    assert await count(session, ParticipationModel) == 0
+    assert await count(session, LocationHistoryModel) == 0
+
+    archived = (await session.execute(select(RideArchiveModel))).scalar_one()
+    assert (archived.id, archived.code, archived.broadcast_mode) == (ride_id, ride_code, "PER_FIX")
+    assert await count(session, ParticipationArchiveModel) == 1
+    assert await count(session, LocationHistoryArchiveModel) == 1
+    assert len(ride_code_cache) == 0
+    assert archiver.stats()["archived_locations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_archiver_keeps_rides_with_recent_fixes(
+    session: AsyncSession,
+    test_ride: RideModel,
+    test_participation: ParticipationModel,
+):
+    test_participation.location_timestamp = NOW - timedelta(minutes=5)
+    await session.commit()
+
+    assert await make_archiver(session).run_once() == 0
+    assert await count(session, RideModel) == 1
+
+
+@pytest.mark.asyncio
+async def test_archiver_never_reuses_archived_ids(
+    session: AsyncSession,
+    ride_factory,
+    test_user,
+):
+    archiver = make_archiver(session)
+    ride_ids = []
+    for _ in range(2):
+        # The newest ride is the one SQLite would otherwise hand out again
+        ride = await ride_factory()
+        session.add(ParticipationModel(user_id=test_user.id, ride_id=ride.id))
+        await session.commit()
+        ride_ids.append(ride.id)
+
+        assert await archiver.run_once() == 1
+
+    assert ride_ids[0] != ride_ids[1]
+    assert await count(session, RideArchiveModel) == 2
+    assert await count(session, ParticipationArchiveModel) == 2
+
+
+@pytest.mark.asyncio
+async def test_archiver_drops_live_state_of_archived_rides(
+    session: AsyncSession,
+    test_ride: RideModel,
+    test_user,
+):
+    code = test_ride.code
+    broadcaster._encoders[code] = RoomFrameEncoder(keyframe_interval=20)
+    ride_positions.update(code, test_user.id, 48.0, 11.0)
+    proximity.update(code, test_user.id, 48.0, 11.0)
+    snapper = build_route_snapper(gpx_document([48.0, 48.01], [11.0, 11.0]))
+    route_snappers.snap(code, test_user.id, snapper, 48.005, 11.0)
+
+    assert await make_archiver(session).run_once() == 1
+
+    assert code not in broadcaster._encoders
+    assert code not in proximity._rides and code not in proximity._tasks
+    assert ride_positions.get(code) is None
+    assert route_snappers._progress.get(code) is None
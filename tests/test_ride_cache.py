@@ -0,0 +1,87 @@
+import pytest
+
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models import RideModel
+from app.repositories import RideRepository
+from app.repositories.ride import RideRecord, ride_code_cache
+from app.security import create_access_token
+from app.utils.cache import TTLCache
+
+
+def test_ttl_cache_expires_and_evicts():
+    now = [0.0]
+    cache: TTLCache[str, int] = TTLCache(max_size=2, ttl_seconds=10, clock=lambda: now[0])
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    # "b" is now least recently used and gets evicted
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.evictions == 1
+
+    now[0] = 11
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+@pytest.mark.asyncio
+async def test_get_record_by_code_hits_cache(session: AsyncSession, test_ride: RideModel):
+    ride_repository = RideRepository(session=session)
+
+    record = await ride_repository.get_record_by_code(ride_code=test_ride.code)
+    assert record == RideRecord.from_model(test_ride)
+    assert ride_code_cache.misses == 1
+
+    again = await ride_repository.get_record_by_code(ride_code=test_ride.code)
+    assert again is record
+    assert ride_code_cache.hits == 1
+
+    assert await ride_repository.get_record_by_code(ride_code="NOPE00") is None
+
+
+@pytest.mark.asyncio
+async def test_update_and_delete_invalidate_cache(session: AsyncSession, test_ride: RideModel):
+    ride_repository = RideRepository(session=session)
+
+    await ride_repository.get_record_by_code(ride_code=test_ride.code)
+    await ride_repository.update_ride(test_ride, is_active=False)
+    assert len(ride_code_cache) == 0
+
+    record = await ride_repository.get_record_by_code(ride_code=test_ride.code)
+    assert record.is_active is False
+
+    await ride_repository.delete_ride(ride=test_ride)
+    assert len(ride_code_cache) == 0
+    assert await ride_repository.get_record_by_code(ride_code=test_ride.code) is None
+
+
+@pytest.mark.asyncio
+async def test_lookup_before_commit_does_not_outlive_it(
+    test_client: AsyncClient,
+    session: AsyncSession,
+    test_ride: RideModel,
+):
+    headers = {"Authorization": f"Bearer {create_access_token(subject=str(test_ride.created_by_user_id))}"}
+    session_factory = async_sessionmaker(bind=session.bind, expire_on_commit=False)
+
+    async def socket_lookup() -> RideRecord | None:
+        # Resolved on its own connection, which only sees committed rows
+        async with session_factory() as other:
+            return await RideRepository(session=other).get_record_by_code(ride_code=test_ride.code)
+
+    response = await test_client.put(f"/rides/{test_ride.id}", json={"is_active": False}, headers=headers)
+    assert response.status_code == 200
+    assert (await socket_lookup()).is_active is True
+    await session.commit()
+    assert (await socket_lookup()).is_active is False
+
+    response = await test_client.delete(f"/rides/{test_ride.id}", headers=headers)
+    assert response.status_code == 204
+    assert await socket_lookup() is not None
+    await session.commit()
+    assert await socket_lookup() is None
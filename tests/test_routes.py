@@ -0,0 +1,61 @@
+import pytest
+import pytest_asyncio
+
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import RouteModel, UserModel
+from app.security import create_access_token
+
+GPX = '<?xml version="1.0"?><gpx version="1.1"><trk><trkseg><trkpt lat="48.1" lon="11.5"/></trkseg></trk></gpx>'
+
+
+@pytest_asyncio.fixture(scope="function")
+async def test_route(session: AsyncSession, test_user: UserModel) -> RouteModel:
+    route = RouteModel(
+        title="Test Route",
+        gpx_data=GPX,
+        distance_meters=0,
+        created_by_user_id=test_user.id,
+    )
+    session.add(route)
+    await session.commit()
+    await session.refresh(route)
+    return route
+
+
+@pytest.mark.asyncio
+async def test_route_list_omits_gpx_data(test_client: AsyncClient, test_route: RouteModel):
+    response = await test_client.get("/routes/")
+
+    assert response.status_code == status.HTTP_200_OK
+    [route] = response.json()
+    assert route["id"] == test_route.id
+    assert "gpx_data" not in route
+
+
+@pytest.mark.asyncio
+async def test_route_gpx_supports_conditional_get(test_client: AsyncClient, test_route: RouteModel):
+    response = await test_client.get(f"/routes/{test_route.id}/gpx")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("application/gpx+xml")
+    assert response.text == GPX
+    etag = response.headers["etag"]
+
+    cached = await test_client.get(f"/routes/{test_route.id}/gpx", headers={"If-None-Match": etag})
+    assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+    assert cached.content == b""
+
+    # Edits within the same second (updated_at resolution on SQLite) still change the ETag
+    headers = {"Authorization": f"Bearer {create_access_token(subject=str(test_route.created_by_user_id))}"}
+    for title in ("First edit", "Second edit"):
+        await test_client.put(f"/routes/{test_route.id}", json={"title": title}, headers=headers)
+        changed = await test_client.get(f"/routes/{test_route.id}/gpx", headers={"If-None-Match": etag})
+        assert changed.status_code == status.HTTP_200_OK
+        assert changed.headers["etag"] != etag
+        etag = changed.headers["etag"]
+
+    missing = await test_client.get("/routes/9999/gpx")
+    assert missing.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,161 @@
+import math
+import random
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.repositories import RouteRepository
+from app.simplification import ROUTE_LOD_ZOOMS, RouteSimplifier, lod_zoom, route_simplifier
+from app.snapping import route_snappers
+from app.utils.geometry import decode_polyline, douglas_peucker_tolerances
+
+from tests.conftest import gpx_document
+
+
+def wandering_route(points: int, seed: int = 0) -> tuple[list[float], list[float]]:
+    rng = random.Random(seed)
+    lats, lons, heading = [48.1], [11.5], 0.0
+    for _ in range(points - 1):
+        heading += rng.gauss(0, 0.2)
+        lats.append(lats[-1] + 0.00009 * math.cos(heading))
+        lons.append(lons[-1] + 0.000135 * math.sin(heading))
+    return lats, lons
+
+
+def douglas_peucker(xs, ys, start, end, tolerance, kept):
+    ax, ay, dx, dy = xs[start], ys[start], xs[end] - xs[start], ys[end] - ys[start]
+    length_sq = dx * dx + dy * dy
+    best, best_distance = None, tolerance
+    for i in range(start + 1, end):
+        px, py = xs[i] - ax, ys[i] - ay
+        t = 0.0 if length_sq == 0 else min(1.0, max(0.0, (px * dx + py * dy) / length_sq))
+        distance = math.hypot(px - dx * t, py - dy * t)
+        if distance > best_distance:
+            best, best_distance = i, distance
+    if best is not None:
+        kept.add(best)
+        douglas_peucker(xs, ys, start, best, tolerance, kept)
+        douglas_peucker(xs, ys, best, end, tolerance, kept)
+
+
+def test_tolerances_match_recursive_douglas_peucker():
+    lats, lons = wandering_route(500)
+    tolerances = douglas_peucker_tolerances(lats, lons)
+
+    # Same local projection as the kernel
+    meters_per_degree = math.pi * 6371000 / 180
+    kx = meters_per_degree * math.cos(math.radians((min(lats) + max(lats)) / 2))
+    xs = [lon * kx for lon in lons]
+    ys = [lat * meters_per_degree for lat in lats]
+
+    for tolerance in (0.5, 2, 10, 50, 200):
+        kept = {0, len(lats) - 1}
+        douglas_peucker(xs, ys, 0, len(lats) - 1, tolerance, kept)
+        assert {i for i, value in enumerate(tolerances) if value > tolerance} == kept
+
+
+def test_lod_zoom_serves_next_finer_level():
+    zooms = [6, 10, 14]
+    assert [lod_zoom(zoom, zooms) for zoom in (None, 0, 6, 7, 14, 15)] == [None, 6, 6, 10, 14, None]
+
+
+@pytest.mark.asyncio
+async def test_geometry_endpoint_simplifies_by_zoom(
+    test_client: AsyncClient,
+    auth_headers: dict[str, str],
+    session: AsyncSession,
+):
+    lats, lons = wandering_route(2000)
+    response = await test_client.post(
+        "/routes/", json={"title": "Wander", "gpx_data": gpx_document(lats, lons)}, headers=auth_headers,
+    )
+    route_id = response.json()["id"]
+
+    response = await test_client.get(f"/routes/{route_id}/geometry")
+    assert response.status_code == status.HTTP_200_OK
+    full = response.json()
+    assert full["zoom"] is None and full["point_count"] == 2000
+    assert len(decode_polyline(full["polyline"])) == 2000
+
+    # Not simplified in the background yet: computed on request
+    counts = []
+    for zoom in (5, 10, 15):
+        body = (await test_client.get(f"/routes/{route_id}/geometry", params={"zoom": zoom})).json()
+        assert body["zoom"] == lod_zoom(zoom)
+        assert len(decode_polyline(body["polyline"])) == body["point_count"]
+        counts.append(body["point_count"])
+    assert counts[0] < counts[1] < counts[2] < 2000
+
+    etag = response.headers["etag"]
+    response = await test_client.get(
+        f"/routes/{route_id}/geometry", params={"zoom": 10}, headers={"If-None-Match": etag},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["etag"]
+    response = await test_client.get(
+        f"/routes/{route_id}/geometry", params={"zoom": 10}, headers={"If-None-Match": etag},
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # Stored by the worker, then served from the database
+    await session.commit()
+    assert route_simplifier.stats()["queued"] >= 1
+    simplifier = RouteSimplifier(session_factory=async_sessionmaker(bind=session.bind, expire_on_commit=False))
+    assert await simplifier.simplify(route_id) == len(ROUTE_LOD_ZOOMS)
+    stored = await RouteRepository(session=session).get_lod(route_id=route_id, zoom=lod_zoom(10))
+    assert stored.point_count == counts[1]
+
+    response = await test_client.get("/routes/999999/geometry", params={"zoom": 10})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_only_gpx_changes_enqueue_simplification(
+    test_client: AsyncClient,
+    auth_headers: dict[str, str],
+    session: AsyncSession,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    enqueued = []
+    monkeypatch.setattr(route_simplifier, "enqueue", enqueued.append)
+    gpx = gpx_document(*wandering_route(50))
+
+    response = await test_client.post("/routes/", json={"title": "Loop", "gpx_data": gpx}, headers=auth_headers)
+    route_id = response.json()["id"]
+    await session.commit()
+    assert enqueued == [route_id]
+
+    await test_client.put(f"/routes/{route_id}", json={"title": "Renamed"}, headers=auth_headers)
+    await session.commit()
+    assert enqueued == [route_id]
+
+    await test_client.put(f"/routes/{route_id}", json={"gpx_data": gpx}, headers=auth_headers)
+    await session.commit()
+    assert enqueued == [route_id, route_id]
+
+
+@pytest.mark.asyncio
+async def test_deleting_a_route_drops_its_cached_levels_after_commit(
+    test_client: AsyncClient,
+    auth_headers: dict[str, str],
+    session: AsyncSession,
+):
+    response = await test_client.post(
+        "/routes/", json={"title": "Gone", "gpx_data": gpx_document(*wandering_route(50))}, headers=auth_headers,
+    )
+    route_id = response.json()["id"]
+    await session.commit()
+    await test_client.get(f"/routes/{route_id}/geometry", params={"zoom": 10})
+    cached = route_simplifier.stats()["cache"]["size"]
+    assert route_snappers.get(route_id) is not None
+
+    response = await test_client.delete(f"/routes/{route_id}", headers=auth_headers)
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    # Still served while the delete may roll back
+    assert route_snappers.get(route_id) is not None
+
+    await session.commit()
+    assert route_snappers.get(route_id) is None
+    assert route_simplifier.stats()["cache"]["size"] == cached - 1
@@ -0,0 +1,114 @@
+import asyncio
+import math
+import pickle
+import random
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import services, sockets
+from app.models import ParticipationModel, RideModel
+from app.snapping import RouteSnapper, build_route_snapper, route_snappers
+from app.utils.geo import haversine_distance
+from tests.conftest import gpx_document
+from tests.test_sockets import FakeSocketServer, connect_as, fake_sio  # noqa: F401 (fixture)
+
+# North along 11.5, then back south 20 m further east
+OUT_AND_BACK = (
+    [48.10 + i * 0.001 for i in range(11)] + [48.11 - i * 0.001 for i in range(11)],
+    [11.5] * 11 + [11.50027] * 11,
+)
+
+
+def brute_force_distance(snapper: RouteSnapper, lat: float, lon: float) -> float:
+    x, y = snapper._project(lat, lon)
+    return min(snapper._measure(segment, x, y)[0] for segment in range(snapper.point_count - 1))
+
+
+def test_snap_matches_brute_force_and_survives_pickling():
+    rng = random.Random(5)
+    lats, lons = [48.1], [11.5]
+    for _ in range(500):
+        # Random walk with a few long straight segments
+        step = 0.02 if rng.random() < 0.02 else 0.0005
+        lats.append(lats[-1] + rng.uniform(-step, step))
+        lons.append(lons[-1] + rng.uniform(-step, step))
+    snapper = pickle.loads(pickle.dumps(RouteSnapper(lats, lons, cell_m=80)))
+
+    assert snapper.length_m == pytest.approx(sum(
+        haversine_distance(lats[i], lons[i], lats[i + 1], lons[i + 1]) for i in range(len(lats) - 1)
+    ))
+    for _ in range(300):
+        i = rng.randrange(len(lats))
+        lat, lon = lats[i] + rng.gauss(0, 0.002), lons[i] + rng.gauss(0, 0.002)
+        result = snapper.snap(lat, lon, ambiguity_m=0)
+        expected = brute_force_distance(snapper, lat, lon)
+        if expected > 500:
+            assert result is None
+        else:
+            distance = snapper._measure(result.segment, *snapper._project(lat, lon))[0]
+            assert distance == pytest.approx(expected)
+            assert 0 <= result.progress_m <= snapper.length_m
+
+
+def test_previous_progress_picks_the_pass():
+    snapper = RouteSnapper(*OUT_AND_BACK)
+    half = snapper.length_m / 2
+
+    # Between the two legs, on the way out and on the way back
+    outbound = snapper.snap(48.105, 11.50014, hint_m=100)
+    inbound = snapper.snap(48.105, 11.50014, hint_m=half + 100)
+    assert outbound.progress_m == pytest.approx(556, abs=5)
+    assert inbound.progress_m == pytest.approx(snapper.length_m - 556, abs=5)
+    # Right of the direction of travel on both legs
+    assert outbound.cross_track_m < 0 and inbound.cross_track_m < 0
+    assert math.isclose(outbound.cross_track_m, -10, abs_tol=1)
+
+    assert snapper.snap(48.105, 11.52) is None
+    assert build_route_snapper("not xml").snap(48.1, 11.5) is None
+
+
+@pytest.mark.asyncio
+async def test_participants_and_socket_updates_carry_progress(
+    test_client: AsyncClient,
+    auth_headers: dict[str, str],
+    session: AsyncSession,
+    fake_sio: FakeSocketServer,
+    test_ride: RideModel,
+    test_participation: ParticipationModel,
+):
+    response = await test_client.post(
+        "/routes/", json={"title": "Out and back", "gpx_data": gpx_document(*OUT_AND_BACK)}, headers=auth_headers,
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    route_id = response.json()["id"]
+    # Published once the route is committed
+    assert route_snappers.get(route_id) is None
+    await session.commit()
+    assert response.json()["distance_meters"] == pytest.approx(route_snappers.get(route_id).length_m)
+
+    test_ride.route_id = route_id
+    test_participation.latitude, test_participation.longitude = 48.102, 11.5
+    await session.commit()
+
+    # Built lazily by the endpoint when this worker has no index of the route
+    route_snappers.clear()
+    [participant] = (await test_client.get(f"/rides/{test_ride.id}/participants")).json()
+    assert participant["progress_m"] == pytest.approx(222, abs=2)
+    assert participant["cross_track_m"] == pytest.approx(0, abs=1)
+
+    # A socket fix never waits: the first goes out without progress while the index builds
+    route_snappers.clear()
+    await connect_as(test_participation.user_id)
+    await sockets.join_ride("sid-1", {"ride_code": test_ride.code})
+    await sockets.update_location("sid-1", {"ride_code": test_ride.code, "latitude": 48.103, "longitude": 11.5})
+    await asyncio.sleep(0.2)
+    sockets.throttle.forget(test_participation.id)
+    await sockets.update_location("sid-1", {"ride_code": test_ride.code, "latitude": 48.104, "longitude": 11.5})
+
+    first, second = fake_sio.events("location_update")
+    assert "progress_m" not in first
+    assert second["progress_m"] == pytest.approx(445, abs=2)
+    await services.location_buffer.flush()
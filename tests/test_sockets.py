@@ -0,0 +1,375 @@
+import asyncio
+from collections.abc import AsyncGenerator
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from socketio.exceptions import ConnectionRefusedError
+
+from app import services, sockets
+from app.broadcast import LocationBroadcaster, compact_room
+from app.models import BroadcastMode, ParticipationModel, RideModel, UserModel
+from app.proximity import ProximityEngine
+from app.security import create_access_token
+from app.spatial import ride_positions
+from app.services import LocationWriteBuffer
+from app.throttle import LocationThrottle
+from app.utils.frames import decode_frame, to_fixed
+from app.utils.geo import HAS_NUMPY
+
+
+class FakeSocketServer:
+    """Records what the handlers do with `sio` without a real connection."""
+
+    def __init__(self):
+        self.sessions: dict[str, dict] = defaultdict(dict)
+        self.rooms: dict[str, set[str]] = defaultdict(set)
+        self.emitted: list[tuple[str, object, str | None]] = []
+
+    async def get_session(self, sid, namespace=None):
+        return self.sessions[sid]
+
+    async def save_session(self, sid, session, namespace=None):
+        self.sessions[sid] = session
+
+    @asynccontextmanager
+    async def session(self, sid, namespace=None):
+        yield self.sessions[sid]
+
+    async def emit(self, event, data=None, room=None, **kwargs):
+        self.emitted.append((event, data, room))
+
+    async def enter_room(self, sid, room, namespace=None):
+        self.rooms[room].add(sid)
+
+    def events(self, name: str) -> list:
+        return [data for event, data, _ in self.emitted if event == name]
+
+
+@pytest_asyncio.fixture(scope="function")
+async def fake_sio(monkeypatch: pytest.MonkeyPatch, session: AsyncSession) -> AsyncGenerator[FakeSocketServer, None]:
+    fake = FakeSocketServer()
+    for name in ("get_session", "save_session", "session", "emit", "enter_room"):
+        monkeypatch.setattr(sockets.sio, name, getattr(fake, name))
+
+    session_factory = async_sessionmaker(bind=session.bind, expire_on_commit=False)
+    monkeypatch.setattr(services, "AsyncSessionLocal", session_factory)
+    monkeypatch.setattr(
+        services, "location_buffer", LocationWriteBuffer(session_factory=session_factory)
+    )
+    monkeypatch.setattr(sockets, "throttle", LocationThrottle())
+    proximity = ProximityEngine(sockets.sio)
+    monkeypatch.setattr(sockets, "proximity", proximity)
+    yield fake
+    await proximity.stop()
+
+
+async def connect_as(user_id: int, sid: str = "sid-1") -> None:
+    token = create_access_token(subject=str(user_id))
+    await sockets.connect(sid, {}, {"token": token})
+
+
+@pytest.mark.asyncio
+async def test_connect_caches_identity_in_session(
+    fake_sio: FakeSocketServer,
+    test_user: UserModel,
+):
+    await connect_as(test_user.id)
+
+    assert fake_sio.sessions["sid-1"]["user_id"] == test_user.id
+    assert fake_sio.sessions["sid-1"]["username"] == test_user.username
+
+
+@pytest.mark.asyncio
+async def test_connect_rejects_invalid_token(fake_sio: FakeSocketServer):
+    with pytest.raises(ConnectionRefusedError):
+        await sockets.connect("sid-1", {}, {"token": "not-a-token"})
+
+    with pytest.raises(ConnectionRefusedError):
+        await connect_as(9999)
+
+
+@pytest.mark.asyncio
+async def test_join_ride_stores_participation_in_socket_session(
+    fake_sio: FakeSocketServer,
+    test_ride: RideModel,
+    test_participation: ParticipationModel,
+):
+    await connect_as(test_participation.user_id)
+    await sockets.join_ride("sid-1", {"ride_code": test_ride.code})
+
+    assert "sid-1" in fake_sio.rooms[test_ride.code]
+    assert fake_sio.sessions["sid-1"]["rides"][test_ride.code] == {
+        "ride_id": test_ride.id,
+        "participation_id": test_participation.id,
+        "user_id": test_participation.user_id,
+    }
+
+
+@pytest.mark.asyncio
+async def test_update_location_uses_session_without_lookup(
+    fake_sio: FakeSocketServer,
+    monkeypatch: pytest.MonkeyPatch,
+    test_ride: RideModel,
+    test_participation: ParticipationModel,
+):
+    await connect_as(test_participation.user_id)
+    await sockets.join_ride("sid-1", {"ride_code": test_ride.code})
+
+    async def fail_lookup(**kwargs):
+        raise AssertionError("membership must come from the socket session")
+
+    monkeypatch.setattr(services.LocationService, "resolve_membership", fail_lookup)
+
+    await sockets.update_location("sid-1", {
+        "ride_code": test_ride.code,
+        "user_id": 9999,  # ignored, the socket identity wins
+        "latitude": 48.2,
+        "longitude": 11.6,
+    })
+
+    [update] = fake_sio.events("location_update")
+    assert update["user_id"] == test_participation.user_id
+    assert services.location_buffer.pending == 1
+    assert await services.location_buffer.flush() == 1
+
+
+@pytest.mark.asyncio
+async def test_update_location_rejects_non_participant(
+    fake_sio: FakeSocketServer,
+    session: AsyncSession,
+    test_ride: RideModel,
+):
+    outsider = UserModel(username="outsider", password="x")
+    session.add(outsider)
+    await session.commit()
+    await connect_as(outsider.id, sid="sid-2")
+
+    payload = {"ride_code": test_ride.code, "latitude": 48.2, "longitude": 11.6}
+    await sockets.update_location("sid-2", payload)
+    # Anonymous sockets cannot send locations either
+    await sockets.connect("sid-3", {}, None)
+    await sockets.update_location("sid-3", payload)
+
+    assert fake_sio.events("location_update") == []
+    assert len(fake_sio.events("error")) == 2
+    assert services.location_buffer.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_update_location_drops_membership_of_deleted_participation(
+    fake_sio: FakeSocketServer,
+    session: AsyncSession,
+    test_ride: RideModel,
+    test_participation: ParticipationModel,
+):
+    await connect_as(test_participation.user_id)
+    await sockets.join_ride("sid-1", {"ride_code": test_ride.code})
+    payload = {"ride_code": test_ride.code, "latitude": 48.2, "longitude": 11.6}
+    await sockets.update_location("sid-1", payload)
+
+    # Deleted elsewhere (ride archived, another worker); this worker's flush notices
+    await session.delete(test_participation)
+    await session.commit()
+    assert await services.location_buffer.flush() == 0
+
+    await sockets.update_location("sid-1", {**payload, "latitude": 48.3})
+    assert len(fake_sio.events("location_update")) == 1
+    assert len(fake_sio.events("error")) == 1
+    assert test_ride.code not in fake_sio.sessions["sid-1"]["rides"]
+    assert services.location_buffer.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_leaving_ride_forgets_buffered_fixes(
+    fake_sio: FakeSocketServer,
+    test_client: AsyncClient,
+    session: AsyncSession,
+    test_ride: RideModel,
+    test_participation: ParticipationModel,
+):
+    await connect_as(test_participation.user_id)
+    await sockets.join_ride("sid-1", {"ride_code": test_ride.code})
+    payload = {"ride_code": test_ride.code, "latitude": 48.2, "longitude": 11.6}
+    await sockets.update_location("sid-1", payload)
+    assert services.location_buffer.pending == 1
+
+    token = create_access_token(subject=str(test_participation.user_id))
+    response = await test_client.delete(
+        f"/participations/{test_participation.id}", headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 204
+    await session.commit()
+
+    assert services.location_buffer.pending == 0
+    assert services.location_buffer.stats()["history_pending"] == 0
+    await sockets.update_location("sid-1", {**payload, "latitude": 48.3})
+    assert len(fake_sio.events("location_update")) == 1
+    assert len(fake_sio.events("error")) == 1
+
+
+@pytest.mark.skipif(not HAS_NUMPY, reason="the proximity engine needs NumPy")
+@pytest.mark.asyncio
+async def test_disconnect_forgets_rider_live_state(
+    fake_sio: FakeSocketServer,
+    test_ride: RideModel,
+    test_participation: ParticipationModel,
+):
+    await connect_as(test_participation.user_id)
+    await sockets.join_ride("sid-1", {"ride_code": test_ride.code})
+    await sockets.update_location("sid-1", {"ride_code": test_ride.code, "latitude": 48.2, "longitude": 11.6})
+    assert sockets.proximity.stats()["riders"] == 1
+    assert test_participation.user_id in ride_positions.get(test_ride.code)
+
+    await sockets.disconnect("sid-1")
+    assert sockets.proximity.stats()["riders"] == 0
+    assert test_participation.user_id not in ride_positions.get(test_ride.code)
+
+
+@pytest.mark.asyncio
+async def test_broadcaster_coalesces_fixes_per_tick(fake_sio: FakeSocketServer):
+    broadcaster = LocationBroadcaster(sockets.sio, tick_interval_ms=10, idle_ticks=1)
+
+    broadcaster.add("ABC123", {"user_id": 1, "latitude": 48.0, "longitude": 11.0})
+    broadcaster.add("ABC123", {"user_id": 1, "latitude": 48.1, "longitude": 11.1})
+    broadcaster.add("ABC123", {"user_id": 2, "latitude": 48.2, "longitude": 11.2})
+    await asyncio.sleep(0.05)
+
+    [batch] = fake_sio.events("location_batch")
+    assert batch["ride_code"] == "ABC123"
+    assert {loc["user_id"]: loc["latitude"] for loc in batch["locations"]} == {1: 48.1, 2: 48.2}
+    # Idle room stops its tick loop
+    assert broadcaster.stats()["active_rooms"] == 0
+
+
+@pytest.mark.asyncio
+async def test_update_location_batched_ride_skips_per_fix_event(
+    fake_sio: FakeSocketServer,
+    monkeypatch: pytest.MonkeyPatch,
+    session: AsyncSession,
+    test_ride: RideModel,
+    test_participation: ParticipationModel,
+):
+    test_ride.broadcast_mode = BroadcastMode.BATCHED
+    await session.commit()
+    broadcaster = LocationBroadcaster(sockets.sio, tick_interval_ms=60_000)
+    monkeypatch.setattr(sockets, "broadcaster", broadcaster)
+
+    await connect_as(test_participation.user_id)
+    await sockets.update_location("sid-1", {
+        "ride_code": test_ride.code,
+        "latitude": 48.2,
+        "longitude": 11.6,
+    })
+    assert fake_sio.events("location_update") == []
+
+    await broadcaster.stop()
+    [batch] = fake_sio.events("location_batch")
+    assert batch["locations"][0]["user_id"] == test_participation.user_id
+
+
+@pytest.mark.asyncio
+async def test_compact_subscriber_gets_binary_frames(
+    fake_sio: FakeSocketServer,
+    monkeypatch: pytest.MonkeyPatch,
+    test_ride: RideModel,
+    test_participation: ParticipationModel,
+):
+    monkeypatch.setattr(sockets, "broadcaster", LocationBroadcaster(sockets.sio))
+    await sockets.join_ride("viewer", {"ride_code": test_ride.code, "format": "compact"})
+    assert "viewer" in fake_sio.rooms[compact_room(test_ride.code)]
+    assert "viewer" not in fake_sio.rooms[test_ride.code]
+
+    await connect_as(test_participation.user_id)
+    await sockets.update_location("sid-1", {
+        "ride_code": test_ride.code,
+        "latitude": 48.2,
+        "longitude": 11.6,
+    })
+
+    [frame] = fake_sio.events("location_frame")
+    keyframe, [entry] = decode_frame(frame)
+    assert keyframe and entry.lat == to_fixed(48.2)
+    assert fake_sio.events("location_index")[-1]["indexes"] == [[entry.index, test_participation.user_id]]
+
+
+@pytest.mark.asyncio
+async def test_compact_encoder_goes_with_the_last_subscriber(
+    fake_sio: FakeSocketServer,
+    monkeypatch: pytest.MonkeyPatch,
+    test_ride: RideModel,
+):
+    broadcaster = LocationBroadcaster(sockets.sio)
+    monkeypatch.setattr(sockets, "broadcaster", broadcaster)
+    for sid in ("viewer-1", "viewer-2"):
+        await sockets.join_ride(sid, {"ride_code": test_ride.code, "format": "compact"})
+
+    await sockets.disconnect("viewer-1")
+    assert broadcaster.stats()["compact_rooms"] == 1
+    await sockets.disconnect("viewer-2")
+    assert (broadcaster.stats()["compact_rooms"], broadcaster.stats()["compact_subscribers"]) == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_idle_compact_encoder_is_rebuilt_with_the_next_fix(fake_sio: FakeSocketServer):
+    now = [0.0]
+    broadcaster = LocationBroadcaster(sockets.sio, encoder_idle_seconds=60, clock=lambda: now[0])
+    await broadcaster.subscribe_compact("viewer", "IDLE01")
+    location = {"user_id": 7, "latitude": 48.2, "longitude": 11.6, "location_timestamp": "2025-11-18T15:30:00+00:00"}
+    await broadcaster.emit_compact("IDLE01", [location])
+    await broadcaster.emit_compact("IDLE01", [location])
+
+    # Another room's subscription prunes the idle one
+    now[0] = 61.0
+    await broadcaster.subscribe_compact("viewer-2", "BUSY01")
+    assert broadcaster.stats()["compact_rooms"] == 1
+
+    await broadcaster.emit_compact("IDLE01", [location])
+    keyframe, [entry] = decode_frame(fake_sio.events("location_frame")[-1])
+    assert keyframe and entry.absolute
+    assert fake_sio.events("location_index")[-1]["indexes"] == [[entry.index, 7]]
+    assert broadcaster.stats()["compact_rooms"] == 2
+
+
+@pytest.mark.asyncio
+async def test_update_location_suppresses_throttled_fixes(
+    fake_sio: FakeSocketServer,
+    test_ride: RideModel,
+    test_participation: ParticipationModel,
+):
+    await connect_as(test_participation.user_id)
+    for _ in range(3):
+        await sockets.update_location("sid-1", {
+            "ride_code": test_ride.code,
+            "latitude": 48.2,
+            "longitude": 11.6,
+        })
+
+    assert len(fake_sio.events("location_update")) == 1
+    assert sockets.throttle.stats()["suppressed_interval"] == 2
+
+    await sockets.disconnect("sid-1")
+    assert sockets.throttle.stats()["tracked"] == 0
+
+
+@pytest.mark.asyncio
+async def test_update_location_rejects_non_numeric_coordinates(
+    fake_sio: FakeSocketServer,
+    test_ride: RideModel,
+    test_participation: ParticipationModel,
+):
+    await connect_as(test_participation.user_id)
+    for latitude in ("north", {"deg": 48.2}, [48.2]):
+        await sockets.update_location("sid-1", {
+            "ride_code": test_ride.code,
+            "latitude": latitude,
+            "longitude": 11.6,
+        })
+
+    assert len(fake_sio.events("error")) == 3
+    assert fake_sio.events("location_update") == []
@@ -0,0 +1,110 @@
+import random
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ParticipationModel, RideModel, UserModel
+from app.spatial import RideSpatialIndexes, SpatialGrid, ride_positions
+from app.utils.geo import haversine_distance
+
+
+def test_grid_queries_match_brute_force():
+    rng = random.Random(3)
+    grid = SpatialGrid(cell_m=200)
+    positions = {}
+    for user_id in range(300):
+        positions[user_id] = (48.1 + rng.random() * 0.05, 11.5 + rng.random() * 0.08)
+        grid.update(user_id, *positions[user_id])
+
+    for _ in range(100):
+        user_id = rng.randrange(300)
+        lat, lon = positions[user_id]
+        positions[user_id] = (lat + rng.gauss(0, 0.003), lon + rng.gauss(0, 0.003))
+        grid.update(user_id, *positions[user_id])
+
+        point = (48.1 + rng.random() * 0.06, 11.5 + rng.random() * 0.09)
+        k, radius_m = rng.randint(1, 20), rng.random() * 2000
+        brute = sorted(
+            (haversine_distance(*point, *position), other)
+            for other, position in positions.items() if other != user_id
+        )
+        assert [n.user_id for n in grid.nearest(*point, k, exclude=user_id)] == [u for _, u in brute[:k]]
+        assert [n.user_id for n in grid.within(*point, radius_m, exclude=user_id)] == [
+            u for distance, u in brute if distance <= radius_m
+        ]
+
+    lats = [lat for lat, _ in positions.values()]
+    lons = [lon for _, lon in positions.values()]
+    assert grid.bounds() == (min(lats), min(lons), max(lats), max(lons))
+    # A query far outside the grid still finds the closest riders
+    assert len(grid.nearest(0.0, 0.0, 3)) == 3
+
+
+def test_indexes_drop_rides_without_fixes():
+    now = [0.0]
+    indexes = RideSpatialIndexes(ttl_seconds=60, clock=lambda: now[0])
+    indexes.update("OLD111", 1, 48.1, 11.5)
+    now[0] = 30.0
+    indexes.update("NEW222", 1, 48.1, 11.5)
+
+    now[0] = 70.0
+    indexes.update("NEW222", 2, 48.2, 11.5)
+    assert indexes.get("OLD111") is None
+    assert len(indexes.get("NEW222")) == 2
+
+    indexes.remove("NEW222", 1)
+    assert 1 not in indexes.get("NEW222")
+
+    # Seeded rides expire on lookups too, without further fixes anywhere
+    indexes.seed("SEED33", [(1, 48.1, 11.5)])
+    now[0] = 200.0
+    assert indexes.get("SEED33") is None
+
+
+@pytest.mark.asyncio
+async def test_nearby_and_bounds_endpoints_seed_from_last_positions(
+    test_client: AsyncClient,
+    session: AsyncSession,
+    test_ride: RideModel,
+    test_participation: ParticipationModel,
+):
+    lat, lon = float(test_participation.latitude), float(test_participation.longitude)
+    for name, offset in (("near", 0.001), ("far", 0.02)):
+        user = UserModel(username=name, password="x")
+        session.add(user)
+        await session.flush()
+        session.add(ParticipationModel(
+            user_id=user.id,
+            ride_id=test_ride.id,
+            latitude=lat + offset,
+            longitude=lon,
+        ))
+    await session.commit()
+
+    response = await test_client.get(
+        f"/rides/{test_ride.id}/nearby", params={"user_id": test_participation.user_id, "k": 1},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    [nearest] = response.json()
+    assert nearest["distance_m"] == pytest.approx(111, abs=1)
+
+    # Live fixes move riders in place
+    far = (await test_client.get(
+        f"/rides/{test_ride.id}/nearby",
+        params={"latitude": lat, "longitude": lon},
+    )).json()[-1]
+    ride_positions.update(test_ride.code, far["user_id"], lat, lon)
+    response = await test_client.get(
+        f"/rides/{test_ride.id}/nearby",
+        params={"user_id": test_participation.user_id, "radius_m": 50},
+    )
+    assert [rider["user_id"] for rider in response.json()] == [far["user_id"]]
+
+    response = await test_client.get(f"/rides/{test_ride.id}/bounds")
+    assert response.json()["rider_count"] == 3
+    assert response.json()["max_latitude"] == pytest.approx(lat + 0.001)
+
+    response = await test_client.get(f"/rides/{test_ride.id}/nearby")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
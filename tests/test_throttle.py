@@ -0,0 +1,47 @@
+from app.throttle import LocationThrottle
+
+# ~11 m per 0.0001 degree of latitude
+BASE_LAT, BASE_LON = 48.1351, 11.5820
+
+
+def make_throttle(now: list[float]) -> LocationThrottle:
+    return LocationThrottle(
+        min_interval_ms=1000,
+        min_distance_m=5.0,
+        keepalive_ms=10_000,
+        clock=lambda: now[0],
+    )
+
+
+def test_first_fix_is_always_admitted():
+    throttle = make_throttle([0.0])
+    assert throttle.admit(1, BASE_LAT, BASE_LON) is True
+    assert throttle.admit(2, BASE_LAT, BASE_LON) is True
+
+
+def test_fix_within_min_interval_is_suppressed():
+    now = [0.0]
+    throttle = make_throttle(now)
+    throttle.admit(1, BASE_LAT, BASE_LON)
+
+    now[0] = 0.5
+    assert throttle.admit(1, BASE_LAT + 0.001, BASE_LON) is False
+    assert throttle.suppressed_interval == 1
+
+
+def test_stationary_rider_is_suppressed_until_keepalive():
+    now = [0.0]
+    throttle = make_throttle(now)
+    throttle.admit(1, BASE_LAT, BASE_LON)
+
+    now[0] = 2.0
+    assert throttle.admit(1, BASE_LAT + 0.00001, BASE_LON) is False
+    assert throttle.suppressed_distance == 1
+
+    now[0] = 3.0
+    assert throttle.admit(1, BASE_LAT + 0.0001, BASE_LON) is True
+
+    # Not moving, but silent for longer than the keepalive
+    now[0] = 14.0
+    assert throttle.admit(1, BASE_LAT + 0.0001, BASE_LON) is True
+    assert throttle.stats()["admitted"] == 3
@@ -0,0 +1,76 @@
+import pytest
+
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models import UserModel
+from app.repositories import UserRepository
+from app.repositories.user import user_cache
+from app.security import create_access_token
+
+
+@pytest.mark.asyncio
+async def test_authenticated_requests_reuse_cached_user(
+    test_client: AsyncClient,
+    session: AsyncSession,
+    test_user: UserModel,
+):
+    headers = {"Authorization": f"Bearer {create_access_token(subject=str(test_user.id))}"}
+    hits = user_cache.hits
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(session.bind.sync_engine, "before_cursor_execute", listener)
+    try:
+        first = await test_client.get("/auth/me", headers=headers)
+        second = await test_client.get("/auth/me", headers=headers)
+    finally:
+        event.remove(session.bind.sync_engine, "before_cursor_execute", listener)
+
+    assert first.json() == second.json()
+    assert first.json()["username"] == test_user.username
+    assert len([sql for sql in statements if "FROM users" in sql]) == 1
+    assert user_cache.hits == hits + 1
+
+
+@pytest.mark.asyncio
+async def test_user_changes_invalidate_cache(
+    test_client: AsyncClient,
+    session: AsyncSession,
+    test_user: UserModel,
+):
+    headers = {"Authorization": f"Bearer {create_access_token(subject=str(test_user.id))}"}
+    await test_client.get("/auth/me", headers=headers)
+
+    test_user.username = "renamed"
+    await session.commit()
+    assert len(user_cache) == 0
+    assert (await test_client.get("/auth/me", headers=headers)).json()["username"] == "renamed"
+
+    await session.delete(test_user)
+    await session.commit()
+    response = await test_client.get("/auth/me", headers=headers)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_lookup_before_commit_does_not_outlive_it(session: AsyncSession, test_user: UserModel):
+    session_factory = async_sessionmaker(bind=session.bind, expire_on_commit=False)
+
+    async def concurrent_lookup():
+        # Its own connection only sees committed rows
+        async with session_factory() as other:
+            return await UserRepository(session=other).get_record_by_id(user_id=test_user.id)
+
+    test_user.username = "renamed"
+    await session.flush()
+    assert (await concurrent_lookup()).username == "testuser"
+    await session.commit()
+    assert (await concurrent_lookup()).username == "renamed"
+
+    await session.delete(test_user)
+    await session.flush()
+    assert await concurrent_lookup() is not None
+    await session.commit()
+    assert await concurrent_lookup() is None